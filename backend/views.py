@@ -7,10 +7,8 @@ from django.contrib.auth import authenticate
 from django.db.models import Avg, Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-import numpy as np
 
+from college_portal.trends import direction, linear_trend, predict
 from .models import *
 from .serializers import *
 
@@ -208,39 +206,25 @@ def performance_prediction(request):
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     
     student = Student.objects.get(user=request.user)
-    marks = Marks.objects.filter(student=student).order_by('examination__date')
-    
-    if marks.count() < 3:
+    percentages = [
+        marks_obtained / total_marks * 100
+        for marks_obtained, total_marks in Marks.objects.filter(student=student)
+        .order_by('examination__date', 'examination_id')
+        .values_list('marks_obtained', 'examination__total_marks')
+    ]
+    
+    # Closed-form least squares over exam number, see college_portal/trends.py
+    trend = linear_trend(percentages)
+    if trend is None:
         return Response({'message': 'Insufficient data for prediction'})
     
-    # Prepare data for prediction
-    data = []
-    for i, mark in enumerate(marks):
-        percentage = (mark.marks_obtained / mark.examination.total_marks) * 100
-        data.append([i, percentage])
-    
-    df = pd.DataFrame(data, columns=['exam_number', 'percentage'])
-    
-    # Simple linear regression for trend prediction
-    X = df[['exam_number']]
-    y = df['percentage']
-    
-    model = LinearRegression()
-    model.fit(X, y)
-    
-    # Predict next 3 exams
-    next_exams = [[len(data) + i] for i in range(1, 4)]
-    predictions = model.predict(next_exams)
-    
-    # Calculate trend
-    slope = model.coef_[0]
-    trend = 'improving' if slope > 0 else 'declining' if slope < 0 else 'stable'
+    trend_name = direction(trend.slope)
     
     return Response({
-        'current_average': df['percentage'].mean(),
-        'trend': trend,
-        'predictions': predictions.tolist(),
-        'recommendation': get_performance_recommendation(df['percentage'].mean(), trend)
+        'current_average': trend.average,
+        'trend': trend_name,
+        'predictions': predict(trend),
+        'recommendation': get_performance_recommendation(trend.average, trend_name)
     })
 
 def get_performance_recommendation(average, trend):
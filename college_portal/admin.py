@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db import transaction
 from .models import *
+from .attendance import record_attendance_changes
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -58,6 +60,30 @@ class AttendanceAdmin(admin.ModelAdmin):
     search_fields = ['student__user__first_name', 'student__user__last_name']
     date_hierarchy = 'date'
 
+    def save_model(self, request, obj, form, change):
+        previous = Attendance.objects.filter(pk=obj.pk).first() if change else None
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            record_attendance_changes(added=[obj], removed=[previous] if previous else [])
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            record_attendance_changes(removed=[obj])
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            removed = list(queryset.only('student_id', 'subject_id', 'is_present'))
+            super().delete_queryset(request, queryset)
+            record_attendance_changes(removed=removed)
+
+@admin.register(AttendanceSummary)
+class AttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ['student', 'subject', 'present', 'total', 'updated_at']
+    list_filter = ['subject']
+    search_fields = ['student__user__first_name', 'student__user__last_name']
+    readonly_fields = ['student', 'subject', 'present', 'total', 'updated_at']
+
 @admin.register(Examination)
 class ExaminationAdmin(admin.ModelAdmin):
     list_display = ['name', 'exam_type', 'subject', 'class_assigned', 'date', 'total_marks']
@@ -74,7 +100,7 @@ class ResultAdmin(admin.ModelAdmin):
 @admin.register(Notice)
 class NoticeAdmin(admin.ModelAdmin):
     list_display = ['title', 'priority', 'target_audience', 'created_by', 'is_active', 'created_at']
-    list_filter = ['priority', 'target_audience', 'is_active', 'created_at']
+    list_filter = ['priority', 'target_audience', 'target_department', 'target_class', 'is_active', 'created_at']
     search_fields = ['title', 'content']
     date_hierarchy = 'created_at'
 
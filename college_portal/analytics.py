@@ -0,0 +1,203 @@
+"""
+Class-wide performance analytics.
+
+build_class_analytics() reads every result of a class's examinations with
+one values_list() query and computes the statistics with NumPy array
+operations. Rows are grouped with np.unique(return_inverse=True), sums
+come from np.bincount(), and percentiles are interpolated on the rows
+sorted within their group, so the cost is a few passes over the arrays
+however many students and examinations there are. Per-student trends use
+the same closed-form least squares as trends.py.
+
+class_analytics() caches the output per class until a result or
+examination of the class changes: writes bump the ``results:class:<id>``
+scope (see dashboard.result_class_scopes()). Entries live CACHE_TTL, far
+longer than a scope version may stay in the cache; a version evicted
+meanwhile comes back as a new value, so the entry misses rather than
+outliving the writes it missed.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .dashboard import scope_versions
+from .trends import MIN_POINTS, direction
+
+DEFAULTS = {
+    # Average percentage below which a student is at risk
+    'AT_RISK_AVERAGE': 50,
+    # Trend (percentage points per exam) below which a student is at risk
+    'AT_RISK_SLOPE': -5,
+    'CACHE_TTL': 60 * 60 * 24,
+}
+
+PERCENTILES = [10, 25, 50, 75, 90]
+
+CACHE_KEY = 'analytics:class:{class_id}'
+
+RESULT_COLUMNS = [
+    'student_id', 'student__student_id', 'student__user__first_name', 'student__user__last_name',
+    'examination_id', 'examination__name', 'examination__date', 'examination__total_marks',
+    'examination__passing_marks', 'examination__subject_id', 'examination__subject__name',
+    'marks_obtained',
+]
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, 'CLASS_ANALYTICS', {})}
+
+
+def _number(value):
+    value = float(value)
+    return None if value != value else round(value, 2)
+
+
+def group_percentiles(np, groups, values, count, percentiles=PERCENTILES):
+    """
+    ``{q: array}`` of the q-th percentile of ``values`` within each of
+    ``count`` groups, ``groups`` holding each value's group index. Same
+    linear interpolation as np.percentile(); every group must be non-empty.
+    """
+    ordered = values[np.lexsort((values, groups))]
+    sizes = np.bincount(groups, minlength=count)
+    starts = np.cumsum(sizes) - sizes
+    bands = {}
+    for q in percentiles:
+        position = starts + (sizes - 1) * (q / 100)
+        lower = np.floor(position).astype(np.intp)
+        upper = np.ceil(position).astype(np.intp)
+        weight = position - lower
+        bands[q] = ordered[lower] * (1 - weight) + ordered[upper] * weight
+    bands['min'] = ordered[starts]
+    bands['max'] = ordered[starts + sizes - 1]
+    return bands
+
+
+def _group_stats(np, groups, percentages, passed, count):
+    sizes = np.bincount(groups, minlength=count)
+    means = np.bincount(groups, weights=percentages, minlength=count) / sizes
+    pass_rates = np.bincount(groups, weights=passed, minlength=count) / sizes * 100
+    bands = group_percentiles(np, groups, percentages, count)
+    return [
+        {
+            'results': int(sizes[i]),
+            'mean': _number(means[i]),
+            'median': _number(bands[50][i]),
+            'min': _number(bands['min'][i]),
+            'max': _number(bands['max'][i]),
+            'percentiles': {f'p{q}': _number(bands[q][i]) for q in PERCENTILES},
+            'pass_rate': _number(pass_rates[i]),
+        }
+        for i in range(count)
+    ]
+
+
+def build_class_analytics(class_id):
+    """The analytics of one class, or None when the class does not exist."""
+    import numpy as np
+
+    from .models import Class, Result
+
+    class_obj = Class.objects.filter(id=class_id).values('id', 'name', 'section', 'academic_year').first()
+    if class_obj is None:
+        return None
+    options = _options()
+
+    rows = list(
+        Result.objects.filter(examination__class_assigned_id=class_id)
+        .order_by('student_id', 'examination__date', 'examination_id')
+        .values_list(*RESULT_COLUMNS)
+    )
+    data = {'class': class_obj, 'results': len(rows), 'examinations': [], 'subjects': [], 'students': [], 'at_risk': 0}
+    if not rows:
+        return data
+
+    (student_ids, student_codes, first_names, last_names, exam_ids, exam_names, exam_dates, totals,
+     passing, subject_ids, subject_names, marks) = zip(*rows)
+    marks = np.asarray(marks, dtype=float)
+    totals = np.asarray(totals, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentages = np.where(totals > 0, marks / totals * 100, 0.0)
+    passed = (marks >= np.asarray(passing, dtype=float)).astype(float)
+
+    # Row index of each label's first occurrence, for names and dates
+    students, student_first, student_groups = np.unique(student_ids, return_index=True, return_inverse=True)
+    exams, exam_first, exam_groups = np.unique(exam_ids, return_index=True, return_inverse=True)
+    subjects, subject_first, subject_groups = np.unique(subject_ids, return_index=True, return_inverse=True)
+
+    # Examinations, in date order
+    exam_stats = _group_stats(np, exam_groups, percentages, passed, len(exams))
+    for i, first in enumerate(exam_first):
+        data['examinations'].append({
+            'id': int(exams[i]),
+            'name': exam_names[first],
+            'date': exam_dates[first],
+            'subject': subject_names[first],
+            'total_marks': int(totals[first]),
+            **exam_stats[i],
+        })
+    data['examinations'].sort(key=lambda exam: (exam['date'], exam['id']))
+
+    # Subjects, compared with the class as a whole
+    class_mean = float(percentages.mean())
+    data['class_mean'] = _number(class_mean)
+    data['class_median'] = _number(np.median(percentages))
+    subject_stats = _group_stats(np, subject_groups, percentages, passed, len(subjects))
+    for i, first in enumerate(subject_first):
+        data['subjects'].append({
+            'id': int(subjects[i]),
+            'name': subject_names[first],
+            'difference_from_class_mean': _number(subject_stats[i]['mean'] - class_mean),
+            **subject_stats[i],
+        })
+    data['subjects'].sort(key=lambda subject: subject['mean'])
+
+    # Students: rows are ordered by student then exam date, so each row's
+    # exam number is its offset from the first row of its student
+    n = np.bincount(student_groups).astype(float)
+    x = np.arange(len(rows)) - student_first[student_groups]
+    sy = np.bincount(student_groups, weights=percentages)
+    sxy = np.bincount(student_groups, weights=x * percentages)
+    sx = n * (n - 1) / 2
+    sxx = (n - 1) * n * (2 * n - 1) / 6
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = np.where(n >= max(MIN_POINTS, 2), (n * sxy - sx * sy) / (n * sxx - sx * sx), np.nan)
+    averages = sy / n
+    last = student_first + n.astype(np.intp) - 1
+    failed_last = passed[last] == 0
+
+    for i, first in enumerate(student_first):
+        slope = _number(slopes[i])
+        reasons = []
+        if averages[i] < options['AT_RISK_AVERAGE']:
+            reasons.append('low_average')
+        if slope is not None and slope < options['AT_RISK_SLOPE']:
+            reasons.append('declining')
+        if failed_last[i]:
+            reasons.append('failed_last_exam')
+        data['students'].append({
+            'id': int(students[i]),
+            'student_id': student_codes[first],
+            'name': f'{first_names[first]} {last_names[first]}'.strip(),
+            'results': int(n[i]),
+            'average': _number(averages[i]),
+            'slope': slope,
+            'trend': direction(slope) if slope is not None else None,
+            'at_risk': bool(reasons),
+            'risk_reasons': reasons,
+        })
+    data['at_risk'] = sum(student['at_risk'] for student in data['students'])
+    return data
+
+
+def class_analytics(class_id):
+    """Cached build_class_analytics(), rebuilt after the class's results change."""
+    key = CACHE_KEY.format(class_id=class_id)
+    versions = scope_versions([f'results:class:{class_id}'])
+    entry = cache.get(key)
+    if entry is not None and entry['versions'] == versions:
+        return entry['data']
+
+    data = build_class_analytics(class_id)
+    if data is not None:
+        cache.set(key, {'versions': versions, 'data': data}, _options()['CACHE_TTL'])
+    return data
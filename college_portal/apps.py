@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CollegePortalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'college_portal'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .profiling import install_query_timer, install_serializer_timer
+        install_query_timer()
+        install_serializer_timer()
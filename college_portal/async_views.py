@@ -0,0 +1,160 @@
+"""
+Async (ASGI) versions of the dashboard and the student read endpoints.
+
+Under ASGI these free the event loop while the database works, and run a
+response's independent queries at the same time: the dashboard's counts,
+today's schedule and recent results, or a student list and its
+ETag. Django's async ORM methods (aget(), aaggregate(), async for)
+each hand their query to the one thread-sensitive executor, so gathering
+them would still run one query at a time. Independent parts are run with
+sync_to_async(thread_sensitive=False) on a small pool of their own
+instead (ASYNC_QUERY_WORKERS), each thread keeping its own database
+connection open between jobs, subject to CONN_MAX_AGE like a request
+thread's. The authentication and dashboard lookups that come
+first run there too rather than on the thread Django keeps for sync
+code, which every request would otherwise queue for.
+
+The views answer exactly what their DRF counterparts in views.py answer,
+ETags included (the student lists key theirs on the DRF view's URL);
+DRF views cannot be async, so these are plain Django views that
+authenticate with the same JWT authentication class (authentication.py).
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.encoding import iri_to_uri
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+
+from .authentication import ClaimsJWTAuthentication
+from .conditional import conditional_response, queryset_etag
+from .dashboard import cache_dashboard, get_cached_dashboard
+from .models import Attendance, Result
+from .profiles import user_profile
+from .query_planning import optimize_queryset
+from .serializers import AttendanceSerializer, ResultSerializer
+from .views import DashboardViewSet
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_QUERY_WORKERS', 8), thread_name_prefix='async-query',
+)
+
+
+def _pooled(function):
+    def run(*args):
+        # What request_started and request_finished do for request threads:
+        # drop connections past CONN_MAX_AGE or broken by an error
+        close_old_connections()
+        try:
+            return function(*args)
+        finally:
+            close_old_connections()
+    return run
+
+
+def in_pool(function, *args):
+    """Await ``function(*args)`` on the query pool."""
+    return sync_to_async(_pooled(function), thread_sensitive=False, executor=_executor)(*args)
+
+
+async def gather_parts(parts):
+    """``{name: value}`` of the ``{name: callable}`` parts, run concurrently."""
+    values = await asyncio.gather(*(in_pool(part) for part in parts.values()))
+    return dict(zip(parts, values))
+
+
+def json_response(data, status=200):
+    """The bytes DRF's JSONRenderer would send for ``data``."""
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def _authenticate(request):
+    try:
+        result = ClaimsJWTAuthentication().authenticate(request)
+    except AuthenticationFailed as error:
+        return None, json_response({'detail': error.detail}, error.status_code)
+    if result is None:
+        return None, json_response({'detail': 'Authentication credentials were not provided.'}, 401)
+    return result[0], None
+
+
+def _dashboard_plan(user):
+    """DashboardViewSet's plan, or ``(None, error response)``."""
+    try:
+        plan = DashboardViewSet()._dashboard_plan(user)
+    except Http404 as error:
+        return None, json_response({'detail': str(error)}, 404)
+    if plan is None:
+        return None, json_response({'error': 'Teacher profile not found'})
+    return plan, None
+
+
+@require_GET
+async def dashboard(request):
+    user, error = await in_pool(_authenticate, request)
+    if error:
+        return error
+    entry = await in_pool(get_cached_dashboard, user)
+    if entry is None:
+        plan, error = await in_pool(_dashboard_plan, user)
+        if error:
+            return error
+        versions, parts, finish = plan
+        values = await gather_parts(parts)
+        entry = await in_pool(cache_dashboard, user, finish(values), versions)
+    return conditional_response(request, entry['etag'], lambda: json_response(entry['data']))
+
+
+def _student_id(user):
+    student = user_profile(user)
+    return student.id if student else None
+
+
+def _etag(request, queryset, url_name):
+    # Keyed on the DRF view's URL, so both views hand out the same ETags
+    query = request.META.get('QUERY_STRING')
+    resource = reverse(url_name) + (f'?{iri_to_uri(query)}' if query else '')
+    return queryset_etag(request, queryset, ['updated_at'], ['subject'], resource)
+
+
+def _serialize(serializer_class, queryset):
+    return serializer_class(optimize_queryset(queryset, serializer_class), many=True).data
+
+
+async def _student_list(request, kind, model, serializer_class, ordering, url_name):
+    user, error = await in_pool(_authenticate, request)
+    if error:
+        return error
+    if user.user_type != 'student':
+        return json_response({'error': f'Only students can view their {kind}'}, 403)
+    student_id = await in_pool(_student_id, user)
+    if student_id is None:
+        return json_response({'error': 'Student profile not found'}, 404)
+
+    rows = model.objects.filter(student_id=student_id)
+    if 'HTTP_IF_NONE_MATCH' in request.META:
+        # Likely unchanged: validate first and only serialize on a miss
+        etag = await in_pool(_etag, request, rows, url_name)
+        return await in_pool(conditional_response, request, etag, lambda: json_response(
+            _serialize(serializer_class, rows.order_by(ordering))
+        ))
+    etag, data = await asyncio.gather(
+        in_pool(_etag, request, rows, url_name), in_pool(_serialize, serializer_class, rows.order_by(ordering)),
+    )
+    return conditional_response(request, etag, lambda: json_response(data))
+
+
+@require_GET
+async def student_attendance(request):
+    return await _student_list(request, 'attendance', Attendance, AttendanceSerializer, '-date', 'api:student_attendance')
+
+
+@require_GET
+async def student_results(request):
+    return await _student_list(request, 'results', Result, ResultSerializer, '-created_at', 'api:student_results')
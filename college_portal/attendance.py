@@ -0,0 +1,248 @@
+"""
+Set-based write paths for attendance.
+
+Marking a roster used to cost a handful of queries per student. The helpers
+here resolve every referenced student and subject up front and write the
+whole roster with a single upsert, so the query count of a roster does not
+depend on its size.
+
+Every write path also reports its changes to record_attendance_changes(),
+which keeps the AttendanceSummary counters in step inside the same
+transaction. ``manage.py rebuild_attendance_summary`` recomputes them from
+scratch for backfills or after writes that bypassed these helpers.
+"""
+from collections import defaultdict
+from datetime import date as date_type
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .dashboard import invalidate_instances
+from .models import Attendance, AttendanceSummary, Student, Subject
+
+# Columns rewritten when a (student, subject, date) row already exists
+UPSERT_UNIQUE_FIELDS = ['student', 'subject', 'date']
+UPSERT_UPDATE_FIELDS = ['teacher', 'is_present', 'updated_at']
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_date(value, default):
+    if value in (None, ''):
+        return default
+    if isinstance(value, date_type):
+        return value
+    try:
+        return parse_date(str(value))
+    except ValueError:
+        return None
+
+
+def upsert_attendance(teacher, items):
+    """
+    Write a roster of attendance marks on behalf of ``teacher``.
+
+    ``items`` is a list of dicts with ``student_id``, ``subject_id`` and
+    optional ``is_present``/``date`` keys. Invalid rows are skipped and
+    reported; the valid ones are written in one transaction. Returns a
+    ``(saved, errors)`` tuple where ``errors`` is a list of
+    ``{'index': ..., 'error': ...}`` dicts.
+    """
+    today = timezone.now().date()
+    is_present_field = Attendance._meta.get_field('is_present')
+    errors = []
+    parsed = []
+
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Expected an object'})
+            continue
+
+        student_id = _parse_id(item.get('student_id'))
+        subject_id = _parse_id(item.get('subject_id'))
+        date = _parse_date(item.get('date'), today)
+
+        if student_id is None:
+            errors.append({'index': index, 'error': 'A valid student_id is required'})
+            continue
+        if subject_id is None:
+            errors.append({'index': index, 'error': 'A valid subject_id is required'})
+            continue
+        if date is None:
+            errors.append({'index': index, 'error': 'Invalid date, expected YYYY-MM-DD'})
+            continue
+        try:
+            is_present = is_present_field.to_python(item.get('is_present', False))
+        except ValidationError:
+            errors.append({'index': index, 'error': 'is_present must be a boolean'})
+            continue
+
+        parsed.append((index, student_id, subject_id, date, bool(is_present)))
+
+    # One query per related model, however large the roster is
+    student_ids = set(
+        Student.objects.filter(id__in={row[1] for row in parsed}).values_list('id', flat=True)
+    )
+    subject_ids = set(
+        Subject.objects.filter(id__in={row[2] for row in parsed}).values_list('id', flat=True)
+    )
+
+    # Keyed on the unique constraint so a repeated row in the payload wins
+    # over its earlier occurrences instead of conflicting inside the insert
+    rows = {}
+    for index, student_id, subject_id, date, is_present in parsed:
+        if student_id not in student_ids:
+            errors.append({'index': index, 'error': f'Student {student_id} does not exist'})
+            continue
+        if subject_id not in subject_ids:
+            errors.append({'index': index, 'error': f'Subject {subject_id} does not exist'})
+            continue
+        rows[(student_id, subject_id, date)] = Attendance(
+            student_id=student_id,
+            subject_id=subject_id,
+            teacher=teacher,
+            date=date,
+            is_present=is_present,
+        )
+
+    if rows:
+        with transaction.atomic():
+            keys = rows.keys()
+            # Concurrent writers of the same students and subjects take turns
+            # from here, so each sees the rows the other wrote
+            lock_summaries({(key[0], key[1]) for key in keys})
+            # Rows about to be overwritten, so the summary only counts the change
+            replaced = [
+                row for row in Attendance.objects.select_for_update().filter(
+                    student_id__in={key[0] for key in keys},
+                    subject_id__in={key[1] for key in keys},
+                    date__in={key[2] for key in keys},
+                ).values_list('student_id', 'subject_id', 'date', 'is_present')
+                if row[:3] in keys
+            ]
+            Attendance.objects.bulk_create(
+                list(rows.values()),
+                update_conflicts=True,
+                unique_fields=UPSERT_UNIQUE_FIELDS,
+                update_fields=UPSERT_UPDATE_FIELDS,
+            )
+            record_attendance_changes(
+                added=rows.values(),
+                removed=[Attendance(student_id=row[0], subject_id=row[1], is_present=row[3]) for row in replaced],
+            )
+            # bulk_create() sends no post_save signals
+            invalidate_instances(rows.values())
+
+    errors.sort(key=lambda error: error['index'])
+    return len(rows), errors
+
+
+def lock_summaries(pairs):
+    """
+    Create (if missing) and row-lock the AttendanceSummary rows of the
+    ``(student_id, subject_id)`` pairs until the transaction ends. Rows are
+    locked in id order so two writers cannot deadlock.
+    """
+    if not pairs:
+        return
+    AttendanceSummary.objects.bulk_create(
+        [AttendanceSummary(student_id=student_id, subject_id=subject_id) for student_id, subject_id in pairs],
+        ignore_conflicts=True,
+    )
+    list(
+        AttendanceSummary.objects.select_for_update()
+        .filter(student_id__in={pair[0] for pair in pairs}, subject_id__in={pair[1] for pair in pairs})
+        .order_by('id').values_list('id', flat=True)
+    )
+
+
+def record_attendance_changes(added=(), removed=()):
+    """
+    Apply attendance rows that were written (``added``) or deleted/overwritten
+    (``removed``) to the AttendanceSummary counters. Both are iterables of
+    objects with ``student_id``, ``subject_id`` and ``is_present``; an update
+    is the old row removed plus the new row added. Call inside the
+    transaction that wrote the attendance.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for row in added:
+        delta = deltas[(row.student_id, row.subject_id)]
+        delta[0] += int(bool(row.is_present))
+        delta[1] += 1
+    for row in removed:
+        delta = deltas[(row.student_id, row.subject_id)]
+        delta[0] -= int(bool(row.is_present))
+        delta[1] -= 1
+
+    deltas = {key: delta for key, delta in deltas.items() if delta != [0, 0]}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        AttendanceSummary.objects.bulk_create(
+            [AttendanceSummary(student_id=student_id, subject_id=subject_id) for student_id, subject_id in deltas],
+            ignore_conflicts=True,
+        )
+        summaries = [
+            summary for summary in AttendanceSummary.objects.filter(
+                student_id__in={key[0] for key in deltas},
+                subject_id__in={key[1] for key in deltas},
+            )
+            if (summary.student_id, summary.subject_id) in deltas
+        ]
+        now = timezone.now()
+        for summary in summaries:
+            present, total = deltas[(summary.student_id, summary.subject_id)]
+            # Relative updates, so concurrent writers cannot lose increments
+            summary.present = F('present') + present
+            summary.total = F('total') + total
+            summary.updated_at = now
+        AttendanceSummary.objects.bulk_update(summaries, ['present', 'total', 'updated_at'])
+
+
+def rebuild_attendance_summary(batch_size=1000):
+    """
+    Recompute every AttendanceSummary row from the Attendance table.
+    Returns the number of summary rows written.
+    """
+    totals = (
+        Attendance.objects.order_by()
+        .values('student_id', 'subject_id')
+        .annotate(total=Count('id'), present=Count('id', filter=Q(is_present=True)))
+    )
+    written = 0
+    with transaction.atomic():
+        AttendanceSummary.objects.all().delete()
+        batch = []
+        for row in totals.iterator(chunk_size=batch_size):
+            batch.append(AttendanceSummary(**row))
+            if len(batch) >= batch_size:
+                AttendanceSummary.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        AttendanceSummary.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def attendance_totals(student):
+    """
+    Return ``(present, total)`` for ``student`` across all subjects, read
+    from AttendanceSummary instead of counting the attendance history.
+    """
+    totals = AttendanceSummary.objects.filter(student=student).aggregate(present=Sum('present'), total=Sum('total'))
+    return totals['present'] or 0, totals['total'] or 0
+
+
+def attendance_percentage(present, total):
+    if total > 0:
+        return round((present / total) * 100, 2)
+    return 0
@@ -0,0 +1,200 @@
+"""
+JWT authentication without a database query per request.
+
+Tokens issued at login and refresh carry signed claims beside the user
+id: user_type, username, is_staff, is_superuser, and the teacher_id,
+student_id and class_enrolled_id of the user's profile. ClaimsJWTAuthentication
+builds request.user from them as a ClaimsUser, a real User instance
+whose other fields are deferred and load in one query if a view reads
+them. Permission classes and profile lookups then need no query.
+
+Claims are only as fresh as the token, so writes that change them or end
+access (deactivation, password or role changes, a student's class, a
+profile created or removed, deletion) revoke the user's access tokens:
+signals.py stores a new revision in the user's TokenRevision row. Tokens
+carry the revision current when they were issued and are refused once it
+changed; clients then refresh, and the refresh endpoint reads the user
+again. Each process caches a user's state, whether they exist and are
+active and their revision, under ``auth:user:<user id>`` for at most
+CHECK_INTERVAL seconds and then reads it again with one query. Tokens
+issued in the process prime the state and a revocation drops it, so with
+a shared cache a revoked user is locked out on their next request, and
+with a per-process cache within CHECK_INTERVAL. Writes that skip save()
+and delete() (QuerySet.update(), raw SQL) do not revoke.
+
+Tokens without the claims (issued before this existed) are authenticated
+the usual way, with a query.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .blacklist import revoked_tokens
+
+DEFAULTS = {
+    # Seconds a process trusts a user's cached state before reading it again
+    'CHECK_INTERVAL': 60,
+}
+
+USER_STATE_KEY = 'auth:user:{user_id}'
+
+USER_CLAIMS = ['username', 'user_type', 'is_staff', 'is_superuser']
+PROFILE_CLAIMS = ['teacher_id', 'student_id', 'class_enrolled_id']
+
+
+def revocation_options():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_REVOCATION', {})}
+
+
+def stored_revision(user_id):
+    """The user's current token revision, from the database; None if never revoked."""
+    from .models import TokenRevision
+
+    return TokenRevision.objects.filter(user_id=user_id).values_list('revision', flat=True).first()
+
+
+def cache_user_state(user_id, state):
+    cache.set(USER_STATE_KEY.format(user_id=user_id), state, revocation_options()['CHECK_INTERVAL'])
+
+
+def user_state(user_id):
+    """``(is_active, revision)`` of the user, or None if they were deleted."""
+    state = cache.get(USER_STATE_KEY.format(user_id=user_id))
+    if state is None:
+        row = get_user_model().objects.filter(pk=user_id).values_list('is_active', 'token_revision__revision').first()
+        # () marks a deleted user; None is a cache miss
+        state = tuple(row) if row else ()
+        cache_user_state(user_id, state)
+    return state or None
+
+
+def user_claims(user):
+    """The claims of ``user``; one query for a teacher's or student's profile."""
+    from .models import Student, Teacher
+
+    claims = {name: getattr(user, name) for name in USER_CLAIMS}
+    claims.update(dict.fromkeys(PROFILE_CLAIMS))
+    if user.user_type == 'teacher':
+        claims['teacher_id'] = Teacher.objects.filter(user=user).values_list('id', flat=True).first()
+    elif user.user_type == 'student':
+        student = Student.objects.filter(user=user).values('id', 'class_enrolled_id').first()
+        if student:
+            claims['student_id'] = student['id']
+            claims['class_enrolled_id'] = student['class_enrolled_id']
+    return claims
+
+
+class ClaimsRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        revision = stored_revision(user.pk)
+        token.payload.update(user_claims(user), revision=revision)
+        cache_user_state(user.pk, (user.is_active, revision))
+        return token
+
+    # Blacklist checks go through the per-process filter in blacklist.py.
+    # The callers have loaded or authenticated the user already, so rows
+    # are written with the id from the token rather than fetching it again.
+
+    def check_blacklist(self):
+        if revoked_tokens.is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    def outstand(self):
+        return OutstandingToken.objects.get_or_create(jti=self.payload[api_settings.JTI_CLAIM], defaults={
+            'user_id': self.payload.get(api_settings.USER_ID_CLAIM),
+            'created_at': self.current_time,
+            'token': str(self),
+            'expires_at': datetime_from_epoch(self.payload['exp']),
+        })
+
+    def blacklist(self):
+        token = self.outstand()[0]
+        blacklisted = BlacklistedToken.objects.get_or_create(token=token)
+        revoked_tokens.add(token.jti, self.payload['exp'] - time.time())
+        return blacklisted
+
+
+def revoke_tokens(user_id):
+    """Refuse the user's access tokens issued until now."""
+    from .models import TokenRevision
+
+    # A deleted user has no row to revise; their state reads as deleted
+    if get_user_model().objects.filter(pk=user_id).exists():
+        TokenRevision.objects.update_or_create(user_id=user_id, defaults={'revision': time.time_ns()})
+    cache.delete(USER_STATE_KEY.format(user_id=user_id))
+
+
+def user_from_claims(token, is_active):
+    from .models import ClaimsUser
+
+    values = {
+        # simplejwt stores the id as a string
+        'id': ClaimsUser._meta.pk.to_python(token[api_settings.USER_ID_CLAIM]),
+        'is_active': is_active,
+        **{name: token[name] for name in USER_CLAIMS},
+    }
+    fields = [field.attname for field in ClaimsUser._meta.concrete_fields if field.attname in values]
+    user = ClaimsUser.from_db(DEFAULT_DB_ALIAS, fields, [values[name] for name in fields])
+    for name in PROFILE_CLAIMS:
+        setattr(user, name, token[name])
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if 'user_type' not in validated_token:
+            return super().get_user(validated_token)
+        state = user_state(validated_token[api_settings.USER_ID_CLAIM])
+        if state is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        is_active, revision = state
+        if not is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if validated_token.get('revision') != revision:
+            raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+        return user_from_claims(validated_token, is_active)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """TokenRefreshSerializer that re-reads the user and renews the claims."""
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        # Before the user: a revocation committed in between must win
+        revision = stored_revision(user_id)
+        user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        refresh.payload.update(user_claims(user), revision=revision)
+        cache_user_state(user.pk, (user.is_active, revision))
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # token_blacklist app not installed
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
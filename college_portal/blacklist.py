@@ -0,0 +1,199 @@
+"""
+Refresh-token blacklist checks without a query per refresh, and pruning.
+
+simplejwt's token_blacklist app records every refresh token issued
+(OutstandingToken) and every one revoked by rotation or logout
+(BlacklistedToken), and checks the table on each refresh. Here each
+process keeps a Bloom filter of the JTIs blacklisted and not yet expired:
+a JTI the filter has never seen is not blacklisted, and only the few it
+may have seen (1% false positives at CAPACITY) are looked up in the
+table, which stays the source of truth.
+
+The filter is loaded from the table on first use and then picks up rows
+added since, by id, at most every SYNC_INTERVAL seconds. To cover that
+gap for tokens blacklisted by another process, blacklisting also leaves
+a marker in the shared cache for a while. Expired tokens fail
+verification anyway, so expired rows can go: every PRUNE_INTERVAL
+seconds one process deletes them in batches of PRUNE_BATCH on a
+background thread, and then reloads its filter. ``manage.py
+prune_tokens`` does the same from cron.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Unexpired blacklisted tokens the filter is sized for, and its false
+    # positive rate at that size; it is rebuilt larger when outgrown
+    'CAPACITY': 1_000_000,
+    'ERROR_RATE': 0.01,
+    # Seconds between picking up tokens blacklisted by other processes
+    'SYNC_INTERVAL': 5,
+    # Seconds between deletions of expired tokens, and rows per DELETE
+    'PRUNE_INTERVAL': 60 * 60,
+    'PRUNE_BATCH': 5000,
+}
+
+MARKER_KEY = 'jwt:blacklisted:{jti}'
+PRUNE_LOCK_KEY = 'jwt:blacklist:prune'
+
+
+def blacklist_options():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_BLACKLIST', {})}
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + index * second) % self.size for index in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevokedTokens:
+    """This process's view of the blacklist."""
+
+    def __init__(self, options):
+        self.options = options
+        self._lock = threading.Lock()
+        self._filter = None
+        self._last_id = 0
+        self._synced = 0
+        self._pruned = time.monotonic()
+
+    def _load(self):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        rows = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        last_id = BlacklistedToken.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        count = rows.count()
+        bloom = BloomFilter(max(self.options['CAPACITY'], count * 2), self.options['ERROR_RATE'])
+        for jti in rows.filter(id__lte=last_id).values_list('token__jti', flat=True).iterator(chunk_size=10000):
+            bloom.add(jti)
+        return bloom, last_id
+
+    def _sync(self):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        now = time.monotonic()
+        if self._filter is not None and now - self._synced < self.options['SYNC_INTERVAL']:
+            return
+        with self._lock:
+            if self._filter is not None and now - self._synced < self.options['SYNC_INTERVAL']:
+                return
+            if self._filter is None:
+                self._filter, self._last_id = self._load()
+            else:
+                rows = BlacklistedToken.objects.filter(id__gt=self._last_id).order_by('id')
+                for row_id, jti in rows.values_list('id', 'token__jti'):
+                    self._filter.add(jti)
+                    self._last_id = row_id
+                if self._filter.count > self._filter.capacity:
+                    self._filter, self._last_id = self._load()
+            self._synced = now
+
+    def is_blacklisted(self, jti):
+        """Whether ``jti`` is blacklisted; a query only for Bloom filter hits."""
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        self._sync()
+        self._maybe_prune()
+        if cache.get(MARKER_KEY.format(jti=jti)) is not None:
+            return True
+        return jti in self._filter and BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    def add(self, jti, expires_in):
+        """Record that ``jti`` was blacklisted, once the transaction commits."""
+        def record():
+            with self._lock:
+                if self._filter is not None:
+                    self._filter.add(jti)
+            # Until every process has synced the row
+            timeout = min(expires_in, self.options['SYNC_INTERVAL'] * 2 + 60)
+            if timeout > 0:
+                cache.set(MARKER_KEY.format(jti=jti), 1, timeout)
+        transaction.on_commit(record)
+
+    def reload(self):
+        with self._lock:
+            self._filter, self._last_id = self._load()
+            self._synced = time.monotonic()
+
+    def _maybe_prune(self):
+        now = time.monotonic()
+        if now - self._pruned < self.options['PRUNE_INTERVAL']:
+            return
+        self._pruned = now
+        # One process per interval
+        if cache.add(PRUNE_LOCK_KEY, 1, self.options['PRUNE_INTERVAL']):
+            threading.Thread(target=self._prune_in_background, name='token-prune', daemon=True).start()
+
+    def _prune_in_background(self):
+        try:
+            deleted = prune_expired_tokens(self.options['PRUNE_BATCH'])
+            self.reload()
+            logger.info('Pruned %d expired outstanding and %d blacklisted tokens', *deleted)
+        except Exception:
+            logger.exception('Pruning expired tokens failed')
+        finally:
+            connections.close_all()
+
+    def stats(self):
+        bloom = self._filter
+        return {
+            'loaded': bloom is not None,
+            'entries': bloom.count if bloom else 0,
+            'capacity': bloom.capacity if bloom else self.options['CAPACITY'],
+            'bytes': len(bloom.bits) if bloom else 0,
+        }
+
+
+revoked_tokens = RevokedTokens(blacklist_options())
+
+
+def prune_expired_tokens(batch_size=None):
+    """
+    Delete expired blacklisted and outstanding tokens, ``batch_size`` rows
+    per statement; ``(outstanding, blacklisted)`` rows deleted.
+    """
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+    batch_size = batch_size or blacklist_options()['PRUNE_BATCH']
+    now = timezone.now()
+    deleted = [0, 0]
+    # Blacklisted rows first, so the outstanding ones have nothing to cascade to.
+    # Tokens expire in the order they were issued: the expired ones are the
+    # lowest ids, which the primary key finds without an index on expires_at.
+    for index, model, expired in [
+        (1, BlacklistedToken, BlacklistedToken.objects.filter(token__expires_at__lte=now)),
+        (0, OutstandingToken, OutstandingToken.objects.filter(expires_at__lte=now)),
+    ]:
+        while True:
+            ids = list(expired.order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted[index] += model.objects.filter(id__in=ids).delete()[1].get(model._meta.label, 0)
+    return tuple(deleted)
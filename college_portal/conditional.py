@@ -0,0 +1,58 @@
+"""
+HTTP conditional GET (ETag) for polled read endpoints.
+
+ETags are computed with one aggregate query over the rows a response
+would contain (row count plus the newest timestamps), so an unchanged
+resource is answered with 304 Not Modified before anything is serialized.
+There is no Last-Modified: the newest timestamp does not move when a row
+is deleted or leaves the filter (a notice deactivated), and clients
+validating on it would get 304 for a list that shrank. The ETag also
+hashes the row count.
+Views authenticate through DRF, so this runs inside the view rather than
+as Django's ``condition`` decorator, which would see an anonymous user.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+from .reference_cache import reference_cache
+
+
+def make_etag(*parts):
+    payload = json.dumps(parts, cls=DjangoJSONEncoder, sort_keys=True)
+    return quote_etag(hashlib.md5(payload.encode()).hexdigest())
+
+
+def queryset_etag(request, queryset, timestamp_fields, namespaces=(), resource=None):
+    """
+    Return the ETag of ``queryset``, from one aggregate query.
+
+    ``timestamp_fields`` are the columns bumped by inserts and updates;
+    deletions show up in the row count. ``namespaces`` are reference cache
+    namespaces whose names the serialized rows include. ``resource`` keys
+    the ETag instead of the request's path, for rows served at two URLs.
+    """
+    aggregates = {f'max_{field}': Max(field) for field in timestamp_fields}
+    values = queryset.order_by().aggregate(count=Count('pk'), **aggregates)
+    versions = [reference_cache.version(namespace) for namespace in sorted(namespaces)]
+    return make_etag(resource or request.get_full_path(), values, versions)
+
+
+def conditional_response(request, etag, build):
+    """
+    Answer 304 if the client already holds this version, otherwise call
+    ``build()`` and stamp the ETag on its response.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        # Per-user data: let browsers keep it but always revalidate
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+    return response
@@ -0,0 +1,183 @@
+"""
+Dashboard aggregation and caching.
+
+Each dashboard is cached per user together with the versions of the
+"scopes" it was built from (``admin``, ``teacher:<id>``, ``student:<id>``,
+``class:<id>``). Writes to the models shown on dashboards bump the
+versions of the scopes they touch, so a cached dashboard is served until
+something it depends on changes, or until DASHBOARD_CACHE_TTL expires.
+That includes the students, teachers, classes and subjects behind the
+count cards, and a teacher's subjects.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, Value
+
+from .conditional import make_etag
+
+ENTRY_KEY = 'dashboard:{role}:{user_id}'
+SCOPE_KEY = 'dashboard:scope:{scope}'
+
+
+def aggregate_many(**parts):
+    """
+    Evaluate several single-value aggregates in one round trip.
+
+    Each keyword maps a name to a ``(queryset, aggregate)`` pair; the
+    queries are combined with UNION ALL. Returns ``{name: value}`` with 0
+    for empty results.
+    """
+    querysets = [
+        queryset.order_by()
+        .annotate(stat=Value(name, output_field=CharField()))
+        .values('stat')
+        .annotate(value=aggregate)
+        .values_list('stat', 'value')
+        for name, (queryset, aggregate) in parts.items()
+    ]
+    first, *rest = querysets
+    values = dict(first.union(*rest, all=True)) if rest else dict(first)
+    return {name: values.get(name) or 0 for name in parts}
+
+
+def _ttl():
+    return getattr(settings, 'DASHBOARD_CACHE_TTL', 60)
+
+
+def scope_versions(scopes):
+    """Snapshot the current version of each scope; call before building."""
+    keys = {scope: SCOPE_KEY.format(scope=scope) for scope in scopes}
+    current = cache.get_many(list(keys.values()))
+    missing = [key for key in keys.values() if key not in current]
+    if missing:
+        # Never set or evicted: start a new version, as reference_cache does.
+        # Reading it as a constant would revalidate entries stamped with it.
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        current.update(cache.get_many(missing))
+    return {scope: current.get(key) for scope, key in keys.items()}
+
+
+def get_cached_dashboard(user):
+    """Return the current ``{'versions', 'data', 'etag'}`` entry for ``user``, or None."""
+    entry = cache.get(ENTRY_KEY.format(role=user.user_type, user_id=user.pk))
+    if entry is None:
+        return None
+    if scope_versions(entry['versions']) != entry['versions']:
+        return None
+    return entry
+
+
+def cache_dashboard(user, data, versions):
+    """
+    Store ``data`` for ``user``; ``versions`` comes from scope_versions().
+    The entry's ETag hashes the data itself, so a rebuild that produces the
+    same dashboard keeps validating clients' copies.
+    """
+    entry = {'versions': versions, 'data': data, 'etag': make_etag(user.pk, data)}
+    cache.set(ENTRY_KEY.format(role=user.user_type, user_id=user.pk), entry, _ttl())
+    return entry
+
+
+def invalidate_scopes(scopes):
+    """Bump the given scopes once the current transaction commits."""
+    scopes = set(scopes)
+    if not scopes:
+        return
+
+    def bump():
+        # A fresh value instead of incr(), which fails on an evicted key;
+        # scope_versions() seeds evicted keys with fresh values likewise
+        version = time.time_ns()
+        cache.set_many({SCOPE_KEY.format(scope=scope): version for scope in scopes}, None)
+
+    transaction.on_commit(bump)
+
+
+def scopes_for(instance):
+    """The dashboard scopes whose data depends on ``instance``."""
+    from .models import (
+        Assignment, AssignmentSubmission, Attendance, Class, Notice, Result, Schedule, Student, Subject, Teacher,
+    )
+
+    if isinstance(instance, Attendance):
+        return [f'teacher:{instance.teacher_id}', f'student:{instance.student_id}']
+    if isinstance(instance, Result):
+        return ['admin', f'student:{instance.student_id}']
+    if isinstance(instance, Notice):
+        return ['admin']
+    if isinstance(instance, (Assignment, Schedule)):
+        return [f'teacher:{instance.teacher_id}', f'class:{instance.class_assigned_id}']
+    if isinstance(instance, AssignmentSubmission):
+        return [f'student:{instance.student_id}']
+    # Count cards; class teachers come from class_teacher_scopes()
+    if isinstance(instance, Student):
+        return ['admin', f'student:{instance.id}']
+    if isinstance(instance, Teacher):
+        return ['admin', f'teacher:{instance.id}']
+    if isinstance(instance, Class):
+        return ['admin', f'class:{instance.id}']
+    if isinstance(instance, Subject):
+        return ['admin']
+    return []
+
+
+def class_teacher_scopes(instances):
+    """
+    ``teacher:<id>`` scopes of the class teachers whose class and student
+    counts the Student and Class ``instances`` change, before the write
+    (``_previous_owner``, see signals.py) as well as after. One query.
+    """
+    from django.db.models import Q
+
+    from .models import Class, Student, Teacher
+
+    class_ids, user_ids = set(), set()
+    for instance in instances:
+        previous = getattr(instance, '_previous_owner', None)
+        if isinstance(instance, Student):
+            class_ids.update({instance.class_enrolled_id, previous} - {None})
+        elif isinstance(instance, Class):
+            user_ids.update({instance.class_teacher_id, previous} - {None})
+    if not class_ids and not user_ids:
+        return set()
+    teacher_ids = Teacher.objects.filter(
+        Q(user_id__in=user_ids) | Q(user_id__in=Class.objects.filter(id__in=class_ids).values('class_teacher_id'))
+    ).values_list('id', flat=True)
+    return {f'teacher:{teacher_id}' for teacher_id in teacher_ids}
+
+
+def result_class_scopes(instances):
+    """
+    ``results:class:<id>`` scopes for the classes whose examinations the
+    Result and Examination ``instances`` belong to (see analytics.py).
+    Examinations not already loaded on a result are looked up in one query.
+    """
+    from .models import Examination, Result
+
+    class_ids = set()
+    examination_ids = set()
+    for instance in instances:
+        if isinstance(instance, Examination):
+            class_ids.add(instance.class_assigned_id)
+        elif isinstance(instance, Result):
+            if Result.examination.is_cached(instance):
+                class_ids.add(instance.examination.class_assigned_id)
+            else:
+                examination_ids.add(instance.examination_id)
+    if examination_ids:
+        class_ids.update(
+            Examination.objects.filter(id__in=examination_ids).values_list('class_assigned_id', flat=True)
+        )
+    return {f'results:class:{class_id}' for class_id in class_ids}
+
+
+def invalidate_instances(instances):
+    instances = list(instances)
+    scopes = set()
+    for instance in instances:
+        scopes.update(scopes_for(instance))
+    invalidate_scopes(scopes | result_class_scopes(instances) | class_teacher_scopes(instances))
@@ -0,0 +1,197 @@
+"""
+Streaming CSV / NDJSON exports of attendance and results.
+
+Rows are read with values_list() over the joined names and
+iterator(chunk_size=EXPORT_CHUNK_SIZE), and each chunk is encoded and
+handed to the StreamingHttpResponse before the next one is fetched, so an
+export starts sending immediately and holds one chunk in memory however
+many rows it covers.
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import BaseRenderer
+
+# (column name, values_list path)
+ATTENDANCE_COLUMNS = [
+    ('id', 'id'),
+    ('date', 'date'),
+    ('student_id', 'student__student_id'),
+    ('student_first_name', 'student__user__first_name'),
+    ('student_last_name', 'student__user__last_name'),
+    ('class', 'student__class_enrolled__name'),
+    ('section', 'student__class_enrolled__section'),
+    ('department', 'student__class_enrolled__department__code'),
+    ('subject_code', 'subject__code'),
+    ('subject', 'subject__name'),
+    ('teacher_employee_id', 'teacher__employee_id'),
+    ('is_present', 'is_present'),
+    ('remarks', 'remarks'),
+]
+
+RESULT_COLUMNS = [
+    ('id', 'id'),
+    ('exam_date', 'examination__date'),
+    ('examination', 'examination__name'),
+    ('exam_type', 'examination__exam_type'),
+    ('student_id', 'student__student_id'),
+    ('student_first_name', 'student__user__first_name'),
+    ('student_last_name', 'student__user__last_name'),
+    ('class', 'examination__class_assigned__name'),
+    ('section', 'examination__class_assigned__section'),
+    ('department', 'examination__class_assigned__department__code'),
+    ('subject_code', 'examination__subject__code'),
+    ('subject', 'examination__subject__name'),
+    ('marks_obtained', 'marks_obtained'),
+    ('total_marks', 'examination__total_marks'),
+    ('grade', 'grade'),
+    ('remarks', 'remarks'),
+]
+
+# Query parameter -> lookup, per export
+ATTENDANCE_FILTERS = {
+    'department': 'student__class_enrolled__department_id',
+    'class': 'student__class_enrolled_id',
+    'subject': 'subject_id',
+    'date_from': 'date__gte',
+    'date_to': 'date__lte',
+}
+
+RESULT_FILTERS = {
+    'department': 'examination__class_assigned__department_id',
+    'class': 'examination__class_assigned_id',
+    'subject': 'examination__subject_id',
+    'date_from': 'examination__date__gte',
+    'date_to': 'examination__date__lte',
+}
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def parse_filters(params, lookups):
+    """Turn query parameters into queryset filters, raising ValidationError on bad input."""
+    filters = {}
+    errors = {}
+    for param, lookup in lookups.items():
+        value = params.get(param)
+        if not value:
+            continue
+        if param.startswith('date_'):
+            try:
+                parsed = parse_date(value)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                errors[param] = 'Expected a date (YYYY-MM-DD).'
+                continue
+            filters[lookup] = parsed
+        elif value.isdecimal():
+            # isdigit() also accepts superscripts and the like, which int() rejects
+            filters[lookup] = int(value)
+        else:
+            errors[param] = 'Expected an id.'
+    if errors:
+        raise ValidationError(errors)
+    return filters
+
+
+def iter_rows(queryset, columns):
+    paths = [path for _, path in columns]
+    # Sorted on the primary key so the export is stable and needs no sort buffer
+    return queryset.order_by('pk').values_list(*paths).iterator(chunk_size=_chunk_size())
+
+
+def _chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_csv(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    yield buffer.getvalue()
+    for chunk in _chunked(rows, _chunk_size()):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+
+def stream_ndjson(rows, columns):
+    names = [name for name, _ in columns]
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for chunk in _chunked(rows, _chunk_size()):
+        yield ''.join(encoder.encode(dict(zip(names, row))) + '\n' for row in chunk)
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Lets content negotiation pick CSV (``Accept: text/csv`` or
+    ``?format=csv``). Exports stream past renderers; this only renders
+    error payloads, as ``field,message`` rows.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        items = data.items() if isinstance(data, dict) else [('error', data)]
+        for field, messages in items:
+            for message in messages if isinstance(messages, list) else [messages]:
+                writer.writerow([field, message])
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, cls=DjangoJSONEncoder) + '\n').encode(self.charset)
+
+
+# Negotiated format -> (encoder, content type)
+STREAMS = {
+    'csv': (stream_csv, CSVRenderer.media_type),
+    'ndjson': (stream_ndjson, NDJSONRenderer.media_type),
+}
+
+
+def export_response(request, name, queryset, columns, lookups):
+    """
+    Stream ``queryset`` as CSV, or NDJSON when negotiated, filtered by the
+    ``lookups`` query parameters.
+    """
+    output = request.accepted_renderer.format
+    if output not in STREAMS:
+        output = 'csv'
+
+    encode, media_type = STREAMS[output]
+    rows = iter_rows(queryset.filter(**parse_filters(request.query_params, lookups)), columns)
+    response = StreamingHttpResponse(encode(rows, columns), content_type=f'{media_type}; charset=utf-8')
+    filename = f'{name}-{timezone.now():%Y%m%d-%H%M%S}.{output}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
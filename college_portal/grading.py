@@ -0,0 +1,126 @@
+"""
+Grade computation for examination results.
+
+Grade boundaries come from ``settings.GRADE_BOUNDARIES``, a list of
+``(minimum_percentage, grade)`` pairs. Single results are graded with a
+bisect over the boundaries; whole examinations or terms are regraded with
+NumPy's searchsorted over the marks and written back with one bulk_update().
+"""
+import time
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+DEFAULT_GRADE_BOUNDARIES = [
+    (90, 'A+'),
+    (80, 'A'),
+    (70, 'B+'),
+    (60, 'B'),
+    (50, 'C'),
+    (0, 'F'),
+]
+
+REGRADE_BATCH_SIZE = 500
+
+
+def get_grade_boundaries():
+    """
+    Return ``(thresholds, grades)`` sorted by ascending threshold.
+    """
+    boundaries = sorted(getattr(settings, 'GRADE_BOUNDARIES', DEFAULT_GRADE_BOUNDARIES))
+    if not boundaries or boundaries[0][0] > 0:
+        raise ImproperlyConfigured('GRADE_BOUNDARIES must include a grade for 0%.')
+    thresholds = [float(minimum) for minimum, grade in boundaries]
+    grades = [grade for minimum, grade in boundaries]
+    return thresholds, grades
+
+
+def percentage(marks_obtained, total_marks):
+    if not total_marks or total_marks <= 0:
+        return 0.0
+    return (marks_obtained / total_marks) * 100
+
+
+def grade_for(marks_obtained, total_marks):
+    thresholds, grades = get_grade_boundaries()
+    index = bisect_right(thresholds, percentage(marks_obtained, total_marks)) - 1
+    return grades[max(index, 0)]
+
+
+def grade_array(marks_obtained, total_marks):
+    """
+    Grade many results at once. Both arguments are sequences of equal length.
+    """
+    import numpy as np
+
+    thresholds, grades = get_grade_boundaries()
+    marks = np.asarray(marks_obtained, dtype=float)
+    totals = np.asarray(total_marks, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentages = np.where(totals > 0, marks / totals * 100, 0.0)
+
+    # Same semantics as grade_for(): the highest threshold <= percentage
+    indexes = np.searchsorted(np.asarray(thresholds), percentages, side='right') - 1
+    return np.asarray(grades, dtype=object)[np.clip(indexes, 0, None)]
+
+
+def regrade_results(queryset):
+    """
+    Recompute the grade of every result in ``queryset`` and save the ones
+    that changed. Returns a dict with ``rows``, ``updated`` and ``seconds``.
+    """
+    from .dashboard import invalidate_instances
+    from .models import Result
+    from .realtime import publish_instances
+
+    start = time.perf_counter()
+    rows = list(queryset.values_list(
+        'id', 'marks_obtained', 'examination__total_marks', 'grade', 'student_id', 'examination_id',
+    ))
+    updated = []
+
+    if rows:
+        ids, marks, totals, current, student_ids, examination_ids = zip(*rows)
+        now = timezone.now()
+        for result_id, old_grade, new_grade, student_id, examination_id, marks_obtained in zip(
+            ids, current, grade_array(marks, totals), student_ids, examination_ids, marks,
+        ):
+            if old_grade != new_grade:
+                updated.append(Result(
+                    id=result_id, grade=new_grade, updated_at=now, student_id=student_id,
+                    examination_id=examination_id, marks_obtained=marks_obtained,
+                ))
+        with transaction.atomic():
+            Result.objects.bulk_update(updated, ['grade', 'updated_at'], batch_size=REGRADE_BATCH_SIZE)
+            # bulk_update() sends no post_save signals
+            invalidate_instances(updated)
+            publish_instances(updated, created=False)
+
+    return {
+        'rows': len(rows),
+        'updated': len(updated),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def regrade_examination(examination):
+    from .models import Result
+
+    return regrade_results(Result.objects.filter(examination=examination))
+
+
+def regrade_term(academic_year, semester=None):
+    """
+    Regrade every result of a term: the examinations of classes in
+    ``academic_year``, optionally narrowed to one subject semester.
+    """
+    from .models import Result
+
+    queryset = Result.objects.filter(examination__class_assigned__academic_year=academic_year)
+    if semester is not None:
+        queryset = queryset.filter(examination__subject__semester=semester)
+    return regrade_results(queryset)
@@ -0,0 +1,101 @@
+"""
+Password hashing for bulk writes, and the cost of a hash.
+
+make_password() is deliberately slow (PBKDF2, ~0.3 s per call with the
+default iteration count), so hashing thousands of passwords one after the
+other dominates an import. hash_passwords() spreads the work over a
+process pool; workers set Django up from DJANGO_SETTINGS_MODULE so the
+configured PASSWORD_HASHERS apply.
+
+ConfigurablePBKDF2PasswordHasher is Django's PBKDF2 hasher with the
+iteration count taken from the PASSWORD_ITERATIONS setting. It keeps the
+``pbkdf2_sha256`` algorithm name, so existing hashes verify unchanged and
+are rehashed to the configured count on the user's next login (see
+login.py).
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        # None keeps Django's default, which rises with each release
+        return getattr(settings, 'PASSWORD_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
+
+
+def _init_worker(settings_module):
+    if settings_module:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def password_workers(workers=None):
+    if workers is None:
+        workers = getattr(settings, 'IMPORT_PASSWORD_WORKERS', None)
+    return workers or os.cpu_count() or 1
+
+
+class LazyPool:
+    """
+    A ProcessPoolExecutor started on the first map(), so imports that hash
+    nothing (dry runs, files without passwords) never fork workers.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+
+    def map(self, fn, iterable, chunksize=1):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE'),),
+            )
+        return self._executor.map(fn, iterable, chunksize=chunksize)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+@contextmanager
+def password_pool(workers=None):
+    """
+    Yield a LazyPool for hash_passwords(), or None when only one worker is
+    available and hashing should stay in this process.
+    """
+    workers = password_workers(workers)
+    if workers <= 1:
+        yield None
+        return
+    pool = LazyPool(workers)
+    try:
+        yield pool
+    finally:
+        pool.shutdown()
+
+
+def hash_passwords(passwords, pool=None):
+    """
+    make_password() for each of ``passwords``, in ``pool`` when given.
+    None gives an unusable password, without a round trip to a worker.
+    """
+    hashed = [make_password(None) if password is None else None for password in passwords]
+    todo = [index for index, password in enumerate(passwords) if password is not None]
+    if pool is None or len(todo) < 2:
+        values = map(make_password, (passwords[index] for index in todo))
+    else:
+        # A few batches per worker keeps them busy without pickling per password
+        chunksize = max(1, len(todo) // (password_workers() * 4))
+        values = pool.map(make_password, [passwords[index] for index in todo], chunksize=chunksize)
+    for index, value in zip(todo, values):
+        hashed[index] = value
+    return hashed
@@ -0,0 +1,335 @@
+"""
+Bulk import of student rosters and exam marks from CSV or XLSX files.
+
+Files are read row by row and processed in chunks of IMPORT_CHUNK_SIZE.
+Each chunk is validated as a whole: classes are resolved from a map
+loaded once, and uniqueness (usernames, student ids, roll numbers,
+students and examinations for marks) is checked with one query per
+chunk. Passwords are hashed in a process pool (see hashing.py) and valid
+rows are inserted with bulk_create(); invalid rows are skipped and
+reported by their line number in the file.
+"""
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+
+from .dashboard import invalidate_instances, invalidate_scopes
+from .hashing import hash_passwords, password_pool
+from .models import Class, Examination, Result, Student, User
+from .realtime import publish_instances
+
+# Columns read into User and Student, validated with the model fields
+STUDENT_USER_COLUMNS = ['username', 'email', 'first_name', 'last_name', 'phone', 'address', 'date_of_birth']
+STUDENT_COLUMNS = ['student_id', 'roll_number', 'admission_date', 'guardian_name', 'guardian_phone', 'guardian_email']
+RESULT_COLUMNS = ['student_id', 'examination_id', 'marks_obtained', 'remarks']
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be read (format, encoding, corrupt workbook)."""
+
+
+def _chunk_size():
+    return getattr(settings, 'IMPORT_CHUNK_SIZE', 1000)
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store roll numbers and phone numbers as floats
+        return str(int(value))
+    return str(value).strip()
+
+
+def _parse_id(value):
+    """The integer in ``value``, or None; '²' passes isdigit() but not int()."""
+    return int(value) if value.isdecimal() else None
+
+
+def _read_csv(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(text)
+        header = [name.strip().lower() for name in next(reader, [])]
+        for number, values in enumerate(reader, start=2):
+            if any(values):
+                yield number, dict(zip(header, (value.strip() for value in values)))
+    except UnicodeDecodeError:
+        raise ImportFileError('CSV files must be UTF-8 encoded.')
+    finally:
+        # Leave the caller's file open
+        text.detach()
+
+
+def _read_xlsx(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError('Reading .xlsx files requires openpyxl (pip install openpyxl).')
+
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except (OSError, ValueError, zipfile.BadZipFile):
+        raise ImportFileError('Not a readable .xlsx workbook.')
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_cell(name).lower() for name in next(rows, ())]
+        for number, values in enumerate(rows, start=2):
+            values = [_cell(value) for value in values]
+            if any(values):
+                yield number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def read_rows(fileobj, filename):
+    """Yield ``(line number, {column: text})`` for each data row of a CSV or XLSX file."""
+    name = filename.lower()
+    if name.endswith('.csv'):
+        return _read_csv(fileobj)
+    if name.endswith('.xlsx'):
+        return _read_xlsx(fileobj)
+    raise ImportFileError('Expected a .csv or .xlsx file.')
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _clean(model, name, value, errors):
+    """Validate ``value`` with the model field's own rules, recording failures in ``errors``."""
+    field = model._meta.get_field(name)
+    if value in ('', None):
+        if not field.blank:
+            errors[name] = 'This field is required.'
+        return None if field.null else ''
+    try:
+        return field.clean(value, None)
+    except DjangoValidationError as exc:
+        errors[name] = ' '.join(exc.messages)
+
+
+def _class_map():
+    """Class ids by id and by (name, section, academic_year), plus each class's teacher."""
+    by_key = {}
+    teachers = {}
+    rows = Class.objects.values_list('id', 'name', 'section', 'academic_year', 'class_teacher__teacher__id')
+    for class_id, name, section, academic_year, teacher_id in rows:
+        by_key[str(class_id)] = class_id
+        by_key[(name.lower(), section.lower(), academic_year.lower())] = class_id
+        teachers[class_id] = teacher_id
+    return by_key, teachers
+
+
+def _resolve_class(row, classes, errors):
+    if row.get('class_id'):
+        class_id = classes.get(row['class_id'])
+        if class_id is None:
+            errors['class_id'] = 'Unknown class.'
+        return class_id
+    key = tuple(row.get(column, '').lower() for column in ('class_name', 'section', 'academic_year'))
+    if not all(key):
+        errors['class'] = 'Give class_id, or class_name, section and academic_year.'
+        return None
+    class_id = classes.get(key)
+    if class_id is None:
+        errors['class'] = 'Unknown class.'
+    return class_id
+
+
+def _report(rows, saved, errors):
+    return {'rows': rows, 'saved': saved, 'errors': errors}
+
+
+def import_student_rows(rows, dry_run=False, chunk_size=None, workers=None):
+    """
+    Create a User and Student for each row. Returns ``{'rows', 'saved',
+    'errors'}`` where each error is ``{'row': line number, 'errors':
+    {column: message}}``. Blank passwords get an unusable password.
+    """
+    classes, class_teachers = _class_map()
+    seen_usernames, seen_student_ids, seen_rolls = {}, {}, {}
+    total = saved = 0
+    errors = []
+    touched_classes = set()
+
+    with password_pool(workers) as pool:
+        for chunk in _chunks(rows, chunk_size or _chunk_size()):
+            total += len(chunk)
+            parsed = []
+            for number, row in chunk:
+                row_errors = {}
+                user = {name: _clean(User, name, row.get(name, ''), row_errors) for name in STUDENT_USER_COLUMNS}
+                student = {name: _clean(Student, name, row.get(name, ''), row_errors) for name in STUDENT_COLUMNS}
+                student['class_enrolled_id'] = _resolve_class(row, classes, row_errors)
+
+                if not row_errors:
+                    # Duplicates within the file
+                    keys = [
+                        ('username', seen_usernames, user['username']),
+                        ('student_id', seen_student_ids, student['student_id']),
+                        ('roll_number', seen_rolls, (student['class_enrolled_id'], student['roll_number'])),
+                    ]
+                    for column, seen, key in keys:
+                        if key in seen:
+                            row_errors[column] = f'Duplicate of row {seen[key]}.'
+                    if not row_errors:
+                        for _, seen, key in keys:
+                            seen[key] = number
+                parsed.append((number, user, student, row.get('password') or None, row_errors))
+
+            # Duplicates against the database, one query per kind
+            usernames = {user['username'] for _, user, _, _, row_errors in parsed if not row_errors}
+            student_ids = {student['student_id'] for _, _, student, _, row_errors in parsed if not row_errors}
+            class_ids = {student['class_enrolled_id'] for _, _, student, _, row_errors in parsed if not row_errors}
+            rolls = {student['roll_number'] for _, _, student, _, row_errors in parsed if not row_errors}
+            taken_usernames = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+            taken_student_ids = set(Student.objects.filter(student_id__in=student_ids).values_list('student_id', flat=True))
+            taken_rolls = set(
+                Student.objects.filter(class_enrolled_id__in=class_ids, roll_number__in=rolls)
+                .values_list('class_enrolled_id', 'roll_number')
+            )
+
+            valid = []
+            for number, user, student, password, row_errors in parsed:
+                if not row_errors:
+                    if user['username'] in taken_usernames:
+                        row_errors['username'] = 'A user with this username already exists.'
+                    if student['student_id'] in taken_student_ids:
+                        row_errors['student_id'] = 'A student with this student id already exists.'
+                    if (student['class_enrolled_id'], student['roll_number']) in taken_rolls:
+                        row_errors['roll_number'] = 'This roll number is already taken in the class.'
+                if row_errors:
+                    errors.append({'row': number, 'errors': row_errors})
+                else:
+                    valid.append((number, user, student, password))
+
+            if dry_run:
+                saved += len(valid)
+                continue
+            if not valid:
+                continue
+
+            passwords = hash_passwords([password for _, _, _, password in valid], pool)
+            users = [
+                User(user_type='student', password=hashed, **user)
+                for (_, user, _, _), hashed in zip(valid, passwords)
+            ]
+            try:
+                with transaction.atomic():
+                    users = User.objects.bulk_create(users)
+                    if users and users[0].pk is None:
+                        # Backends that cannot return ids from a bulk insert
+                        ids = dict(User.objects.filter(username__in=[u.username for u in users]).values_list('username', 'id'))
+                        for created in users:
+                            created.pk = ids[created.username]
+                    Student.objects.bulk_create([
+                        Student(user_id=created.pk, **student)
+                        for created, (_, _, student, _) in zip(users, valid)
+                    ])
+            except IntegrityError:
+                # Another writer took a username, id or roll number meanwhile
+                errors.extend(
+                    {'row': number, 'errors': {'row': 'Conflicts with a concurrent change; import it again.'}}
+                    for number, _, _, _ in valid
+                )
+                continue
+            saved += len(valid)
+            touched_classes.update(student['class_enrolled_id'] for _, _, student, _ in valid)
+
+    if touched_classes:
+        # bulk_create sends no signals: refresh dashboards counting students
+        scopes = {'admin'} | {f'class:{class_id}' for class_id in touched_classes}
+        scopes |= {f'teacher:{class_teachers[class_id]}' for class_id in touched_classes if class_teachers.get(class_id)}
+        invalidate_scopes(scopes)
+    return _report(total, saved, errors)
+
+
+def import_result_rows(rows, dry_run=False, chunk_size=None):
+    """
+    Create or update a Result for each (student_id, examination_id) row,
+    grading it in memory. Same report as import_student_rows().
+    """
+    seen = {}
+    total = saved = 0
+    errors = []
+
+    for chunk in _chunks(rows, chunk_size or _chunk_size()):
+        total += len(chunk)
+        codes = {row.get('student_id', '') for _, row in chunk}
+        exam_ids = {_parse_id(row.get('examination_id', '')) for _, row in chunk} - {None}
+        students = dict(Student.objects.filter(student_id__in=codes).values_list('student_id', 'id'))
+        exams = dict(Examination.objects.filter(id__in=exam_ids).values_list('id', 'total_marks'))
+
+        results = []
+        for number, row in chunk:
+            row_errors = {}
+            student_id = students.get(row.get('student_id', ''))
+            if student_id is None:
+                row_errors['student_id'] = 'Unknown student.'
+            exam_id = _parse_id(row.get('examination_id', ''))
+            total_marks = exams.get(exam_id)
+            if total_marks is None:
+                row_errors['examination_id'] = 'Unknown examination.'
+            marks = _clean(Result, 'marks_obtained', row.get('marks_obtained', ''), row_errors)
+            if marks is not None and total_marks is not None and not 0 <= marks <= total_marks:
+                row_errors['marks_obtained'] = f'Must be between 0 and {total_marks}.'
+            remarks = _clean(Result, 'remarks', row.get('remarks', ''), row_errors)
+
+            if not row_errors:
+                key = (student_id, exam_id)
+                if key in seen:
+                    row_errors['row'] = f'Duplicate of row {seen[key]}.'
+                else:
+                    seen[key] = number
+            if row_errors:
+                errors.append({'row': number, 'errors': row_errors})
+                continue
+            results.append(Result(
+                student_id=student_id,
+                examination_id=exam_id,
+                marks_obtained=marks,
+                grade=Result.calculate_grade(marks, total_marks),
+                remarks=remarks,
+            ))
+
+        if dry_run or not results:
+            saved += len(results)
+            continue
+        with transaction.atomic():
+            # Which rows the upsert updates, for the events pushed to students
+            existing = set(Result.objects.filter(
+                student_id__in={result.student_id for result in results},
+                examination_id__in={result.examination_id for result in results},
+            ).values_list('student_id', 'examination_id'))
+            Result.objects.bulk_create(
+                results,
+                update_conflicts=True,
+                unique_fields=['student', 'examination'],
+                update_fields=['marks_obtained', 'grade', 'remarks', 'updated_at'],
+            )
+            invalidate_instances(results)
+            created, updated = [], []
+            for result in results:
+                (updated if (result.student_id, result.examination_id) in existing else created).append(result)
+            publish_instances(created, created=True)
+            publish_instances(updated, created=False)
+        saved += len(results)
+
+    return _report(total, saved, errors)
@@ -0,0 +1,142 @@
+"""
+Password checks for AuthViewSet.login that cannot starve other requests.
+
+Verifying a password costs one PBKDF2 hash (hundreds of milliseconds of
+CPU), so a burst of logins used to occupy every worker thread with
+hashing. check_login() instead:
+
+1. Rejects at once a username with MAX_FAILURES failures within
+   FAILURE_TTL seconds (429), and a username/password pair that failed in
+   that window while the stored password stayed the same, without
+   hashing. Cache keys are HMACs under SECRET_KEY, never the password.
+2. Runs the hash on a pool of HASH_WORKERS threads (hashlib releases the
+   GIL while hashing). At most MAX_QUEUE logins wait for a thread; the
+   next one is answered 429 with Retry-After straight away rather than
+   queue behind them, so the rest of the site keeps its CPU.
+3. On success, rehashes a password stored with another hasher or
+   iteration count (PASSWORD_ITERATIONS, see hashing.py) on the same pool,
+   and writes it with an UPDATE: a save() would look like a password
+   change and revoke the user's tokens (see signals.py).
+
+Unknown usernames cost a hash too, as with Django's ModelBackend, so
+response times do not reveal which accounts exist.
+"""
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password, verify_password
+from django.core.cache import cache
+
+DEFAULTS = {
+    # Threads hashing passwords; None leaves one CPU of every two to the rest
+    'HASH_WORKERS': None,
+    # Logins allowed to wait for a hashing thread before 429s
+    'MAX_QUEUE': 64,
+    # Seconds clients are told to wait when shed
+    'RETRY_AFTER': 2,
+    # Seconds failed attempts are remembered, and failures per username in
+    # that window before further attempts are refused
+    'FAILURE_TTL': 15 * 60,
+    'MAX_FAILURES': 10,
+}
+
+
+class LoginFailed(Exception):
+    """Wrong username or password, or an inactive account."""
+
+
+class LoginRefused(Exception):
+    """Not checked: the pool is full or the username is locked out."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def login_options():
+    return {**DEFAULTS, **getattr(settings, 'LOGIN', {})}
+
+
+class HashPool:
+    """A thread pool that refuses work instead of queueing more than ``max_queue`` calls."""
+
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='login-hash')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+
+    def run(self, function, *args):
+        """``function(*args)`` on the pool; None when it is full."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hash_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            options = login_options()
+            workers = options['HASH_WORKERS'] or max(1, (os.cpu_count() or 1) // 2)
+            _pool = HashPool(workers, options['MAX_QUEUE'])
+        return _pool
+
+
+def _digest(*parts):
+    message = '\0'.join(parts).encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def check_login(username, password):
+    """The active user with these credentials; LoginFailed or LoginRefused otherwise."""
+    options = login_options()
+    failures_key = f'login:failures:{_digest(username)}'
+    if cache.get(failures_key, 0) >= options['MAX_FAILURES']:
+        raise LoginRefused('Too many failed login attempts. Try again later.', options['FAILURE_TTL'])
+    user = get_user_model()._default_manager.filter(username=username).first()
+    # Unknown users get the same fake hash as unusable passwords
+    encoded = user.password if user else ''
+    # With the stored hash, so a password reset forgets earlier failures
+    attempt_key = f'login:failed:{_digest(username, password, encoded)}'
+    if cache.get(attempt_key):
+        raise LoginFailed()
+
+    pool = hash_pool()
+    verified = pool.run(verify_password, password, encoded)
+    if verified is None:
+        raise LoginRefused('Too many logins at once. Try again shortly.', options['RETRY_AFTER'])
+    is_correct, must_update = verified
+
+    if not is_correct or not user.is_active:
+        cache.set(attempt_key, True, options['FAILURE_TTL'])
+        cache.add(failures_key, 0, options['FAILURE_TTL'])
+        try:
+            cache.incr(failures_key)
+        except ValueError:
+            # Expired in between
+            pass
+        raise LoginFailed()
+
+    cache.delete(failures_key)
+    if must_update:
+        # Left for a later login when the pool is busy
+        rehashed = pool.run(make_password, password)
+        if rehashed is not None:
+            type(user)._default_manager.filter(pk=user.pk, password=encoded).update(password=rehashed)
+            user.password = rehashed
+    return user
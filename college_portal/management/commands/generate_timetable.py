@@ -0,0 +1,116 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from college_portal.models import Class, Schedule
+from college_portal.timetable_generator import (
+    DEFAULT_DAYS, DEFAULT_PERIODS, WEIGHTS, build_problem, save_timetable, solve,
+)
+
+
+def parse_periods(value):
+    periods = []
+    for period in value.split(','):
+        try:
+            start, end = (datetime.strptime(part.strip(), '%H:%M').time() for part in period.split('-'))
+        except ValueError:
+            raise CommandError(f'Invalid period {period!r}; use HH:MM-HH:MM.')
+        if end <= start:
+            raise CommandError(f'Period {period!r} ends before it starts.')
+        periods.append((start, end))
+    return periods
+
+
+def parse_rooms(value):
+    """``R1,R2,Lab`` or a numeric range ``101-120``, which may be mixed."""
+    rooms = []
+    for part in value.split(','):
+        part = part.strip()
+        first, _, last = part.partition('-')
+        if first.isdecimal() and last.isdecimal():
+            rooms.extend(str(number) for number in range(int(first), int(last) + 1))
+        elif part:
+            rooms.append(part)
+    return list(dict.fromkeys(rooms))
+
+
+class Command(BaseCommand):
+    help = 'Generate a conflict-free weekly timetable for classes from their subjects and teachers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semester', type=int, required=True, help='Semester whose subjects are scheduled.')
+        parser.add_argument('--academic-year', help='Only classes of this academic year, e.g. 2024-25.')
+        parser.add_argument('--department', type=int, help='Only classes of this department id.')
+        parser.add_argument('--class', type=int, action='append', default=[], dest='classes',
+                            help='Class id to schedule; may be repeated.')
+        parser.add_argument('--days', default=','.join(DEFAULT_DAYS), help='Comma-separated weekdays.')
+        parser.add_argument('--periods', default=','.join(f'{s:%H:%M}-{e:%H:%M}' for s, e in DEFAULT_PERIODS),
+                            help='Comma-separated HH:MM-HH:MM periods of each day.')
+        parser.add_argument('--rooms', help='Rooms, e.g. "101-120,Lab 1". Defaults to the rooms already in use.')
+        parser.add_argument('--time-budget', type=float, default=10, help='Seconds per search.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--restarts', type=int, default=1, help='Independent searches; the best one is kept.')
+        parser.add_argument('--workers', type=int, help='Processes running the restarts (default: one each).')
+        parser.add_argument('--replace', action='store_true',
+                            help="Delete the classes' existing schedules before saving.")
+        parser.add_argument('--dry-run', action='store_true', help='Report the scores without saving.')
+
+    def handle(self, *args, **options):
+        days = [day.strip().lower() for day in options['days'].split(',') if day.strip()]
+        # Only the days a Schedule can hold, so no Sunday
+        weekdays = dict(Schedule.WEEKDAY_CHOICES)
+        unknown = [day for day in days if day not in weekdays]
+        if unknown or not days:
+            raise CommandError(f"Unknown weekday(s): {', '.join(unknown) or '(none given)'}")
+        periods = parse_periods(options['periods'])
+        if options['restarts'] < 1:
+            raise CommandError('--restarts must be at least 1.')
+
+        classes = Class.objects.order_by('id')
+        if options['classes']:
+            classes = classes.filter(id__in=options['classes'])
+        if options['academic_year']:
+            classes = classes.filter(academic_year=options['academic_year'])
+        if options['department'] is not None:
+            classes = classes.filter(department_id=options['department'])
+        if not classes.exists():
+            raise CommandError('No classes match.')
+
+        if options['rooms']:
+            rooms = parse_rooms(options['rooms'])
+        else:
+            rooms = sorted(set(Schedule.objects.values_list('room_number', flat=True)))
+        if not rooms:
+            raise CommandError('No rooms; pass --rooms.')
+
+        existing = Schedule.objects.filter(class_assigned__in=classes).count()
+        if existing and not options['replace'] and not options['dry_run']:
+            raise CommandError(f'The classes already have {existing} schedules; pass --replace to overwrite them.')
+
+        problem, unstaffed = build_problem(classes, options['semester'], days, periods, rooms)
+        for class_id, subject_id in unstaffed:
+            self.stderr.write(f'Skipped subject {subject_id} of class {class_id}: no active teacher takes it.')
+        if not problem.lessons:
+            raise CommandError('Nothing to schedule.')
+        capacity = problem.slots * len(rooms)
+        self.stdout.write(
+            f'{len(problem.class_lessons)} classes, {len(problem.lessons)} lessons, '
+            f'{len(problem.teacher_index)} teachers, {len(rooms)} rooms x {problem.slots} periods ({capacity} room-periods)'
+        )
+
+        solution = solve(problem, options['time_budget'], options['seed'], options['restarts'], options['workers'])
+        scores = solution.scores
+        self.stdout.write(
+            f'Best of {options["restarts"]} search(es) (seed {solution.seed}): {solution.iterations:,} moves '
+            f'in {solution.seconds:.2f}s, cost {scores["cost"]}'
+        )
+        for name in WEIGHTS:
+            self.stdout.write(f'  {name}: {scores[name]} (weight {WEIGHTS[name]})')
+
+        if scores['hard']:
+            raise CommandError(f"{scores['hard']} hard constraint violations remain; not saved. "
+                               'Add rooms or periods, or raise --time-budget.')
+        if options['dry_run']:
+            return
+        schedules = save_timetable(problem, solution, days, periods)
+        self.stdout.write(self.style.SUCCESS(f'Saved {len(schedules)} schedules, replacing {existing}.'))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from college_portal.imports import ImportFileError, import_result_rows, import_student_rows, read_rows
+
+IMPORTERS = {
+    'students': import_student_rows,
+    'results': import_result_rows,
+}
+
+
+class Command(BaseCommand):
+    help = 'Import a student roster or exam marks from a CSV or XLSX file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS), help='What the file contains.')
+        parser.add_argument('path', help='Path to a .csv or .xlsx file.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without saving.')
+        parser.add_argument('--chunk-size', type=int, help='Rows validated and inserted at a time (IMPORT_CHUNK_SIZE).')
+        parser.add_argument('--workers', type=int,
+                            help='Processes hashing passwords for students (IMPORT_PASSWORD_WORKERS).')
+        parser.add_argument('--max-errors', type=int, default=50, help='Row errors to print (default 50).')
+
+    def handle(self, *args, **options):
+        kwargs = {'dry_run': options['dry_run'], 'chunk_size': options['chunk_size']}
+        if options['kind'] == 'students':
+            kwargs['workers'] = options['workers']
+
+        start = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                report = IMPORTERS[options['kind']](read_rows(fileobj, options['path']), **kwargs)
+        except (OSError, ImportFileError) as exc:
+            raise CommandError(str(exc))
+        seconds = time.perf_counter() - start
+
+        for error in report['errors'][:options['max_errors']]:
+            details = '; '.join(f'{column}: {message}' for column, message in error['errors'].items())
+            self.stderr.write(f"row {error['row']}: {details}")
+        hidden = len(report['errors']) - options['max_errors']
+        if hidden > 0:
+            self.stderr.write(f'... and {hidden} more row errors')
+
+        verb = 'valid' if options['dry_run'] else 'saved'
+        rate = report['rows'] / seconds if seconds else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['rows']} rows, {report['saved']} {verb}, {len(report['errors'])} with errors "
+            f"in {seconds:.2f}s ({rate:,.0f} rows/s)"
+        ))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from college_portal.blacklist import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted refresh tokens in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Rows deleted per statement (default: TOKEN_BLACKLIST['PRUNE_BATCH']).")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        outstanding, blacklisted = prune_expired_tokens(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {outstanding} outstanding and {blacklisted} blacklisted tokens '
+            f'in {time.perf_counter() - start:.2f}s'
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from college_portal.attendance import rebuild_attendance_summary
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-student, per-subject AttendanceSummary counters from Attendance.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Summary rows inserted per statement.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = rebuild_attendance_summary(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} attendance summaries in {time.perf_counter() - start:.2f}s'
+        ))
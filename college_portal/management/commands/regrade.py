@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from college_portal.grading import regrade_examination, regrade_term
+from college_portal.models import Examination
+
+
+class Command(BaseCommand):
+    help = 'Recompute result grades for examinations or a whole term using GRADE_BOUNDARIES.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exam', type=int, action='append', default=[],
+                            help='Examination id to regrade; may be repeated.')
+        parser.add_argument('--term', help='Academic year of the term to regrade, e.g. 2024-25.')
+        parser.add_argument('--semester', type=int, help='Only regrade subjects of this semester (with --term).')
+
+    def handle(self, *args, **options):
+        if not options['exam'] and not options['term']:
+            raise CommandError('Pass --exam <id> or --term <academic year>.')
+        if options['semester'] is not None and not options['term']:
+            raise CommandError('--semester can only be used with --term.')
+
+        if options['exam']:
+            examinations = Examination.objects.in_bulk(options['exam'])
+            missing = set(options['exam']) - set(examinations)
+            if missing:
+                raise CommandError(f"Examination(s) not found: {', '.join(map(str, sorted(missing)))}")
+            for examination in examinations.values():
+                self._report(str(examination), regrade_examination(examination))
+
+        if options['term']:
+            label = f"term {options['term']}"
+            if options['semester'] is not None:
+                label += f" semester {options['semester']}"
+            self._report(label, regrade_term(options['term'], options['semester']))
+
+    def _report(self, label, stats):
+        rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: {stats['rows']} results, {stats['updated']} regraded "
+            f"in {stats['seconds']:.3f}s ({rate:,.0f} rows/s)"
+        ))
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from .grading import grade_for
 
 class User(AbstractUser):
     USER_TYPE_CHOICES = [
@@ -20,6 +21,22 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.user_type})"
 
+class ClaimsUser(User):
+    """
+    A User built from access token claims (see authentication.py), with
+    the fields the token does not carry deferred. The first access to any
+    of them loads them all in one query.
+    """
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using, fields, from_queryset)
+
 class Department(models.Model):
     name = models.CharField(max_length=100)
     code = models.CharField(max_length=10, unique=True)
@@ -121,13 +138,33 @@ class Attendance(models.Model):
     is_present = models.BooleanField(default=False)
     remarks = models.CharField(max_length=200, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['student', 'subject', 'date']
+        indexes = [
+            # Keyset pagination key, see college_portal.pagination
+            models.Index(fields=['-date', '-id'], name='attendance_date_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.subject} - {self.date}"
 
+class AttendanceSummary(models.Model):
+    """Running present/total counters per student and subject, maintained by
+    the attendance write paths in college_portal.attendance."""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    present = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['student', 'subject']
+
+    def __str__(self):
+        return f"{self.student} - {self.subject}: {self.present}/{self.total}"
+
 class Examination(models.Model):
     EXAM_TYPE_CHOICES = [
         ('midterm', 'Mid Term'),
@@ -147,6 +184,12 @@ class Examination(models.Model):
     passing_marks = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Results are paged by examination date
+            models.Index(fields=['-date', '-id'], name='examination_date_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.subject}"
 
@@ -157,25 +200,18 @@ class Result(models.Model):
     grade = models.CharField(max_length=5, blank=True, null=True)
     remarks = models.CharField(max_length=200, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['student', 'examination']
 
+    @staticmethod
+    def calculate_grade(marks_obtained, total_marks):
+        return grade_for(marks_obtained, total_marks)
+
     def save(self, *args, **kwargs):
         # Auto-calculate grade based on percentage
-        percentage = (self.marks_obtained / self.examination.total_marks) * 100
-        if percentage >= 90:
-            self.grade = 'A+'
-        elif percentage >= 80:
-            self.grade = 'A'
-        elif percentage >= 70:
-            self.grade = 'B+'
-        elif percentage >= 60:
-            self.grade = 'B'
-        elif percentage >= 50:
-            self.grade = 'C'
-        else:
-            self.grade = 'F'
+        self.grade = self.calculate_grade(self.marks_obtained, self.examination.total_marks)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -189,18 +225,47 @@ class Notice(models.Model):
         ('urgent', 'Urgent'),
     ]
     
+    AUDIENCE_CHOICES = [('all', 'Everyone')] + User.USER_TYPE_CHOICES
+
     title = models.CharField(max_length=200)
     content = models.TextField()
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')
-    target_audience = models.CharField(max_length=20, choices=User.USER_TYPE_CHOICES, default='student')
+    # The role the notice is for, narrowed to one department or class when set
+    target_audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES, default='student')
+    target_department = models.ForeignKey(Department, on_delete=models.CASCADE, blank=True, null=True)
+    target_class = models.ForeignKey(Class, on_delete=models.CASCADE, blank=True, null=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='notice_created_id_idx'),
+            models.Index(fields=['is_active', 'target_audience', '-created_at'], name='notice_audience_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+class TokenRevision(models.Model):
+    """When the user's access tokens were last revoked (see authentication.py)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='token_revision')
+    revision = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.user} tokens revision {self.revision}"
+
+class NoticeReadCursor(models.Model):
+    """The newest notice a user has marked read; older ones count as read too."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    last_read_at = models.DateTimeField()
+    last_read_id = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} read up to {self.last_read_at}"
+
 class Assignment(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -227,6 +292,9 @@ class AssignmentSubmission(models.Model):
 
     class Meta:
         unique_together = ['assignment', 'student']
+        indexes = [
+            models.Index(fields=['-submitted_at', '-id'], name='submission_submitted_id_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.submitted_at > self.assignment.due_date:
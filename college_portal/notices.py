@@ -0,0 +1,217 @@
+"""
+Notice audiences, and per-audience notice feeds served from the cache.
+
+A notice is for one audience: the role in target_audience ('all' for
+everyone), narrowed to a class (target_class) or else a department
+(target_department) when one is set. Audiences are named
+
+    role:<audience>                  the role at large
+    department:<id>:<audience>       the role in one department
+    class:<id>:<audience>            the role in one class
+
+A user belongs to the audiences of their role and of 'all', at large, in
+their department and in their class (a student's class, or the classes a
+teacher is class teacher of). Admins read 'any': every notice.
+
+Each audience's feed holds its newest SIZE active notices, serialized,
+and is rebuilt with one query when missing from the cache. Feeds are
+keyed on the version of the ``notices:<audience>`` dashboard scope, which
+writes to a notice of the audience bump (see signals.py); the committing
+process also rebuilds the feed at once. Another worker with its own
+cache (LocMemCache) does not see the bump and serves its feed until
+TIMEOUT, so that is kept as short as DASHBOARD_CACHE_TTL. A user's
+notices are their feeds merged, newest first, with their read cursor
+(NoticeReadCursor) to count the unread ones: two cache get_many calls,
+versions then feeds.
+"""
+import heapq
+from datetime import datetime, timedelta, timezone
+from functools import reduce
+from itertools import islice
+from operator import itemgetter, or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .dashboard import invalidate_scopes, scope_versions
+from .reference_cache import reference_cache
+
+DEFAULTS = {
+    # Notices kept per audience feed, and returned per user
+    'SIZE': 50,
+    # Seconds a feed stays cached; bounds how stale other workers' feeds get
+    'TIMEOUT': 60,
+}
+
+FEED_KEY = 'notices:feed:{audience}:{version}'
+CURSOR_KEY = 'notices:cursor:{user_id}'
+EVERY_NOTICE = 'any'
+# Sort keys and cursors are (microseconds since EPOCH, notice id)
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+# No notice read yet
+NO_CURSOR = (0, 0)
+
+
+def feed_options():
+    return {**DEFAULTS, **getattr(settings, 'NOTICE_FEEDS', {})}
+
+
+def notice_audience(notice):
+    if notice.target_class_id:
+        return f'class:{notice.target_class_id}:{notice.target_audience}'
+    if notice.target_department_id:
+        return f'department:{notice.target_department_id}:{notice.target_audience}'
+    return f'role:{notice.target_audience}'
+
+
+def audience_q(audience):
+    """The filter selecting the notices of ``audience``."""
+    kind, _, rest = audience.partition(':')
+    if kind == EVERY_NOTICE:
+        return Q()
+    if kind == 'role':
+        return Q(target_audience=rest, target_department__isnull=True, target_class__isnull=True)
+    target_id, _, role = rest.partition(':')
+    if kind == 'department':
+        return Q(target_audience=role, target_department=target_id, target_class__isnull=True)
+    return Q(target_audience=role, target_class=target_id)
+
+
+def _class_teacher_classes():
+    from .models import Class
+
+    classes = {}
+    for class_id, user_id in Class.objects.values_list('id', 'class_teacher_id'):
+        classes.setdefault(user_id, []).append(class_id)
+    return classes
+
+
+def user_audiences(user, profile):
+    """The audiences ``user`` reads; ``profile`` is their Teacher or Student row, if any."""
+    if user.is_staff or user.user_type == 'admin':
+        return [EVERY_NOTICE]
+    department_ids, class_ids = [], []
+    if profile and user.user_type == 'student':
+        department_ids, class_ids = [profile.class_enrolled.department_id], [profile.class_enrolled_id]
+    elif profile and user.user_type == 'teacher':
+        department_ids = [profile.department_id]
+        class_ids = reference_cache.get_or_set(
+            'notices:class_teachers', ['class'], _class_teacher_classes,
+        ).get(user.pk, [])
+    audiences = []
+    for role in ['all', user.user_type]:
+        audiences.append(f'role:{role}')
+        audiences += [f'department:{department_id}:{role}' for department_id in department_ids]
+        audiences += [f'class:{class_id}:{role}' for class_id in class_ids]
+    return audiences
+
+
+def visible_notices_q(user, profile):
+    """The filter selecting every notice ``user`` may read."""
+    return reduce(or_, (audience_q(audience) for audience in user_audiences(user, profile)))
+
+
+def _sort_key(notice):
+    return ((notice.created_at - EPOCH) // MICROSECOND, notice.id)
+
+
+def _feed_scope(audience):
+    return f'notices:{audience}'
+
+
+def refresh_feed(audience, version=None):
+    """
+    Rebuild and cache the feed of ``audience``: ``[(sort key, notice data)]``,
+    newest first. ``version`` is its scope version, read before building.
+    """
+    from .models import Notice
+    from .query_planning import optimize_queryset
+    from .serializers import NoticeSerializer
+
+    if version is None:
+        version = scope_versions([_feed_scope(audience)])[_feed_scope(audience)]
+    options = feed_options()
+    notices = list(
+        optimize_queryset(Notice.objects.filter(audience_q(audience), is_active=True), NoticeSerializer)
+        .order_by('-created_at', '-id')[:options['SIZE']]
+    )
+    feed = [(_sort_key(notice), data) for notice, data in zip(notices, NoticeSerializer(notices, many=True).data)]
+    cache.set(FEED_KEY.format(audience=audience, version=version), feed, options['TIMEOUT'])
+    return feed
+
+
+def refresh_feeds_on_commit(audiences):
+    audiences = set(audiences) | {EVERY_NOTICE}
+    # Callbacks run in order: the versions are bumped before the rebuild
+    invalidate_scopes(_feed_scope(audience) for audience in audiences)
+
+    def refresh():
+        for audience in audiences:
+            refresh_feed(audience)
+    transaction.on_commit(refresh)
+
+
+def _load_cursor(user_id):
+    from .models import NoticeReadCursor
+
+    row = NoticeReadCursor.objects.filter(user_id=user_id).values_list('last_read_at', 'last_read_id').first()
+    cursor = ((row[0] - EPOCH) // MICROSECOND, row[1]) if row else NO_CURSOR
+    cache.set(CURSOR_KEY.format(user_id=user_id), cursor, feed_options()['TIMEOUT'])
+    return cursor
+
+
+def _merged_feed(user, profile):
+    """The user's newest notices as ``[(sort key, data)]`` and their cursor."""
+    audiences = user_audiences(user, profile)
+    versions = scope_versions([_feed_scope(audience) for audience in audiences])
+    keys = {
+        FEED_KEY.format(audience=audience, version=versions[_feed_scope(audience)]): audience
+        for audience in audiences
+    }
+    cursor_key = CURSOR_KEY.format(user_id=user.pk)
+    cached = cache.get_many([*keys, cursor_key])
+    feeds = [
+        cached[key] if key in cached else refresh_feed(audience, versions[_feed_scope(audience)])
+        for key, audience in keys.items()
+    ]
+    items = list(islice(heapq.merge(*feeds, key=itemgetter(0), reverse=True), feed_options()['SIZE']))
+    cursor = cached[cursor_key] if cursor_key in cached else _load_cursor(user.pk)
+    return items, cursor
+
+
+def user_feed(user, profile):
+    """The user's newest notices, newest first, and how many of them are unread."""
+    items, cursor = _merged_feed(user, profile)
+    return {
+        'unread': sum(key > cursor for key, _ in items),
+        'last_read_id': cursor[1] or None,
+        'results': [data for _, data in items],
+    }
+
+
+def mark_read(user, profile, notice=None):
+    """
+    Move the user's cursor to ``notice`` (a Notice), or to the newest notice
+    in their feed; it never moves back. Returns the notice id read up to.
+    """
+    from .models import NoticeReadCursor
+
+    items, cursor = _merged_feed(user, profile)
+    if notice is not None:
+        target = _sort_key(notice)
+    elif items:
+        target = items[0][0]
+    else:
+        return cursor[1] or None
+    if target <= cursor:
+        return cursor[1] or None
+
+    read_at = EPOCH + target[0] * MICROSECOND
+    NoticeReadCursor.objects.update_or_create(
+        user_id=user.pk, defaults={'last_read_at': read_at, 'last_read_id': target[1]},
+    )
+    transaction.on_commit(lambda: cache.set(CURSOR_KEY.format(user_id=user.pk), target, feed_options()['TIMEOUT']))
+    return target[1]
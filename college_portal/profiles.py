@@ -0,0 +1,95 @@
+"""
+The Teacher or Student row of the requesting user, loaded once.
+
+ProfileMiddleware sets ``request.profile``, evaluated on first use: the
+user's Teacher (department joined) or Student (class_enrolled and its
+department joined), or None for admins and users without one. Like
+``request.user`` it is a lazy object, so test it with ``if not
+request.profile`` rather than ``is None``. It works for DRF views too,
+which set ``request.user`` when they authenticate.
+
+Rows are kept in the reference cache across requests under
+``profile:<user type>:<user id>:<version>``; the per-user version (cache
+key ``profile:version:<user id>``) is bumped when the user's Teacher or
+Student row is saved or deleted (see signals.py), and the key also
+depends on the ``class`` and ``department`` namespaces for the joined
+rows. Users authenticated from token claims (authentication.py) whose
+claims carry no profile id skip the lookup altogether.
+"""
+import copy
+import time
+from inspect import iscoroutinefunction
+
+from django.core.cache import cache
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.functional import SimpleLazyObject
+
+from .reference_cache import reference_cache
+
+VERSION_KEY = 'profile:version:{user_id}'
+
+_MISSING = object()
+
+
+def _profile_query(user_type):
+    from .models import Student, Teacher
+
+    if user_type == 'teacher':
+        return Teacher.objects.select_related('department')
+    if user_type == 'student':
+        return Student.objects.select_related('class_enrolled__department')
+    return None
+
+
+def profile_version(user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        # Evicted or never set: start a new version rather than reuse old entries
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_profile(user_id):
+    cache.set(VERSION_KEY.format(user_id=user_id), time.time_ns(), None)
+
+
+def user_profile(user):
+    """The Teacher or Student row of ``user``, or None; no query when cached."""
+    queryset = _profile_query(getattr(user, 'user_type', None))
+    if queryset is None or not user.is_authenticated:
+        return None
+    if getattr(user, f'{user.user_type}_id', _MISSING) is None:
+        # Token claims say there is no profile
+        return None
+
+    keys = reference_cache.make_keys(
+        f'profile:{user.user_type}:{user.pk}:{profile_version(user.pk)}', ['class', 'department'],
+    )
+    profile = reference_cache.get(keys, _MISSING)
+    if profile is _MISSING:
+        profile = queryset.filter(user_id=user.pk).first()
+        reference_cache.set(keys, profile)
+    if profile is None:
+        return None
+    # The cached instance is shared; hand out a copy with its own related cache
+    profile = copy.copy(profile)
+    profile.user = user
+    return profile
+
+
+@sync_and_async_middleware
+def ProfileMiddleware(get_response):
+    def attach(request):
+        request.profile = SimpleLazyObject(lambda: user_profile(getattr(request, 'user', None)))
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            attach(request)
+            return await get_response(request)
+    else:
+        def middleware(request):
+            attach(request)
+            return get_response(request)
+    return middleware
@@ -0,0 +1,303 @@
+"""
+Per-endpoint request profiling.
+
+ProfilingMiddleware measures a sample of requests (PROFILING['SAMPLE_RATE'],
+every request when DEBUG) and records, per view and action: wall time,
+time spent in the database, query count, duplicated queries and time spent
+producing serializer data. A query counts as a duplicate when the same SQL
+ran earlier in the request with any parameters, the signature of an N+1
+loop. Unsampled requests cost one random() call, and their queries one
+context variable lookup.
+
+Figures are kept per process, like the reference cache stats: the
+admin-only ``_perf/`` endpoint reports the process that serves it, and
+each process logs its top offenders every PROFILING['REPORT_INTERVAL']
+seconds to the ``college_portal.profiling`` logger.
+"""
+import logging
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SAMPLE_RATE': 1.0 if settings.DEBUG else 0.01,
+    'REPORT_INTERVAL': 300,
+    'REPORT_TOP': 10,
+    # Wall times kept per endpoint for the percentiles
+    'WINDOW': 200,
+}
+
+SORT_FIELDS = ['total_ms', 'avg_ms', 'p95_ms', 'max_ms', 'avg_db_ms', 'avg_queries', 'avg_duplicates', 'avg_serializer_ms']
+
+_current = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Figures collected while one sampled request runs."""
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.statements = Counter()
+        self.endpoint = None
+        self._serializing = False
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.statements[sql] += 1
+
+    @property
+    def queries(self):
+        return sum(self.statements.values())
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+
+class EndpointStats:
+    def __init__(self, window):
+        self.count = 0
+        self.wall = 0.0
+        self.max_wall = 0.0
+        self.db = 0.0
+        self.queries = 0
+        self.duplicates = 0
+        self.serializer = 0.0
+        self.recent = deque(maxlen=window)
+        self.worst_statement = None
+        self.worst_repeats = 0
+
+    def add(self, wall, profile):
+        self.count += 1
+        self.wall += wall
+        self.max_wall = max(self.max_wall, wall)
+        self.db += profile.db_seconds
+        self.queries += profile.queries
+        self.duplicates += profile.duplicates
+        self.serializer += profile.serializer_seconds
+        self.recent.append(wall)
+        if profile.statements:
+            sql, repeats = profile.statements.most_common(1)[0]
+            if repeats > 1 and repeats >= self.worst_repeats:
+                self.worst_statement, self.worst_repeats = sql, repeats
+
+    def as_dict(self):
+        recent = sorted(self.recent)
+
+        def percentile(fraction):
+            return round(recent[min(len(recent) - 1, round(fraction * (len(recent) - 1)))] * 1000, 2)
+
+        return {
+            'requests': self.count,
+            'total_ms': round(self.wall * 1000, 2),
+            'avg_ms': round(self.wall * 1000 / self.count, 2),
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(self.max_wall * 1000, 2),
+            'avg_db_ms': round(self.db * 1000 / self.count, 2),
+            'avg_queries': round(self.queries / self.count, 2),
+            'avg_duplicates': round(self.duplicates / self.count, 2),
+            'avg_serializer_ms': round(self.serializer * 1000 / self.count, 2),
+            'most_repeated_query': self.worst_statement and {
+                'sql': self.worst_statement[:300],
+                'times_in_one_request': self.worst_repeats,
+            },
+        }
+
+
+class Profiler:
+    def __init__(self, options=None):
+        options = {**DEFAULTS, **(options or {})}
+        self.sample_rate = options['SAMPLE_RATE']
+        self.report_interval = options['REPORT_INTERVAL']
+        self.report_top = options['REPORT_TOP']
+        self.window = options['WINDOW']
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._since = time.time()
+        self._last_report = time.monotonic()
+
+    def should_sample(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def record(self, endpoint, wall, profile):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats(self.window)
+            stats.add(wall, profile)
+
+    def report(self, sort='total_ms', top=None):
+        with self._lock:
+            endpoints = [{'endpoint': name, **stats.as_dict()} for name, stats in self._endpoints.items()]
+        endpoints.sort(key=lambda row: row[sort], reverse=True)
+        return {
+            'since': self._since,
+            'sample_rate': self.sample_rate,
+            'sort': sort,
+            'endpoints': endpoints[:top] if top else endpoints,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._since = time.time()
+
+    def maybe_log_summary(self):
+        """Log the top offenders when REPORT_INTERVAL has passed since the last summary."""
+        if not self.report_interval:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_report < self.report_interval:
+                return
+            self._last_report = now
+        rows = self.report(top=self.report_top)['endpoints']
+        if not rows:
+            return
+        lines = [
+            f"{row['endpoint']}: {row['requests']} req, total {row['total_ms']:.0f} ms, "
+            f"p95 {row['p95_ms']:.1f} ms, db {row['avg_db_ms']:.1f} ms, "
+            f"{row['avg_queries']:g} queries ({row['avg_duplicates']:g} duplicate), "
+            f"serializer {row['avg_serializer_ms']:.1f} ms"
+            for row in rows
+        ]
+        logger.info('Slowest endpoints by total time:\n  %s', '\n  '.join(lines))
+
+
+profiler = Profiler(getattr(settings, 'PROFILING', None))
+
+
+def endpoint_name(request, view_func):
+    """``ViewSet.action`` for DRF viewsets, the view's name otherwise."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{view_class.__name__}.{action}'
+    # @api_view functions and plain APIViews
+    return f'{view_class.__name__} {request.method}'
+
+
+def _execute(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.execute(execute, sql, params, many, context)
+
+
+def _wrap_connection(sender, connection, **kwargs):
+    # First in the list: execute_wrapper() blocks pop() their own from the end
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _execute)
+
+
+def install_query_timer():
+    """
+    Route every connection's queries through the sampled request's
+    profile. Connections are per thread, and under ASGI a request's
+    queries run in executor threads (sync views, async_views.py); the
+    profile is found through the request's context, which sync_to_async()
+    copies into them. Called from AppConfig.ready().
+    """
+    connection_created.connect(_wrap_connection, dispatch_uid='profiling_query_timer')
+    for connection in connections.all(initialized_only=True):
+        _wrap_connection(None, connection)
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Async under ASGI, so async views are not pushed through a thread
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self._acall(request)
+        if not profiler.should_sample():
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(profile, time.perf_counter() - start)
+        return response
+
+    async def _acall(self, request):
+        if not profiler.should_sample():
+            return await self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(profile, time.perf_counter() - start)
+        return response
+
+    def _record(self, profile, wall):
+        # Requests that resolved to no view (404s, redirects) are not recorded
+        if profile.endpoint:
+            profiler.record(profile.endpoint, wall, profile)
+        profiler.maybe_log_summary()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current.get()
+        if profile is not None:
+            profile.endpoint = endpoint_name(request, view_func)
+
+
+_serializer_data = serializers.BaseSerializer.data
+
+
+def _timed_data(self):
+    profile = _current.get()
+    if profile is None or profile._serializing:
+        return _serializer_data.fget(self)
+    profile._serializing = True
+    start = time.perf_counter()
+    try:
+        return _serializer_data.fget(self)
+    finally:
+        profile.serializer_seconds += time.perf_counter() - start
+        profile._serializing = False
+
+
+def install_serializer_timer():
+    """
+    Time serializer output in sampled requests. Every serializer's .data
+    (ListSerializer and Serializer call up to it) goes through
+    BaseSerializer.data, which runs to_representation() for the whole,
+    possibly nested, payload. Called from AppConfig.ready().
+    """
+    if serializers.BaseSerializer.data is _serializer_data:
+        serializers.BaseSerializer.data = property(_timed_data)
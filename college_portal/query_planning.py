@@ -0,0 +1,114 @@
+"""
+Derive select_related()/prefetch_related() calls from a serializer.
+
+Serializers here read related data through dotted sources
+(``student.user.get_full_name``), nested serializers (``user_details``)
+and many-to-many fields (``subjects_list``). plan_queryset() walks those
+declarations against the model and returns the joins they need, so list
+endpoints cost the same number of queries however many rows they return.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class QueryPlan:
+    def __init__(self):
+        self.select_related = set()
+        self.prefetch_related = {}
+
+    def add_prefetch(self, lookup):
+        path = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+        # A Prefetch carrying its own queryset wins over a bare lookup
+        if isinstance(lookup, Prefetch) or path not in self.prefetch_related:
+            self.prefetch_related[path] = lookup
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related.values())
+        return queryset
+
+
+def _walk_source(model, source_attrs):
+    """
+    Follow ``source_attrs`` through model relations. Returns
+    ``(path, related_model, is_many)`` for the relational prefix, stopping
+    at the first attribute that is not a relation (a column or a method).
+    """
+    path = []
+    is_many = False
+    for attr in source_attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation or field.related_model is None:
+            break
+        if attr != field.name:
+            # The raw ``<fk>_id`` column needs no join
+            break
+        path.append(attr)
+        is_many = is_many or field.many_to_many or field.one_to_many
+        model = field.related_model
+    return path, model, is_many
+
+
+def _plan_fields(serializer, model, prefix, plan):
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            if isinstance(field, serializers.BaseSerializer) and not field.write_only:
+                _plan_fields(field, model, prefix, plan)
+            continue
+
+        source_attrs = field.source.split('.')
+        path, related_model, is_many = _walk_source(model, source_attrs)
+        if not path:
+            continue
+
+        if isinstance(field, serializers.ListSerializer) or isinstance(field, serializers.ManyRelatedField):
+            is_many = True
+        elif isinstance(field, serializers.RelatedField) and path == source_attrs:
+            # A primary key of a forward relation is read from the local column
+            path = path[:-1]
+            related_model = None
+            if not path:
+                continue
+
+        lookup = '__'.join(prefix + path)
+        if is_many:
+            if isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.ModelSerializer):
+                nested = plan_queryset(type(field.child), related_model)
+                if nested.select_related or nested.prefetch_related:
+                    plan.add_prefetch(Prefetch(lookup, queryset=nested.apply(related_model._default_manager.all())))
+                    continue
+            plan.add_prefetch(lookup)
+        else:
+            plan.select_related.add(lookup)
+            if isinstance(field, serializers.BaseSerializer):
+                _plan_fields(field, related_model, prefix + path, plan)
+
+
+@lru_cache(maxsize=None)
+def plan_queryset(serializer_class, model):
+    """Return the QueryPlan needed to serialize ``model`` rows with ``serializer_class``."""
+    plan = QueryPlan()
+    _plan_fields(serializer_class(), model, [], plan)
+    return plan
+
+
+def optimize_queryset(queryset, serializer_class):
+    return plan_queryset(serializer_class, queryset.model).apply(queryset)
+
+
+class QueryPlanMixin:
+    """
+    ViewSet mixin that joins whatever the serializer reads, based on its
+    declared fields, before the view applies its own filters.
+    """
+
+    def get_queryset(self):
+        return optimize_queryset(super().get_queryset(), self.get_serializer_class())
@@ -0,0 +1,286 @@
+"""
+Server push of notices, assignments and results to connected browsers.
+
+Clients open one long-lived connection instead of polling the notice list
+and dashboard: an SSE stream at /api/v1/notifications/stream/ (served by
+the Django ASGI app) or a WebSocket at /ws/notifications/ (routed in
+smart_college_backend/asgi.py). Either needs the project served over
+ASGI (uvicorn, daphne): under WSGI each stream would hold a worker thread
+for good, so the SSE view answers 501 there and clients keep polling.
+
+Each connection subscribes to a few channels, worked out with at most one
+query when it connects (for the user's profile, none once it is cached):
+
+    notices:<audience>     notices for one of the user's audiences (see
+                           notices.py); admins get notices:any
+    class:<id>             assignments of a student's class
+    student:<id>           a student's own results
+
+post_save signals publish once the transaction commits (see signals.py);
+bulk writes, which send no signals, call publish_instances() themselves.
+The payload is serialized once per event, not per subscriber, and an idle
+connection makes no queries at all.
+
+The broker is in-process: it reaches the clients connected to the same
+server process, which suits a single-node deployment with one ASGI worker.
+Several workers need a shared pub/sub (Redis) behind the same publish() /
+subscribe() calls. The last REPLAY events are kept so a client
+reconnecting with Last-Event-ID (or ?last_event_id=) misses nothing.
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque, namedtuple
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+
+DEFAULTS = {
+    # Seconds between SSE keep-alive comments on an idle stream
+    'HEARTBEAT': 15,
+    # Events queued for a slow client before it is disconnected
+    'QUEUE_SIZE': 100,
+    # Recent events kept for clients that reconnect
+    'REPLAY': 256,
+}
+
+WEBSOCKET_PATH = '/ws/notifications/'
+
+Event = namedtuple('Event', ['id', 'name', 'data', 'channels'])
+
+
+def realtime_options():
+    return {**DEFAULTS, **getattr(settings, 'REALTIME', {})}
+
+
+class Subscription:
+    """One connected client: its channels and the queue events are delivered to."""
+
+    def __init__(self, channels, loop, size):
+        self.channels = frozenset(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs on the subscriber's event loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Let the client reconnect and replay rather than grow without bound
+            self.overflowed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout=None):
+        """The next event, None once the subscription overflowed; asyncio.TimeoutError after ``timeout``."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class Broker:
+    def __init__(self, options):
+        self.queue_size = options['QUEUE_SIZE']
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._recent = deque(maxlen=options['REPLAY'])
+        # Millisecond start so ids keep increasing across restarts
+        self._ids = itertools.count(int(time.time() * 1000))
+
+    def subscribe(self, channels, last_event_id=None):
+        """Subscribe from the running event loop, queueing missed events after ``last_event_id``."""
+        subscription = Subscription(channels, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+            missed = [
+                event for event in self._recent
+                if last_event_id is not None and event.id > last_event_id and event.channels & subscription.channels
+            ]
+        # Leave room in the queue for live events
+        for event in missed[max(0, len(missed) - self.queue_size + 1):]:
+            subscription.deliver(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def publish(self, channels, name, data):
+        """Send an event to every subscriber of any of ``channels``; safe from any thread."""
+        event = Event(next(self._ids), name, json.dumps(data, cls=DjangoJSONEncoder), frozenset(channels))
+        with self._lock:
+            self._recent.append(event)
+            subscribers = set()
+            for channel in event.channels:
+                subscribers.update(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Loop closed under a client that never unsubscribed
+                self.unsubscribe(subscription)
+        return event
+
+    def subscribers(self):
+        with self._lock:
+            return len({subscription for subscribers in self._channels.values() for subscription in subscribers})
+
+
+broker = Broker(realtime_options())
+
+
+def channels_for(user):
+    """The channels ``user`` receives; one query for their profile unless it is cached."""
+    from .notices import user_audiences
+    from .profiles import user_profile
+
+    profile = user_profile(user)
+    channels = [f'notices:{audience}' for audience in user_audiences(user, profile)]
+    if user.user_type == 'student' and profile:
+        channels += [f'class:{profile.class_enrolled_id}', f'student:{profile.id}']
+    return channels
+
+
+def user_for_token(raw_token):
+    """The active user of a JWT access token, or None."""
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    from .authentication import ClaimsJWTAuthentication
+
+    if not raw_token:
+        return None
+    authentication = ClaimsJWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def request_user(request):
+    """The user of the request's ``Authorization: Bearer`` token, else of ``?token=``."""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer':
+        token = request.GET.get('token')
+    return user_for_token(token)
+
+
+def parse_event_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_sse(event):
+    return f'id: {event.id}\nevent: {event.name}\ndata: {event.data}\n\n'
+
+
+async def sse_stream(subscription, heartbeat):
+    """Server-sent events for ``subscription`` until the client goes away or falls behind."""
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event = await subscription.get(heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if event is None:
+                return
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def _websocket_channels(query_string):
+    try:
+        query = parse_qs(query_string.decode('latin-1'))
+        user = user_for_token(query.get('token', [None])[0])
+        return channels_for(user) if user is not None else None
+    finally:
+        # No request_finished signal outside the HTTP handler
+        close_old_connections()
+
+
+async def websocket_application(scope, receive, send):
+    """
+    ASGI app for WEBSOCKET_PATH: ``?token=<access token>``, then one JSON
+    text frame ``{"id", "event", "data"}`` per event. The server ignores
+    anything the client sends.
+    """
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    channels = await sync_to_async(_websocket_channels)(scope.get('query_string', b''))
+    if channels is None:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    await send({'type': 'websocket.accept'})
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    subscription = broker.subscribe(channels, parse_event_id(query.get('last_event_id', [None])[0]))
+
+    async def pump():
+        while True:
+            event = await subscription.get()
+            if event is None:
+                await send({'type': 'websocket.close', 'code': 4008})
+                return
+            # event.data is JSON already
+            text = f'{{"id": {event.id}, "event": "{event.name}", "data": {event.data}}}'
+            await send({'type': 'websocket.send', 'text': text})
+
+    sender = asyncio.ensure_future(pump())
+    try:
+        while (await receive())['type'] != 'websocket.disconnect':
+            pass
+    finally:
+        sender.cancel()
+        broker.unsubscribe(subscription)
+
+
+def publish_instance(instance, created):
+    """Push a saved Notice, Assignment or Result to the clients it concerns."""
+    from .models import Assignment, Notice, Result
+    from .notices import EVERY_NOTICE, notice_audience
+    from .serializers import AssignmentSerializer, NoticeSerializer
+
+    if isinstance(instance, Notice):
+        channels = [f'notices:{notice_audience(instance)}', f'notices:{EVERY_NOTICE}']
+        if not instance.is_active:
+            broker.publish(channels, 'notice_removed', {'id': instance.id})
+        else:
+            broker.publish(channels, 'notice' if created else 'notice_updated', NoticeSerializer(instance).data)
+    elif isinstance(instance, Assignment) and created:
+        broker.publish([f'class:{instance.class_assigned_id}'], 'assignment', AssignmentSerializer(instance).data)
+    elif isinstance(instance, Result):
+        # Names are left to the client: a marks upload publishes a result per student
+        broker.publish([f'student:{instance.student_id}'], 'result' if created else 'result_updated', {
+            'id': instance.id, 'examination': instance.examination_id,
+            'marks_obtained': instance.marks_obtained, 'grade': instance.grade,
+        })
+
+
+def publish_instances(instances, created):
+    """publish_instance() for rows written in bulk, which send no post_save, once the transaction commits."""
+    instances = list(instances)
+    if not instances:
+        return
+
+    def publish():
+        for instance in instances:
+            publish_instance(instance, created)
+
+    transaction.on_commit(publish)
@@ -0,0 +1,206 @@
+"""
+Two-level cache for reference data: departments, classes, subjects,
+teachers and schedules.
+
+Level 1 is a bounded per-process LRU, level 2 the configured Django cache.
+Keys embed the version of every namespace a value depends on; a write bumps
+the namespace version (see signals.py), which orphans the old keys instead
+of deleting them. Each process re-reads namespace versions from level 2 at
+most every VERSION_CHECK_INTERVAL seconds, which bounds how long another
+worker's write can go unnoticed.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+DEFAULTS = {
+    'MAX_ENTRIES': 2048,
+    'TIMEOUT': 60 * 60,
+    'VERSION_CHECK_INTERVAL': 5,
+}
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ReferenceCache:
+    def __init__(self, options=None):
+        options = {**DEFAULTS, **(options or {})}
+        self.timeout = options['TIMEOUT']
+        self.version_check_interval = options['VERSION_CHECK_INTERVAL']
+        self.local = LRUCache(options['MAX_ENTRIES'])
+        self._versions = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def version(self, namespace):
+        checked = self._versions.get(namespace)
+        now = time.monotonic()
+        if checked is not None and now - checked[1] < self.version_check_interval:
+            return checked[0]
+
+        key = f'refcache:version:{namespace}'
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, time.time_ns(), None)
+            version = cache.get(key)
+        self._versions[namespace] = (version, now)
+        return version
+
+    def bump(self, *namespaces):
+        version = time.time_ns()
+        cache.set_many({f'refcache:version:{namespace}': version for namespace in namespaces}, None)
+        now = time.monotonic()
+        for namespace in namespaces:
+            self._versions[namespace] = (version, now)
+
+    def make_keys(self, key, namespaces):
+        """
+        Resolve ``key`` against the current versions of ``namespaces``. Take
+        the keys before building a value so a concurrent bump is not masked.
+        """
+        versions = ','.join(f'{namespace}={self.version(namespace)}' for namespace in sorted(namespaces))
+        local_key = f'{key}|{versions}'
+        return local_key, 'refcache:' + hashlib.md5(local_key.encode()).hexdigest()
+
+    def get(self, keys, default=None):
+        local_key, shared_key = keys
+        value = self.local.get(local_key, _MISSING)
+        if value is not _MISSING:
+            self._count('l1_hits')
+            return value
+
+        value = cache.get(shared_key, _MISSING)
+        if value is _MISSING:
+            self._count('misses')
+            return default
+        self._count('l2_hits')
+        self.local.set(local_key, value)
+        return value
+
+    def set(self, keys, value):
+        local_key, shared_key = keys
+        cache.set(shared_key, value, self.timeout)
+        self.local.set(local_key, value)
+
+    def get_or_set(self, key, namespaces, builder):
+        """
+        Return the cached value of ``key``, or ``builder()`` cached under the
+        current versions of ``namespaces``.
+        """
+        keys = self.make_keys(key, namespaces)
+        value = self.get(keys, _MISSING)
+        if value is _MISSING:
+            value = builder()
+            self.set(keys, value)
+        return value
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = sum(stats.values())
+        stats['hit_ratio'] = round((stats['l1_hits'] + stats['l2_hits']) / lookups, 4) if lookups else None
+        stats['l1_entries'] = len(self.local)
+        stats['l1_max_entries'] = self.local.max_entries
+        return stats
+
+    def clear(self):
+        self.local.clear()
+        self._versions.clear()
+        with self._stats_lock:
+            self._stats = dict.fromkeys(self._stats, 0)
+
+
+reference_cache = ReferenceCache(getattr(settings, 'REFERENCE_CACHE', None))
+
+
+def _build_names(namespace):
+    from .models import Class, Subject, Teacher
+
+    if namespace == 'class':
+        return dict(Class.objects.values_list('id', 'name'))
+    if namespace == 'subject':
+        return dict(Subject.objects.values_list('id', 'name'))
+    if namespace == 'teacher':
+        # Same formatting as User.get_full_name()
+        return {
+            teacher_id: f'{first_name} {last_name}'.strip()
+            for teacher_id, first_name, last_name
+            in Teacher.objects.values_list('id', 'user__first_name', 'user__last_name')
+        }
+    raise ValueError(f'No name lookup for {namespace!r}')
+
+
+def reference_names(namespace):
+    """``{id: display name}`` for ``class``, ``subject`` or ``teacher``."""
+    return reference_cache.get_or_set(f'names:{namespace}', [namespace], lambda: _build_names(namespace))
+
+
+def cached_response(request, key, namespaces, build):
+    """
+    Return the cached data of a GET response, or call ``build()`` and cache
+    its data if it succeeded. ``namespaces`` names the data the payload
+    depends on.
+    """
+    keys = reference_cache.make_keys(f'view:{key}:{request.get_full_path()}', namespaces)
+    data = reference_cache.get(keys, _MISSING)
+    if data is not _MISSING:
+        return Response(data)
+
+    response = build()
+    if response.status_code == 200:
+        reference_cache.set(keys, response.data)
+    return response
+
+
+class ReferenceCacheMixin:
+    """Serve list/retrieve responses of a ViewSet from the reference cache."""
+    reference_namespaces = ()
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, type(self).__name__, self.reference_namespaces,
+            lambda: super(ReferenceCacheMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(
+            request, type(self).__name__, self.reference_namespaces,
+            lambda: super(ReferenceCacheMixin, self).retrieve(request, *args, **kwargs)
+        )
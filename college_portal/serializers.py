@@ -1,6 +1,130 @@
 from rest_framework import serializers
-from django.contrib.auth import authenticate
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueTogetherValidator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from .models import *
+from .attendance import record_attendance_changes
+from .dashboard import invalidate_instances
+from .login import LoginFailed, LoginRefused, check_login
+from .realtime import publish_instances
+from .reference_cache import reference_names
+from .timetable import describe, make_slot, timetable_index
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field that resolves against instances preloaded by
+    BulkCreateListSerializer instead of running one query per row.
+    """
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get('bulk_instances', {}).get(self.field_name)
+        if preloaded is None:
+            return super().to_internal_value(data)
+
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in preloaded:
+            self.fail('does_not_exist', pk_value=data)
+        return preloaded[pk]
+
+
+class BulkCreateListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer that validates and inserts a whole batch set-wise.
+
+    Related objects are loaded with one in_bulk() per foreign key, the
+    unique_together checks run as one query for the batch, and create()
+    writes every row with a single bulk_create() in one transaction.
+    """
+    # Foreign key field name -> select_related() paths used when preloading,
+    # so the representation of the created rows needs no further queries
+    select_related = {}
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self._preload_related(data)
+        unique_validators = self._take_unique_together_validators()
+
+        validated_data = super().to_internal_value(data)
+
+        errors = self._check_unique_together(validated_data, unique_validators)
+        if errors:
+            if getattr(api_settings, 'LIST_SERIALIZER_ERRORS_AS_DICT', False):
+                raise serializers.ValidationError(errors)
+            raise serializers.ValidationError([errors.get(index, {}) for index in range(len(validated_data))])
+        return validated_data
+
+    def _preload_related(self, data):
+        bulk_instances = {}
+        for name, field in self.child.fields.items():
+            if field.read_only or not isinstance(field, BulkPrimaryKeyRelatedField):
+                continue
+            pk_field = field.get_queryset().model._meta.pk
+            pks = set()
+            for item in data:
+                if not isinstance(item, dict) or isinstance(item.get(name), bool):
+                    continue
+                try:
+                    pk = pk_field.to_python(item.get(name))
+                except DjangoValidationError:
+                    continue
+                if pk is not None:
+                    pks.add(pk)
+            queryset = field.get_queryset().select_related(*self.select_related.get(name, ()))
+            bulk_instances[name] = queryset.in_bulk(pks)
+        self._context['bulk_instances'] = bulk_instances
+
+    def _take_unique_together_validators(self):
+        # Checked once for the whole batch instead of once per row
+        if not hasattr(self, '_unique_together_validators'):
+            validators = self.child.validators
+            self._unique_together_validators = [v for v in validators if isinstance(v, UniqueTogetherValidator)]
+            self.child.validators = [v for v in validators if not isinstance(v, UniqueTogetherValidator)]
+        return self._unique_together_validators
+
+    def _check_unique_together(self, validated_data, unique_validators):
+        errors = {}
+        model = self.child.Meta.model
+        for validator in unique_validators:
+            attnames = [model._meta.get_field(name).attname for name in validator.fields]
+            keys = [
+                tuple(getattr(attrs.get(name), 'pk', attrs.get(name)) for name in validator.fields)
+                for attrs in validated_data
+            ]
+            lookups = {
+                f'{attname}__in': {key[position] for key in keys}
+                for position, attname in enumerate(attnames)
+            }
+            existing = set(model._default_manager.filter(**lookups).values_list(*attnames))
+
+            field_names = ', '.join(validator.fields)
+            message = validator.message.format(field_names=field_names)
+            seen = set()
+            for index, key in enumerate(keys):
+                if key in existing or key in seen:
+                    errors[index] = {api_settings.NON_FIELD_ERRORS_KEY: [message]}
+                seen.add(key)
+        return errors
+
+    def build_instance(self, attrs):
+        return self.child.Meta.model(**attrs)
+
+    def create(self, validated_data):
+        instances = [self.build_instance(attrs) for attrs in validated_data]
+        with transaction.atomic():
+            self.child.Meta.model.objects.bulk_create(instances)
+            # bulk_create() sends no post_save signals
+            invalidate_instances(instances)
+            publish_instances(instances, created=True)
+        return instances
+
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,14 +141,13 @@ class LoginSerializer(serializers.Serializer):
         password = data.get('password')
 
         if username and password:
-            user = authenticate(username=username, password=password)
-            if user:
-                if user.is_active:
-                    data['user'] = user
-                else:
-                    raise serializers.ValidationError('User account is disabled.')
-            else:
+            # Hashes off the request thread, see login.py
+            try:
+                data['user'] = check_login(username, password)
+            except LoginFailed:
                 raise serializers.ValidationError('Invalid credentials.')
+            except LoginRefused as refused:
+                raise Throttled(wait=refused.retry_after, detail=str(refused))
         else:
             raise serializers.ValidationError('Must include username and password.')
         
@@ -68,22 +191,89 @@ class StudentSerializer(serializers.ModelSerializer):
         model = Student
         fields = '__all__'
 
+class ReferenceNameField(serializers.ReadOnlyField):
+    """
+    Display name of a related class, subject or teacher, looked up by id in
+    the reference cache instead of joining the related table.
+    """
+
+    def __init__(self, namespace, **kwargs):
+        self.namespace = namespace
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return reference_names(self.namespace).get(value)
+
+
+def conflict_message(kind, slot):
+    return f'The {kind} is already booked {describe(slot.start)}-{describe(slot.end)[-5:]} (schedule {slot.ref}).'
+
+
 class ScheduleSerializer(serializers.ModelSerializer):
-    class_name = serializers.CharField(source='class_assigned.name', read_only=True)
-    subject_name = serializers.CharField(source='subject.name', read_only=True)
-    teacher_name = serializers.CharField(source='teacher.user.get_full_name', read_only=True)
+    class_name = ReferenceNameField('class', source='class_assigned_id')
+    subject_name = ReferenceNameField('subject', source='subject_id')
+    teacher_name = ReferenceNameField('teacher', source='teacher_id')
     
     class Meta:
         model = Schedule
         fields = '__all__'
 
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        values = {
+            name: attrs[name] if name in attrs else getattr(self.instance, name, None)
+            for name in ('class_assigned', 'teacher', 'room_number', 'weekday', 'start_time', 'end_time')
+        }
+        if None in values.values():
+            return attrs
+        if values['end_time'] <= values['start_time']:
+            raise serializers.ValidationError({'end_time': 'Must be after the start time.'})
+
+        # Teacher, room and class double-booking, against the timetable index
+        slot = make_slot(
+            None, values['class_assigned'].id, values['teacher'].id, values['room_number'],
+            values['weekday'], values['start_time'], values['end_time'],
+        )
+        conflicts = timetable_index().conflicts_with(slot, exclude=self.instance and self.instance.id)
+        if conflicts:
+            raise serializers.ValidationError([conflict_message(kind, other) for kind, other in conflicts])
+        return attrs
+
+
+class TimetableEntrySerializer(serializers.Serializer):
+    """One row of a timetable checked with ScheduleViewSet.check; ``id`` replaces a saved schedule."""
+    id = serializers.IntegerField(required=False)
+    class_assigned = serializers.IntegerField()
+    teacher = serializers.IntegerField()
+    room_number = serializers.CharField(max_length=20)
+    weekday = serializers.ChoiceField(choices=Schedule.WEEKDAY_CHOICES)
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+    def validate(self, attrs):
+        if attrs['end_time'] <= attrs['start_time']:
+            raise serializers.ValidationError({'end_time': 'Must be after the start time.'})
+        return attrs
+
+class AttendanceListSerializer(BulkCreateListSerializer):
+    select_related = {'student': ['user']}
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            instances = super().create(validated_data)
+            record_attendance_changes(added=instances)
+        return instances
+
+
 class AttendanceSerializer(serializers.ModelSerializer):
+    serializer_related_field = BulkPrimaryKeyRelatedField
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     subject_name = serializers.CharField(source='subject.name', read_only=True)
     
     class Meta:
         model = Attendance
         fields = '__all__'
+        list_serializer_class = AttendanceListSerializer
 
 class ExaminationSerializer(serializers.ModelSerializer):
     subject_name = serializers.CharField(source='subject.name', read_only=True)
@@ -93,7 +283,19 @@ class ExaminationSerializer(serializers.ModelSerializer):
         model = Examination
         fields = '__all__'
 
+class ResultListSerializer(BulkCreateListSerializer):
+    select_related = {'student': ['user'], 'examination': ['subject']}
+
+    def build_instance(self, attrs):
+        result = super().build_instance(attrs)
+        # bulk_create() bypasses Result.save(), so grade here; the preloaded
+        # examination already carries total_marks
+        result.grade = Result.calculate_grade(result.marks_obtained, result.examination.total_marks)
+        return result
+
+
 class ResultSerializer(serializers.ModelSerializer):
+    serializer_related_field = BulkPrimaryKeyRelatedField
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     examination_name = serializers.CharField(source='examination.name', read_only=True)
     subject_name = serializers.CharField(source='examination.subject.name', read_only=True)
@@ -101,6 +303,7 @@ class ResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = Result
         fields = '__all__'
+        list_serializer_class = ResultListSerializer
 
 class NoticeSerializer(serializers.ModelSerializer):
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
@@ -109,6 +312,23 @@ class NoticeSerializer(serializers.ModelSerializer):
         model = Notice
         fields = '__all__'
 
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        target_class = attrs['target_class'] if 'target_class' in attrs else getattr(self.instance, 'target_class', None)
+        target_department = (
+            attrs['target_department'] if 'target_department' in attrs
+            else getattr(self.instance, 'target_department', None)
+        )
+        if target_class and target_department and target_class.department_id != target_department.id:
+            raise serializers.ValidationError({'target_class': 'Must belong to the target department.'})
+        if target_class and attrs.get('target_audience', getattr(self.instance, 'target_audience', None)) == 'admin':
+            raise serializers.ValidationError({'target_class': 'Admins are not members of a class.'})
+        return attrs
+
+class NoticeReadSerializer(serializers.Serializer):
+    # The newest notice read; the newest in the user's feed when left out
+    id = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+
 class AssignmentSerializer(serializers.ModelSerializer):
     subject_name = serializers.CharField(source='subject.name', read_only=True)
     class_name = serializers.CharField(source='class_assigned.name', read_only=True)
@@ -0,0 +1,165 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+from .authentication import revoke_tokens
+from .dashboard import invalidate_instances, invalidate_scopes
+from .profiles import bump_profile
+from .models import *
+from .notices import notice_audience, refresh_feeds_on_commit
+from .realtime import publish_instance
+from .reference_cache import reference_cache
+
+# Examination rows only feed the class analytics (results:class:<id>)
+DASHBOARD_MODELS = [Attendance, Result, Examination, Notice, Assignment, AssignmentSubmission, Schedule,
+                    Student, Teacher, Class, Subject]
+
+# Fields whose value before a write also decides whose dashboards it touches
+DASHBOARD_OWNER_FIELDS = {Student: 'class_enrolled_id', Class: 'class_teacher_id'}
+
+# Rows pushed to connected clients, see realtime.py
+PUBLISHED_MODELS = [Notice, Assignment, Result]
+
+# Fields whose change makes a user's token claims stale, see authentication.py
+TOKEN_CLAIM_FIELDS = {
+    User: ['username', 'user_type', 'is_staff', 'is_superuser', 'is_active', 'password'],
+    Teacher: ['user_id'],
+    Student: ['user_id', 'class_enrolled_id'],
+}
+
+# Rows request.profile returns, see profiles.py
+PROFILE_MODELS = [Teacher, Student]
+
+# Reference cache namespace(s) each model's rows feed into
+REFERENCE_NAMESPACES = {
+    Department: ['department'],
+    Class: ['class'],
+    Subject: ['subject'],
+    Teacher: ['teacher'],
+    Schedule: ['schedule'],
+}
+
+
+def invalidate_dashboards(sender, instance, **kwargs):
+    invalidate_instances([instance])
+
+
+def remember_dashboard_owner(sender, instance, raw=False, **kwargs):
+    instance._previous_owner = None
+    if not raw and instance.pk is not None:
+        field = DASHBOARD_OWNER_FIELDS[sender]
+        instance._previous_owner = sender._default_manager.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+def invalidate_teacher_subjects(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # Which teachers lose the subject is only known before the clear
+        teacher_ids = instance.teacher_set.values_list('id', flat=True)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        teacher_ids = (pk_set or ()) if reverse else [instance.pk]
+    else:
+        return
+    invalidate_scopes(f'teacher:{teacher_id}' for teacher_id in teacher_ids)
+
+
+for model in DASHBOARD_MODELS:
+    post_save.connect(invalidate_dashboards, sender=model, dispatch_uid=f'dashboard_save_{model.__name__}')
+    post_delete.connect(invalidate_dashboards, sender=model, dispatch_uid=f'dashboard_delete_{model.__name__}')
+for model in DASHBOARD_OWNER_FIELDS:
+    pre_save.connect(remember_dashboard_owner, sender=model, dispatch_uid=f'dashboard_owner_{model.__name__}')
+m2m_changed.connect(invalidate_teacher_subjects, sender=Teacher.subjects.through, dispatch_uid='dashboard_teacher_subjects')
+
+
+def bump_reference_cache(sender, **kwargs):
+    namespaces = REFERENCE_NAMESPACES[sender]
+    transaction.on_commit(lambda: reference_cache.bump(*namespaces))
+
+
+def bump_teacher_names(sender, instance, update_fields=None, **kwargs):
+    # Teacher names come from their user; logins only touch last_login
+    if instance.user_type != 'teacher' or update_fields == frozenset(['last_login']):
+        return
+    transaction.on_commit(lambda: reference_cache.bump('teacher'))
+
+
+for model in REFERENCE_NAMESPACES:
+    post_save.connect(bump_reference_cache, sender=model, dispatch_uid=f'reference_save_{model.__name__}')
+    post_delete.connect(bump_reference_cache, sender=model, dispatch_uid=f'reference_delete_{model.__name__}')
+post_save.connect(bump_teacher_names, sender=User, dispatch_uid='reference_save_teacher_user')
+
+
+def bump_user_profile(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_profile, instance.user_id))
+
+
+for model in PROFILE_MODELS:
+    post_save.connect(bump_user_profile, sender=model, dispatch_uid=f'profile_save_{model.__name__}')
+    post_delete.connect(bump_user_profile, sender=model, dispatch_uid=f'profile_delete_{model.__name__}')
+
+
+def publish(sender, instance, created, **kwargs):
+    transaction.on_commit(lambda: publish_instance(instance, created))
+
+
+for model in PUBLISHED_MODELS:
+    post_save.connect(publish, sender=model, dispatch_uid=f'realtime_save_{model.__name__}')
+
+
+def remember_notice_audience(sender, instance, raw=False, **kwargs):
+    # A notice moved to another audience leaves its old feed too
+    instance._stored_audience = None
+    if not raw and instance.pk is not None:
+        stored = Notice.objects.only('target_audience', 'target_department', 'target_class').filter(pk=instance.pk).first()
+        instance._stored_audience = notice_audience(stored) if stored else None
+
+
+def refresh_notice_feeds(sender, instance, **kwargs):
+    audiences = {notice_audience(instance), getattr(instance, '_stored_audience', None)} - {None}
+    refresh_feeds_on_commit(audiences)
+
+
+pre_save.connect(remember_notice_audience, sender=Notice, dispatch_uid='notice_feed_audience')
+post_save.connect(refresh_notice_feeds, sender=Notice, dispatch_uid='notice_feed_save')
+post_delete.connect(refresh_notice_feeds, sender=Notice, dispatch_uid='notice_feed_delete')
+
+
+def _revoke_on_commit(user_ids):
+    for user_id in set(user_ids) - {None}:
+        transaction.on_commit(partial(revoke_tokens, user_id))
+
+
+def _claims_user_ids(instance):
+    return [instance.pk] if isinstance(instance, User) else [instance.user_id]
+
+
+def revoke_changed_claims(sender, instance, raw=False, update_fields=None, **kwargs):
+    fields = TOKEN_CLAIM_FIELDS[sender._meta.concrete_model]
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not update_fields & {field.removesuffix('_id') for field in fields}:
+        return
+    stored = sender._default_manager.filter(pk=instance.pk).values(*fields).first()
+    if stored is not None and any(stored[field] != getattr(instance, field) for field in fields):
+        # A profile moved to another user revokes both
+        _revoke_on_commit(_claims_user_ids(instance) + [stored.get('user_id')])
+
+
+def revoke_new_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _revoke_on_commit(_claims_user_ids(instance))
+
+
+def revoke_deleted(sender, instance, **kwargs):
+    _revoke_on_commit(_claims_user_ids(instance))
+
+
+for model in TOKEN_CLAIM_FIELDS:
+    # Users saved through request.user are ClaimsUser instances
+    senders = [model, ClaimsUser] if model is User else [model]
+    for sender in senders:
+        pre_save.connect(revoke_changed_claims, sender=sender, dispatch_uid=f'claims_change_{sender.__name__}')
+        post_delete.connect(revoke_deleted, sender=sender, dispatch_uid=f'claims_delete_{sender.__name__}')
+    if model is not User:
+        # New users have no tokens yet
+        post_save.connect(revoke_new_profile, sender=model, dispatch_uid=f'claims_create_{model.__name__}')
@@ -0,0 +1,210 @@
+"""
+In-memory timetable index and conflict detection for schedules.
+
+Times are minutes of the week: weekday number (Monday = 0, as in
+datetime.weekday()) * 1440 + minutes since midnight, so intervals sort in
+timetable order. timetable_index() builds a TimetableIndex from one query
+and keeps it per process until the schedule, class, subject or teacher
+reference cache versions change (see reference_cache.py). The index holds
+each class's, teacher's and room's slots sorted by start, which makes the
+schedule listings, "now/next" lookups and the double-booking check of a
+single slot binary searches.
+
+find_conflicts() validates a whole timetable at once with a sweep line
+per class, teacher and room: O(n log n) plus the number of conflicts.
+"""
+import calendar
+import heapq
+import threading
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from operator import itemgetter
+
+from django.db.models import Case, IntegerField, Value, When
+
+from .models import Schedule
+from .reference_cache import reference_cache
+
+# Every day of the week, though WEEKDAY_CHOICES stops at Saturday
+WEEKDAY_NUMBERS = {name.lower(): number for number, name in enumerate(calendar.day_name)}
+
+MINUTES_PER_DAY = 24 * 60
+
+# Data the serialized rows depend on
+NAMESPACES = ['schedule', 'class', 'subject', 'teacher']
+
+KINDS = ['class', 'teacher', 'room']
+
+# ``ref`` is the schedule id for saved rows, or whatever the caller uses to
+# identify rows that are not saved yet (an index into an import file)
+Slot = namedtuple('Slot', ['start', 'end', 'ref', 'class_id', 'teacher_id', 'room'])
+
+
+def weekday_order():
+    """Weekday number (Monday = 0) as a database expression, for order_by()."""
+    return Case(
+        *[When(weekday=weekday, then=Value(number)) for weekday, number in WEEKDAY_NUMBERS.items()],
+        default=Value(len(WEEKDAY_NUMBERS)),
+        output_field=IntegerField(),
+    )
+
+
+def minute_of_week(weekday, moment):
+    return WEEKDAY_NUMBERS[weekday] * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+
+def normalize_room(room):
+    return ' '.join(str(room).split()).lower()
+
+
+def make_slot(ref, class_id, teacher_id, room, weekday, start_time, end_time):
+    return Slot(
+        minute_of_week(weekday, start_time), minute_of_week(weekday, end_time),
+        ref, class_id, teacher_id, normalize_room(room),
+    )
+
+
+def slot_key(slot, kind):
+    if kind == 'class':
+        return slot.class_id
+    if kind == 'teacher':
+        return slot.teacher_id
+    return slot.room
+
+
+def describe(minute):
+    day, minute = divmod(minute, MINUTES_PER_DAY)
+    return f'{calendar.day_name[day].lower()} {minute // 60:02d}:{minute % 60:02d}'
+
+
+class _Lane:
+    """One class's, teacher's or room's slots, sorted by start."""
+    __slots__ = ('slots', 'starts', 'longest')
+
+    def __init__(self, slots):
+        self.slots = sorted(slots)
+        self.starts = [slot.start for slot in self.slots]
+        self.longest = max((slot.end - slot.start for slot in self.slots), default=0)
+
+    def between(self, start, end):
+        return self.slots[bisect_left(self.starts, start):bisect_left(self.starts, end)]
+
+    def overlapping(self, start, end):
+        """Slots overlapping [start, end); only slots starting within ``longest`` before can."""
+        first = bisect_left(self.starts, start - self.longest + 1)
+        last = bisect_left(self.starts, end)
+        return [slot for slot in self.slots[first:last] if slot.end > start]
+
+
+class TimetableIndex:
+    def __init__(self, slots, rows):
+        self.rows = rows
+        self.lanes = {}
+        for kind in KINDS:
+            grouped = {}
+            for slot in slots:
+                grouped.setdefault(slot_key(slot, kind), []).append(slot)
+            self.lanes[kind] = {key: _Lane(lane) for key, lane in grouped.items()}
+
+    @classmethod
+    def build(cls):
+        from .query_planning import optimize_queryset
+        from .serializers import ScheduleSerializer
+
+        schedules = [
+            schedule for schedule in optimize_queryset(Schedule.objects.all(), ScheduleSerializer)
+            if schedule.weekday in WEEKDAY_NUMBERS
+        ]
+        slots = [
+            make_slot(schedule.id, schedule.class_assigned_id, schedule.teacher_id, schedule.room_number,
+                      schedule.weekday, schedule.start_time, schedule.end_time)
+            for schedule in schedules
+        ]
+        rows = {row['id']: row for row in ScheduleSerializer(schedules, many=True).data}
+        return cls(slots, rows)
+
+    def _lane(self, kind, key):
+        if kind == 'room':
+            key = normalize_room(key)
+        return self.lanes[kind].get(key)
+
+    def timetable(self, kind, key, weekday=None):
+        """Serialized schedules of a class, teacher or room in week order, optionally for one weekday."""
+        lane = self._lane(kind, key)
+        if lane is None or (weekday is not None and weekday not in WEEKDAY_NUMBERS):
+            return []
+        if weekday is None:
+            slots = lane.slots
+        else:
+            day = WEEKDAY_NUMBERS[weekday] * MINUTES_PER_DAY
+            slots = lane.between(day, day + MINUTES_PER_DAY)
+        return [self.rows[slot.ref] for slot in slots]
+
+    def now_and_next(self, kind, key, moment):
+        """
+        ``(current, upcoming)`` serialized schedules at the local datetime
+        ``moment``; upcoming wraps around to next week.
+        """
+        lane = self._lane(kind, key)
+        if lane is None:
+            return None, None
+        at = moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+        position = bisect_right(lane.starts, at)
+        current = lane.overlapping(at, at + 1)
+        upcoming = lane.slots[position] if position < len(lane.slots) else lane.slots[0]
+        return (self.rows[current[-1].ref] if current else None), self.rows[upcoming.ref]
+
+    def conflicts_with(self, slot, exclude=None):
+        """``[(kind, saved slot)]`` for saved slots of the same class, teacher or room overlapping ``slot``."""
+        conflicts = []
+        for kind in KINDS:
+            lane = self.lanes[kind].get(slot_key(slot, kind))
+            if lane is None:
+                continue
+            conflicts.extend(
+                (kind, other) for other in lane.overlapping(slot.start, slot.end) if other.ref != exclude
+            )
+        return conflicts
+
+    def slots(self):
+        return [slot for lane in self.lanes['class'].values() for slot in lane.slots]
+
+
+def find_conflicts(slots):
+    """
+    Every pair of ``slots`` that double-books a class, teacher or room, as
+    ``[(kind, slot, other)]`` with ``other`` starting no later than ``slot``.
+    """
+    conflicts = []
+    for kind, field in (('class', 'class_id'), ('teacher', 'teacher_id'), ('room', 'room')):
+        position = Slot._fields.index(field)
+        active = []
+        current = None
+        for slot in sorted(slots, key=itemgetter(position, 0)):
+            key = slot[position]
+            if key != current:
+                active = []
+                current = key
+            while active and active[0][0] <= slot.start:
+                heapq.heappop(active)
+            if active:
+                conflicts.extend((kind, slot, other) for _, _, other in active)
+            heapq.heappush(active, (slot.end, id(slot), slot))
+    return conflicts
+
+
+_index_lock = threading.Lock()
+_index = (None, None)
+
+
+def timetable_index():
+    """The TimetableIndex for the current schedule data, rebuilt after writes."""
+    global _index
+    version = reference_cache.make_keys('timetable', NAMESPACES)[0]
+    built_for, index = _index
+    if built_for == version:
+        return index
+    with _index_lock:
+        if _index[0] != version:
+            _index = (version, TimetableIndex.build())
+        return _index[1]
@@ -0,0 +1,424 @@
+"""
+Timetable generation: a week of Schedule rows for a set of classes.
+
+Each class takes its department's subjects of one semester, a subject's
+credits being its lessons per week. Every lesson needs a period (day x
+period of the day), the teacher taking that subject for the class (one of
+the teachers linked to the subject through Teacher.subjects) and a room.
+
+Hard constraints: no class, teacher or room is booked twice in a period.
+Soft constraints: a subject's lessons fall on different days, and classes
+have no idle periods between two lessons of a day.
+
+The solver is plain Python and knows nothing of Django. A greedy
+placement is improved by simulated annealing over three moves: move a
+lesson, swap two lessons of a class, and change the teacher of a class's
+subject. Costs are updated incrementally from occupancy lists, so a move
+costs a few list lookups. Rooms are interchangeable, so the search only
+keeps each period within the room count and rooms are handed out at the
+end, each class keeping one room where it can. solve() stops at its time
+budget or at a perfect timetable; independent restarts can run in worker
+processes.
+"""
+import math
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import time as clock
+
+HARD = 1000
+WEIGHTS = {
+    'class_clashes': HARD,
+    'teacher_clashes': HARD,
+    'room_overflow': HARD,
+    'same_day': 10,
+    'gaps': 1,
+}
+
+DEFAULT_DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
+DEFAULT_PERIODS = [
+    (clock(9), clock(10)), (clock(10), clock(11)), (clock(11), clock(12)), (clock(12), clock(13)),
+    (clock(14), clock(15)), (clock(15), clock(16)), (clock(16), clock(17)),
+]
+
+# One subject of one class: ``hours`` lessons a week, taught by one of ``teachers``
+Group = namedtuple('Group', ['class_id', 'subject_id', 'hours', 'teachers'])
+
+# ``feasible_after`` is the seconds to the first timetable without hard violations, or None
+Solution = namedtuple('Solution', ['slots', 'teachers', 'rooms', 'scores', 'iterations', 'seconds', 'feasible_after', 'seed'])
+
+
+class Problem:
+    """
+    ``days`` x ``periods`` slots to place ``groups`` in. ``busy`` holds
+    ``(slot, teacher id, room)`` bookings of classes outside the problem,
+    which the search must work around.
+    """
+
+    def __init__(self, groups, days, periods, rooms, busy=()):
+        self.groups = list(groups)
+        self.days = days
+        self.periods = periods
+        self.rooms = list(rooms)
+        self.slots = days * periods
+        # Lesson -> group, and the dense indexes the occupancy lists use
+        self.lessons = [index for index, group in enumerate(self.groups) for _ in range(group.hours)]
+        class_ids = sorted({group.class_id for group in self.groups})
+        teacher_ids = sorted({teacher for group in self.groups for teacher in group.teachers})
+        self.class_index = {class_id: index for index, class_id in enumerate(class_ids)}
+        self.teacher_index = {teacher_id: index for index, teacher_id in enumerate(teacher_ids)}
+        self.group_class = [self.class_index[group.class_id] for group in self.groups]
+        self.group_teachers = [[self.teacher_index[teacher] for teacher in group.teachers] for group in self.groups]
+        self.class_lessons = [[] for _ in class_ids]
+        for lesson, group in enumerate(self.lessons):
+            self.class_lessons[self.group_class[group]].append(lesson)
+        self.group_lessons = [[] for _ in self.groups]
+        for lesson, group in enumerate(self.lessons):
+            self.group_lessons[group].append(lesson)
+        room_index = {room: index for index, room in enumerate(self.rooms)}
+        self.teacher_busy = set()
+        self.room_busy = set()
+        for slot, teacher_id, room in busy:
+            if teacher_id in self.teacher_index:
+                self.teacher_busy.add((self.teacher_index[teacher_id], slot))
+            if room in room_index:
+                self.room_busy.add((room_index[room], slot))
+        self.room_busy_load = [0] * self.slots
+        for _, slot in self.room_busy:
+            self.room_busy_load[slot] += 1
+
+
+def evaluate(problem, slots, teachers):
+    """Each soft and hard term of a timetable, with the weighted ``cost`` and the ``hard`` violations."""
+    class_at, group_day = {}, {}
+    teacher_at = dict.fromkeys(problem.teacher_busy, 1)
+    room_load = problem.room_busy_load[:]
+    for lesson, slot in enumerate(slots):
+        group = problem.lessons[lesson]
+        for counter, key in (
+            (class_at, (problem.group_class[group], slot)),
+            (teacher_at, (teachers[group], slot)),
+            (group_day, (group, slot // problem.periods)),
+        ):
+            counter[key] = counter.get(key, 0) + 1
+        room_load[slot] += 1
+
+    gaps = 0
+    for class_index in range(len(problem.class_lessons)):
+        for day in range(problem.days):
+            busy = [period for period in range(problem.periods) if (class_index, day * problem.periods + period) in class_at]
+            if busy:
+                gaps += busy[-1] - busy[0] + 1 - len(busy)
+    scores = {
+        'class_clashes': sum(count - 1 for count in class_at.values()),
+        'teacher_clashes': sum(count - 1 for count in teacher_at.values()),
+        'room_overflow': sum(max(0, load - len(problem.rooms)) for load in room_load),
+        'same_day': sum(count - 1 for count in group_day.values()),
+        'gaps': gaps,
+    }
+    scores['hard'] = scores['class_clashes'] + scores['teacher_clashes'] + scores['room_overflow']
+    scores['cost'] = sum(WEIGHTS[name] * scores[name] for name in WEIGHTS)
+    return scores
+
+
+class _State:
+    """A timetable being searched, with the occupancy lists its cost is updated from."""
+
+    def __init__(self, problem, rng):
+        self.problem = problem
+        self.rng = rng
+        self.rooms = len(problem.rooms)
+        self.slot_of = [-1] * len(problem.lessons)
+        self.teacher_of = [rng.choice(candidates) for candidates in problem.group_teachers]
+        self.class_occ = [[0] * problem.slots for _ in problem.class_lessons]
+        self.teacher_occ = [[0] * problem.slots for _ in problem.teacher_index]
+        for teacher, slot in problem.teacher_busy:
+            self.teacher_occ[teacher][slot] = 1
+        self.room_load = problem.room_busy_load[:]
+        # Hard violations, kept up to date with the cost
+        self.hard = 0
+        self.group_day = [[0] * problem.days for _ in problem.groups]
+
+    def _gaps(self, occupancy, day):
+        periods = self.problem.periods
+        busy = [period for period in range(periods) if occupancy[day * periods + period]]
+        return busy[-1] - busy[0] + 1 - len(busy) if busy else 0
+
+    def place(self, lesson, slot, sign):
+        """Add (sign 1) or remove (sign -1) ``lesson`` at ``slot``; returns the change in cost."""
+        problem = self.problem
+        group = problem.lessons[lesson]
+        day = slot // problem.periods
+        occupancy = self.class_occ[problem.group_class[group]]
+        gaps = self._gaps(occupancy, day)
+        # With n already there, adding costs a clash when n >= 1; removing saves one when n >= 2
+        threshold = 1 if sign > 0 else 2
+
+        count = occupancy[slot]
+        hard = count >= threshold
+        occupancy[slot] = count + sign
+        teacher = self.teacher_occ[self.teacher_of[group]]
+        count = teacher[slot]
+        hard += count >= threshold
+        teacher[slot] = count + sign
+        count = self.room_load[slot]
+        hard += count >= self.rooms + threshold - 1
+        self.room_load[slot] = count + sign
+        days = self.group_day[group]
+        count = days[day]
+        soft = WEIGHTS['same_day'] * (count >= threshold)
+        days[day] = count + sign
+
+        self.hard += hard * sign
+        self.slot_of[lesson] = slot if sign > 0 else -1
+        return (HARD * hard + soft) * sign + WEIGHTS['gaps'] * (self._gaps(occupancy, day) - gaps)
+
+    def move(self, lesson, slot):
+        old = self.slot_of[lesson]
+        return self.place(lesson, old, -1) + self.place(lesson, slot, 1)
+
+    def set_teacher(self, group, teacher):
+        hard = 0
+        old = self.teacher_occ[self.teacher_of[group]]
+        new = self.teacher_occ[teacher]
+        for lesson in self.problem.group_lessons[group]:
+            slot = self.slot_of[lesson]
+            hard -= old[slot] >= 2
+            old[slot] -= 1
+            hard += new[slot] >= 1
+            new[slot] += 1
+        self.teacher_of[group] = teacher
+        self.hard += hard
+        return HARD * hard
+
+    def greedy(self):
+        """Place the most constrained groups first, each lesson in its cheapest slot."""
+        problem = self.problem
+        order = sorted(range(len(problem.groups)),
+                       key=lambda group: (len(problem.group_teachers[group]), -problem.groups[group].hours,
+                                          self.rng.random()))
+        cost = 0
+        for group in order:
+            occupancy = self.class_occ[problem.group_class[group]]
+            teacher = self.teacher_occ[self.teacher_of[group]]
+            days = self.group_day[group]
+            for lesson in problem.group_lessons[group]:
+                best_slot, best = None, None
+                for slot in range(problem.slots):
+                    score = (
+                        HARD * ((occupancy[slot] > 0) + (teacher[slot] > 0) + (self.room_load[slot] >= self.rooms))
+                        + WEIGHTS['same_day'] * days[slot // problem.periods]
+                        + self.rng.random()
+                    )
+                    if best is None or score < best:
+                        best_slot, best = slot, score
+                cost += self.place(lesson, best_slot, 1)
+        return cost
+
+    def conflicted(self):
+        """Lessons in a hard conflict, to focus the search on."""
+        problem = self.problem
+        lessons = []
+        for lesson, slot in enumerate(self.slot_of):
+            group = problem.lessons[lesson]
+            if (self.class_occ[problem.group_class[group]][slot] > 1
+                    or self.teacher_occ[self.teacher_of[group]][slot] > 1
+                    or self.room_load[slot] > self.rooms):
+                lessons.append(lesson)
+        return lessons
+
+
+def _search(problem, seconds, seed):
+    rng = random.Random(seed)
+    state = _State(problem, rng)
+    start = time.perf_counter()
+    cost = state.greedy()
+    best_cost, best = cost, (state.slot_of[:], state.teacher_of[:])
+    feasible_after = time.perf_counter() - start if state.hard == 0 else None
+    lessons = len(problem.lessons)
+    multi_teacher = [group for group, candidates in enumerate(problem.group_teachers) if len(candidates) > 1]
+    conflicted = state.conflicted()
+    temperature = 0
+    iterations = 0
+
+    while lessons and best_cost > 0:
+        if iterations % 512 == 0:
+            elapsed = time.perf_counter() - start
+            if elapsed >= seconds:
+                break
+            # Linear cooling from a few soft points to nothing
+            temperature = 3.0 * (1 - elapsed / seconds) + 0.01
+            if iterations % 4096 == 0:
+                conflicted = state.conflicted()
+        iterations += 1
+
+        choice = rng.random()
+        if choice < 0.55:
+            lesson = rng.choice(conflicted) if conflicted and rng.random() < 0.5 else rng.randrange(lessons)
+            old = state.slot_of[lesson]
+            slot = rng.randrange(problem.slots)
+            if slot == old:
+                continue
+            delta = state.move(lesson, slot)
+            if delta > 0 and rng.random() >= math.exp(-delta / temperature):
+                state.move(lesson, old)
+                continue
+        elif choice < 0.9 or not multi_teacher:
+            lesson = rng.choice(conflicted) if conflicted and rng.random() < 0.5 else rng.randrange(lessons)
+            siblings = problem.class_lessons[problem.group_class[problem.lessons[lesson]]]
+            other = rng.choice(siblings)
+            first, second = state.slot_of[lesson], state.slot_of[other]
+            if first == second:
+                continue
+            delta = state.move(lesson, second) + state.move(other, first)
+            if delta > 0 and rng.random() >= math.exp(-delta / temperature):
+                state.move(other, second)
+                state.move(lesson, first)
+                continue
+        else:
+            group = rng.choice(multi_teacher)
+            old = state.teacher_of[group]
+            teacher = rng.choice(problem.group_teachers[group])
+            if teacher == old:
+                continue
+            delta = state.set_teacher(group, teacher)
+            if delta > 0 and rng.random() >= math.exp(-delta / temperature):
+                state.set_teacher(group, old)
+                continue
+
+        cost += delta
+        if cost < best_cost:
+            best_cost, best = cost, (state.slot_of[:], state.teacher_of[:])
+        if feasible_after is None and state.hard == 0:
+            feasible_after = time.perf_counter() - start
+
+    slots, teacher_indexes = best
+    teacher_ids = sorted(problem.teacher_index, key=problem.teacher_index.get)
+    return Solution(
+        slots=slots,
+        teachers=[teacher_ids[index] for index in teacher_indexes],
+        rooms=assign_rooms(problem, slots),
+        scores=evaluate(problem, slots, teacher_indexes),
+        iterations=iterations,
+        seconds=time.perf_counter() - start,
+        feasible_after=feasible_after,
+        seed=seed,
+    )
+
+
+def assign_rooms(problem, slots):
+    """A room per lesson, keeping each class in one room where possible; None past the room count."""
+    home = {}
+    taken = [set() for _ in range(problem.slots)]
+    for room, slot in problem.room_busy:
+        taken[slot].add(room)
+    rooms = [None] * len(slots)
+    # Classes in a stable order claim their home room first
+    for lesson in sorted(range(len(slots)), key=lambda lesson: (problem.group_class[problem.lessons[lesson]], lesson)):
+        slot = slots[lesson]
+        class_index = problem.group_class[problem.lessons[lesson]]
+        preferred = home.get(class_index, class_index % max(len(problem.rooms), 1))
+        for offset in range(len(problem.rooms)):
+            room = (preferred + offset) % len(problem.rooms)
+            if room not in taken[slot]:
+                taken[slot].add(room)
+                rooms[lesson] = problem.rooms[room]
+                home.setdefault(class_index, room)
+                break
+    return rooms
+
+
+def solve(problem, seconds=10, seed=0, restarts=1, workers=None):
+    """
+    The best Solution of ``restarts`` independent searches, each given
+    ``seconds``. With more than one restart and worker the searches run in
+    a process pool.
+    """
+    seeds = [seed + restart for restart in range(restarts)]
+    workers = min(workers or restarts, restarts)
+    if workers <= 1:
+        solutions = [_search(problem, seconds, restart_seed) for restart_seed in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            solutions = list(pool.map(_search, [problem] * restarts, [seconds] * restarts, seeds))
+    return min(solutions, key=lambda solution: (solution.scores['cost'], solution.seed))
+
+
+def build_problem(classes, semester, days=DEFAULT_DAYS, periods=DEFAULT_PERIODS, rooms=()):
+    """
+    The Problem for ``classes`` (a Class queryset) taking their department's
+    subjects of ``semester``, around the saved schedules of other classes.
+    Returns ``(problem, unstaffed)`` where unstaffed lists the (class id,
+    subject id) pairs no active teacher can take; those are left out.
+    """
+    from .models import Schedule, Subject, Teacher
+    from .timetable import normalize_room
+
+    classes = list(classes.values_list('id', 'department_id'))
+    department_ids = {department_id for _, department_id in classes}
+    subjects = list(Subject.objects.filter(department_id__in=department_ids, semester=semester)
+                    .order_by('id').values_list('id', 'department_id', 'credits'))
+    teachers = {}
+    for subject_id, teacher_id in (
+        Teacher.subjects.through.objects
+        .filter(subject_id__in=[subject_id for subject_id, _, _ in subjects], teacher__is_active=True)
+        .order_by('teacher_id').values_list('subject_id', 'teacher_id')
+    ):
+        teachers.setdefault(subject_id, []).append(teacher_id)
+
+    groups, unstaffed = [], []
+    for class_id, department_id in classes:
+        for subject_id, subject_department_id, credits in subjects:
+            if subject_department_id != department_id:
+                continue
+            if subject_id not in teachers:
+                unstaffed.append((class_id, subject_id))
+                continue
+            groups.append(Group(class_id, subject_id, credits, tuple(teachers[subject_id])))
+
+    # Saved room numbers matched to the room list as the conflict check compares them
+    room_names = {normalize_room(room): room for room in rooms}
+    busy = []
+    day_numbers = {day: number for number, day in enumerate(days)}
+    for weekday, start_time, end_time, teacher_id, room in (
+        Schedule.objects.exclude(class_assigned_id__in=[class_id for class_id, _ in classes])
+        .filter(weekday__in=days).values_list('weekday', 'start_time', 'end_time', 'teacher_id', 'room_number')
+    ):
+        for period, (start, end) in enumerate(periods):
+            if start < end_time and start_time < end:
+                slot = day_numbers[weekday] * len(periods) + period
+                busy.append((slot, teacher_id, room_names.get(normalize_room(room))))
+    return Problem(groups, len(days), len(periods), rooms, busy), unstaffed
+
+
+def save_timetable(problem, solution, days=DEFAULT_DAYS, periods=DEFAULT_PERIODS):
+    """
+    Replace the schedules of the problem's classes with ``solution`` in
+    one transaction. Returns the created Schedule rows.
+    """
+    from django.db import transaction
+
+    from .dashboard import invalidate_instances
+    from .models import Schedule
+    from .reference_cache import reference_cache
+
+    schedules = []
+    for lesson, slot in enumerate(solution.slots):
+        group = problem.groups[problem.lessons[lesson]]
+        day, period = divmod(slot, problem.periods)
+        start_time, end_time = periods[period]
+        schedules.append(Schedule(
+            class_assigned_id=group.class_id, subject_id=group.subject_id,
+            teacher_id=solution.teachers[problem.lessons[lesson]], weekday=days[day],
+            start_time=start_time, end_time=end_time, room_number=solution.rooms[lesson],
+        ))
+
+    class_ids = [group.class_id for group in problem.groups]
+    with transaction.atomic():
+        Schedule.objects.filter(class_assigned_id__in=class_ids).delete()
+        schedules = Schedule.objects.bulk_create(schedules)
+        # bulk_create() sends no post_save signals
+        invalidate_instances(schedules)
+        transaction.on_commit(lambda: reference_cache.bump('schedule'))
+    return schedules
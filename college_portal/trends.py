@@ -0,0 +1,102 @@
+"""
+Performance trends: least-squares lines through exam percentages.
+
+The fit is one feature (exam number) over a handful of points, so it is
+solved in closed form from running sums instead of building a DataFrame
+and fitting a scikit-learn model. With x = 0..n-1:
+
+    slope = (n * Sxy - Sx * Sy) / (n * Sxx - Sx ** 2)
+
+where Sx and Sxx depend on n only. class_trends() reads every result of a
+class in one query, ordered by student and exam date, and accumulates the
+sums for all students in a single pass. Nothing here imports NumPy, pandas
+or scikit-learn.
+"""
+from collections import namedtuple
+
+from django.db.models import F
+
+Trend = namedtuple('Trend', ['count', 'average', 'slope', 'intercept'])
+
+# Fewer exams than this give no trend
+MIN_POINTS = 3
+
+
+class _Sums:
+    __slots__ = ('n', 'sy', 'sxy')
+
+    def __init__(self):
+        self.n = 0
+        self.sy = 0.0
+        self.sxy = 0.0
+
+    def add(self, y):
+        self.sxy += self.n * y
+        self.sy += y
+        self.n += 1
+
+    def trend(self, min_points=MIN_POINTS):
+        n = self.n
+        if n < max(min_points, 1):
+            return None
+        if n == 1:
+            return Trend(1, self.sy, 0.0, self.sy)
+        sx = n * (n - 1) / 2
+        sxx = (n - 1) * n * (2 * n - 1) / 6
+        slope = (n * self.sxy - sx * self.sy) / (n * sxx - sx * sx)
+        return Trend(n, self.sy / n, slope, (self.sy - slope * sx) / n)
+
+
+def linear_trend(values, min_points=MIN_POINTS):
+    """Trend of ``values`` taken in order, or None with fewer than ``min_points``."""
+    sums = _Sums()
+    for value in values:
+        sums.add(value)
+    return sums.trend(min_points)
+
+
+def batch_trends(pairs, min_points=MIN_POINTS):
+    """
+    ``{key: Trend}`` from ``(key, value)`` pairs, each key's values in exam
+    order. Keys with too few values are left out.
+    """
+    sums = {}
+    for key, value in pairs:
+        entry = sums.get(key)
+        if entry is None:
+            entry = sums[key] = _Sums()
+        entry.add(value)
+    trends = {key: entry.trend(min_points) for key, entry in sums.items()}
+    return {key: trend for key, trend in trends.items() if trend is not None}
+
+
+def predict(trend, steps=3):
+    """The fitted percentage of the next ``steps`` exams."""
+    return [trend.intercept + trend.slope * (trend.count - 1 + step) for step in range(1, steps + 1)]
+
+
+def direction(slope):
+    return 'improving' if slope > 0 else 'declining' if slope < 0 else 'stable'
+
+
+def result_percentages(results):
+    """
+    ``(student id, percentage)`` for ``results`` in exam order, one query.
+    Exams without positive total marks have no percentage and are left out.
+    """
+    return (
+        results.filter(examination__total_marks__gt=0)
+        .order_by('student_id', 'examination__date', 'examination_id')
+        .annotate(percentage=F('marks_obtained') * 100.0 / F('examination__total_marks'))
+        .values_list('student_id', 'percentage')
+    )
+
+
+def class_trends(class_id, min_points=MIN_POINTS):
+    """``{student id: Trend}`` for every student of a class, from one query."""
+    from .models import Result
+
+    return batch_trends(
+        result_percentages(Result.objects.filter(student__class_enrolled_id=class_id)).iterator(),
+        min_points,
+    )
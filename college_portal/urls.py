@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from . import views
+from . import async_views, views
 
 # Create a router and register our viewsets with it
 router = DefaultRouter()
@@ -39,10 +39,11 @@ router.register(r'submissions', views.AssignmentSubmissionViewSet, basename='sub
 # Dashboard
 router.register(r'dashboard', views.DashboardViewSet, basename='dashboard')
 
+# Compatibility with the legacy backend app: student/marks/, student/performance/,
+# student/assignments/
+router.register(r'student', views.LegacyStudentViewSet, basename='legacy-student')
+
 urlpatterns = [
-    # API root
-    path('', include(router.urls)),
-    
     # JWT Token Refresh
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
@@ -51,6 +52,19 @@ urlpatterns = [
     path('student/attendance/', views.student_attendance, name='student_attendance'),
     path('student/results/', views.student_results, name='student_results'),
     path('teacher/classes/', views.teacher_classes, name='teacher_classes'),
+    path('analytics/class/<int:class_id>/', views.class_analytics, name='class_analytics'),
+    path('export/attendance/', views.export_attendance, name='export_attendance'),
+    path('export/results/', views.export_results, name='export_results'),
+    path('import/students/', views.import_students, name='import_students'),
+    path('import/results/', views.import_results, name='import_results'),
+    path('cache/stats/', views.reference_cache_stats, name='reference_cache_stats'),
+    path('_perf/', views.perf_report, name='perf_report'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
+
+    # Async versions of the student read endpoints, for ASGI deployments
+    path('async/dashboard/', async_views.dashboard, name='async_dashboard'),
+    path('async/student/attendance/', async_views.student_attendance, name='async_student_attendance'),
+    path('async/student/results/', async_views.student_results, name='async_student_results'),
     
     # Include router URLs
     path('', include(router.urls)),
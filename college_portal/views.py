@@ -1,16 +1,45 @@
 from django.shortcuts import render
 from rest_framework import viewsets, status, generics, permissions
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, permission_classes, parser_classes, renderer_classes, action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser, BasePermission
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from asgiref.sync import sync_to_async
 from django.contrib.auth import authenticate, get_user_model
-from django.db.models import Count, Q, F, Sum, Avg
+from django.db import transaction
+from django.db.models import Count, Q, F, Sum, Avg, Prefetch
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.utils.dateparse import parse_datetime
 from datetime import datetime, timedelta
+from functools import partial
 from .models import *
 from .serializers import *
+from .analytics import class_analytics as build_class_analytics
+from .attendance import attendance_percentage, attendance_totals, record_attendance_changes, upsert_attendance
+from .authentication import ClaimsRefreshToken
+from .conditional import conditional_response, queryset_etag
+from .dashboard import aggregate_many, cache_dashboard, get_cached_dashboard, scope_versions
+from .exports import (
+    ATTENDANCE_COLUMNS, ATTENDANCE_FILTERS, RESULT_COLUMNS, RESULT_FILTERS,
+    CSVRenderer, NDJSONRenderer, export_response,
+)
+from .grading import percentage
+from .imports import ImportFileError, import_result_rows, import_student_rows, read_rows
+from .notices import mark_read, user_feed, visible_notices_q
+from .pagination import KeysetPagination
+from .profiles import user_profile
+from .profiling import SORT_FIELDS, profiler
+from .query_planning import QueryPlanMixin, optimize_queryset
+from .realtime import broker, channels_for, parse_event_id, realtime_options, request_user, sse_stream
+from .reference_cache import ReferenceCacheMixin, cached_response, reference_cache
+from .timetable import describe, find_conflicts, make_slot, timetable_index, weekday_order
+from .trends import direction as trend_direction, linear_trend, predict, result_percentages
 
 User = get_user_model()
 
@@ -50,7 +79,7 @@ class AuthViewSet(viewsets.ViewSet):
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data['user']
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsRefreshToken.for_user(user)
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
@@ -62,7 +91,7 @@ class AuthViewSet(viewsets.ViewSet):
     def logout(self, request):
         try:
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = ClaimsRefreshToken(refresh_token)
             token.blacklist()
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
@@ -73,7 +102,7 @@ class AuthViewSet(viewsets.ViewSet):
         serializer = UserSerializer(request.user)
         return Response(serializer.data)
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
@@ -102,111 +131,181 @@ class DashboardViewSet(viewsets.ViewSet):
     
     def list(self, request):
         user = request.user
-        stats = {}
-        
+        entry = get_cached_dashboard(user)
+        if entry is None:
+            entry = self._build_dashboard(user)
+            if entry is None:
+                return Response({'error': 'Teacher profile not found'})
+        return conditional_response(request, entry['etag'], lambda: Response(entry['data']))
+
+    def _build_dashboard(self, user):
+        plan = self._dashboard_plan(user)
+        if plan is None:
+            return None
+        versions, parts, finish = plan
+        return cache_dashboard(user, finish({name: part() for name, part in parts.items()}), versions)
+
+    def _dashboard_plan(self, user):
+        """
+        ``(versions, parts, finish)`` for the user's dashboard: its scope
+        versions, its independent queries as ``{name: callable}`` and the
+        function assembling their values into the stats. None when a
+        teacher has no profile. The async dashboard runs the parts
+        concurrently (see async_views.py).
+        """
+        # Scope versions are read before the stats so a write that lands
+        # while they are being built invalidates the entry we store
         if user.user_type == 'admin':
-            stats = self._get_admin_stats()
-        elif user.user_type == 'teacher':
-            stats = self._get_teacher_stats(user)
-        elif user.user_type == 'student':
-            stats = self._get_student_stats(user)
-            
-        return Response(stats)
-    
-    def _get_admin_stats(self):
+            return scope_versions(['admin']), self._admin_parts(), self._admin_stats
+        if user.user_type == 'teacher':
+            teacher = user_profile(user)
+            if teacher is None:
+                return None
+            versions = scope_versions([f'teacher:{teacher.id}'])
+            return versions, self._teacher_parts(user, teacher), self._teacher_stats
+        if user.user_type == 'student':
+            student = user_profile(user)
+            if student is None:
+                raise Http404('No Student matches the given query.')
+            versions = scope_versions([f'student:{student.id}', f'class:{student.class_enrolled_id}'])
+            return versions, self._student_parts(student), partial(self._student_stats, student)
+        return {}, {}, dict
+
+    def _admin_parts(self):
         return {
-            'total_students': Student.objects.filter(is_active=True).count(),
-            'total_teachers': Teacher.objects.filter(is_active=True).count(),
-            'total_classes': Class.objects.count(),
-            'total_subjects': Subject.objects.count(),
-            'recent_notices': NoticeSerializer(
-                Notice.objects.filter(is_active=True).order_by('-created_at')[:5], 
+            'counts': lambda: aggregate_many(
+                total_students=(Student.objects.all(), Count('id', filter=Q(is_active=True))),
+                total_teachers=(Teacher.objects.all(), Count('id', filter=Q(is_active=True))),
+                total_classes=(Class.objects.all(), Count('id')),
+                total_subjects=(Subject.objects.all(), Count('id')),
+            ),
+            'recent_notices': lambda: NoticeSerializer(
+                optimize_queryset(Notice.objects.filter(is_active=True), NoticeSerializer)
+                .order_by('-created_at')[:5], 
                 many=True
             ).data,
-            'recent_results': ResultSerializer(
+            'recent_results': lambda: ResultSerializer(
                 Result.objects.select_related('student__user', 'examination__subject')
                 .order_by('-created_at')[:10], 
                 many=True
             ).data,
         }
+
+    @staticmethod
+    def _admin_stats(values):
+        return {
+            **values['counts'],
+            'recent_notices': values['recent_notices'],
+            'recent_results': values['recent_results'],
+        }
     
-    def _get_teacher_stats(self, user):
-        try:
-            teacher = Teacher.objects.get(user=user)
-            today = timezone.now().date()
-            
-            return {
-                'my_classes': Class.objects.filter(class_teacher=user).count(),
-                'my_subjects': teacher.subjects.count(),
-                'total_students': Student.objects.filter(class_enrolled__class_teacher=user).count(),
-                'today_schedule': ScheduleSerializer(
-                    Schedule.objects.filter(
-                        teacher=teacher,
-                        weekday=today.strftime('%A').lower()
-                    ).order_by('start_time'),
-                    many=True
-                ).data,
-                'pending_assignments': Assignment.objects.filter(
+    def _teacher_parts(self, user, teacher):
+        today = timezone.now().date()
+        return {
+            'counts': lambda: aggregate_many(
+                my_classes=(Class.objects.filter(class_teacher=user), Count('id')),
+                my_subjects=(Teacher.subjects.through.objects.filter(teacher_id=teacher.id), Count('id')),
+                total_students=(Student.objects.filter(class_enrolled__class_teacher=user), Count('id')),
+                pending_assignments=(
+                    Assignment.objects.filter(teacher=teacher),
+                    Count('id', filter=Q(due_date__gte=timezone.now())),
+                ),
+            ),
+            'today_schedule': lambda: ScheduleSerializer(
+                optimize_queryset(Schedule.objects, ScheduleSerializer).filter(
                     teacher=teacher,
-                    due_date__gte=timezone.now()
-                ).count(),
-                'recent_attendance': AttendanceSerializer(
-                    Attendance.objects.filter(teacher=teacher)
-                    .order_by('-date')[:10], 
-                    many=True
-                ).data,
-            }
-        except Teacher.DoesNotExist:
-            return {'error': 'Teacher profile not found'}
+                    weekday=today.strftime('%A').lower()
+                ).order_by('start_time'),
+                many=True
+            ).data,
+            'recent_attendance': lambda: AttendanceSerializer(
+                optimize_queryset(Attendance.objects, AttendanceSerializer).filter(teacher=teacher)
+                .order_by('-date')[:10], 
+                many=True
+            ).data,
+        }
+
+    @staticmethod
+    def _teacher_stats(values):
+        counts = values['counts']
+        return {
+            'my_classes': counts['my_classes'],
+            'my_subjects': counts['my_subjects'],
+            'total_students': counts['total_students'],
+            'today_schedule': values['today_schedule'],
+            'pending_assignments': counts['pending_assignments'],
+            'recent_attendance': values['recent_attendance'],
+        }
     
-    def _get_student_stats(self, user):
-        student = get_object_or_404(Student, user=user)
+    def _student_parts(self, student):
         today = timezone.now().date()
-        
-        # Calculate attendance percentage
-        total_attendance = Attendance.objects.filter(student=student).count()
-        present_attendance = Attendance.objects.filter(student=student, is_present=True).count()
-        attendance_percentage = (present_attendance / total_attendance * 100) if total_attendance > 0 else 0
-        
+        summaries = AttendanceSummary.objects.filter(student=student)
         return {
-            'class': f"{student.class_enrolled.name} - {student.class_enrolled.section}",
-            'attendance_percentage': round(attendance_percentage, 2),
-            'pending_assignments': Assignment.objects.filter(
-                class_assigned=student.class_enrolled,
-                due_date__gte=timezone.now()
-            ).exclude(
-                assignmentsubmission__student=student
-            ).count(),
-            'today_schedule': ScheduleSerializer(
-                Schedule.objects.filter(
-                    class_assigned=student.class_enrolled,
+            'counts': lambda: aggregate_many(
+                present_attendance=(summaries, Sum('present')),
+                total_attendance=(summaries, Sum('total')),
+                pending_assignments=(
+                    Assignment.objects.filter(
+                        class_assigned=student.class_enrolled_id,
+                        due_date__gte=timezone.now()
+                    ).exclude(
+                        assignmentsubmission__student=student
+                    ),
+                    Count('id'),
+                ),
+            ),
+            'today_schedule': lambda: ScheduleSerializer(
+                optimize_queryset(Schedule.objects, ScheduleSerializer).filter(
+                    class_assigned=student.class_enrolled_id,
                     weekday=today.strftime('%A').lower()
                 ).order_by('start_time'),
                 many=True
             ).data,
-            'recent_results': ResultSerializer(
-                Result.objects.filter(student=student)
-                .select_related('examination__subject')
+            'recent_results': lambda: ResultSerializer(
+                optimize_queryset(Result.objects, ResultSerializer).filter(student=student)
                 .order_by('-examination__date')[:5],
                 many=True
             ).data,
         }
+
+    @staticmethod
+    def _student_stats(student, values):
+        counts = values['counts']
+        return {
+            'class': f"{student.class_enrolled.name} - {student.class_enrolled.section}",
+            'attendance_percentage': attendance_percentage(counts['present_attendance'], counts['total_attendance']),
+            'pending_assignments': counts['pending_assignments'],
+            'today_schedule': values['today_schedule'],
+            'recent_results': values['recent_results'],
+        }
         
 
 
 def calculate_attendance_percentage(student):
-    total_attendance = Attendance.objects.filter(student=student).count()
-    present_attendance = Attendance.objects.filter(student=student, is_present=True).count()
-    
-    if total_attendance > 0:
-        return round((present_attendance / total_attendance) * 100, 2)
-    return 0
+    return attendance_percentage(*attendance_totals(student))
+
+# Schedules of a class or teacher, served from the in-memory timetable index
+def timetable_response(request, kind, key):
+    weekday = request.query_params.get('weekday', '').lower() or None
+    return Response(timetable_index().timetable(kind, key, weekday))
+
+def now_and_next_response(request, kind, key):
+    moment = timezone.localtime()
+    if request.query_params.get('at'):
+        moment = parse_datetime(request.query_params['at'])
+        if moment is None:
+            return Response({'error': 'at must be an ISO 8601 date and time'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_aware(moment):
+            moment = timezone.localtime(moment)
+    current, upcoming = timetable_index().now_and_next(kind, key, moment)
+    return Response({'at': moment, 'now': current, 'next': upcoming})
 
 # ViewSets for CRUD operations
-class DepartmentViewSet(viewsets.ModelViewSet):
+class DepartmentViewSet(ReferenceCacheMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
+    reference_namespaces = ['department']
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -216,11 +315,11 @@ class DepartmentViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def classes(self, request, pk=None):
         department = self.get_object()
-        classes = Class.objects.filter(department=department)
+        classes = optimize_queryset(Class.objects, ClassSerializer).filter(department=department)
         serializer = ClassSerializer(classes, many=True)
         return Response(serializer.data)
 
-class ClassViewSet(viewsets.ModelViewSet):
+class ClassViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Class.objects.all()
     serializer_class = ClassSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
@@ -236,26 +335,23 @@ class ClassViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def students(self, request, pk=None):
         class_obj = self.get_object()
-        students = Student.objects.filter(class_enrolled=class_obj, is_active=True)
+        students = optimize_queryset(Student.objects, StudentSerializer).filter(class_enrolled=class_obj, is_active=True)
         serializer = StudentSerializer(students, many=True)
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def schedule(self, request, pk=None):
-        class_obj = self.get_object()
-        weekday = request.query_params.get('weekday')
-        schedules = Schedule.objects.filter(class_assigned=class_obj)
-        
-        if weekday:
-            schedules = schedules.filter(weekday=weekday.lower())
-            
-        serializer = ScheduleSerializer(schedules.order_by('start_time'), many=True)
-        return Response(serializer.data)
+        return timetable_response(request, 'class', self.get_object().id)
+    
+    @action(detail=True, methods=['get'], url_path='schedule/now')
+    def schedule_now(self, request, pk=None):
+        return now_and_next_response(request, 'class', self.get_object().id)
 
-class SubjectViewSet(viewsets.ModelViewSet):
+class SubjectViewSet(ReferenceCacheMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
+    reference_namespaces = ['subject', 'department']
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -268,11 +364,11 @@ class SubjectViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def teachers(self, request, pk=None):
         subject = self.get_object()
-        teachers = Teacher.objects.filter(subjects=subject, is_active=True)
+        teachers = optimize_queryset(Teacher.objects, TeacherSerializer).filter(subjects=subject, is_active=True)
         serializer = TeacherSerializer(teachers, many=True)
         return Response(serializer.data)
 
-class TeacherViewSet(viewsets.ModelViewSet):
+class TeacherViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Teacher.objects.filter(is_active=True)
     serializer_class = TeacherSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
@@ -288,23 +384,19 @@ class TeacherViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def classes(self, request, pk=None):
         teacher = self.get_object()
-        classes = teacher.class_set.all()
+        classes = optimize_queryset(Class.objects, ClassSerializer).filter(class_teacher_id=teacher.user_id)
         serializer = ClassSerializer(classes, many=True)
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def schedule(self, request, pk=None):
-        teacher = self.get_object()
-        weekday = request.query_params.get('weekday')
-        schedules = Schedule.objects.filter(teacher=teacher)
-        
-        if weekday:
-            schedules = schedules.filter(weekday=weekday.lower())
-            
-        serializer = ScheduleSerializer(schedules.order_by('start_time'), many=True)
-        return Response(serializer.data)
+        return timetable_response(request, 'teacher', self.get_object().id)
+    
+    @action(detail=True, methods=['get'], url_path='schedule/now')
+    def schedule_now(self, request, pk=None):
+        return now_and_next_response(request, 'teacher', self.get_object().id)
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Student.objects.filter(is_active=True)
     serializer_class = StudentSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
@@ -324,7 +416,7 @@ class StudentViewSet(viewsets.ModelViewSet):
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
         
-        attendance = Attendance.objects.filter(student=student)
+        attendance = optimize_queryset(Attendance.objects, AttendanceSerializer).filter(student=student)
         
         if subject_id:
             attendance = attendance.filter(subject_id=subject_id)
@@ -341,7 +433,7 @@ class StudentViewSet(viewsets.ModelViewSet):
         student = self.get_object()
         subject_id = request.query_params.get('subject_id')
         
-        results = Result.objects.filter(student=student)
+        results = optimize_queryset(Result.objects, ResultSerializer).filter(student=student)
         
         if subject_id:
             results = results.filter(examination__subject_id=subject_id)
@@ -349,7 +441,7 @@ class StudentViewSet(viewsets.ModelViewSet):
         serializer = ResultSerializer(results.order_by('-examination__date'), many=True)
         return Response(serializer.data)
 
-class ScheduleViewSet(viewsets.ModelViewSet):
+class ScheduleViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Schedule.objects.all()
     serializer_class = ScheduleSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
@@ -368,12 +460,42 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         if weekday:
             queryset = queryset.filter(weekday=weekday.lower())
             
-        return queryset.order_by('weekday', 'start_time')
+        return queryset.alias(weekday_number=weekday_order()).order_by('weekday_number', 'start_time', 'id')
+    
+    @action(detail=False, methods=['post'])
+    def check(self, request):
+        """
+        Double-booking check of a whole timetable before importing it. Rows
+        are checked against each other and, unless ?saved=0, against the
+        saved schedules; a row with an ``id`` replaces that schedule.
+        """
+        serializer = TimetableEntrySerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        entries = serializer.validated_data
+        slots = [
+            make_slot(f'row:{number}', entry['class_assigned'], entry['teacher'], entry['room_number'],
+                      entry['weekday'], entry['start_time'], entry['end_time'])
+            for number, entry in enumerate(entries)
+        ]
+        if request.query_params.get('saved', '1') not in ('0', 'false', 'no'):
+            replaced = {entry['id'] for entry in entries if 'id' in entry}
+            slots += [slot for slot in timetable_index().slots() if slot.ref not in replaced]
+        
+        conflicts = find_conflicts(slots)
+        return Response({
+            'entries': len(entries),
+            'conflicts': [
+                {'kind': kind, 'entry': slot.ref, 'with': other.ref, 'at': describe(max(slot.start, other.start))}
+                for kind, slot, other in conflicts
+            ],
+        })
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-date', '-id')
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -391,6 +513,27 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             
         return queryset.order_by('-date')
     
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            attendance = serializer.save()
+            record_attendance_changes(added=[attendance])
+    
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        previous = Attendance(
+            student_id=instance.student_id,
+            subject_id=instance.subject_id,
+            is_present=instance.is_present,
+        )
+        with transaction.atomic():
+            attendance = serializer.save()
+            record_attendance_changes(added=[attendance], removed=[previous])
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            record_attendance_changes(removed=[instance])
+    
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
         serializer = self.get_serializer(data=request.data, many=True)
@@ -399,7 +542,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ExaminationViewSet(viewsets.ModelViewSet):
+class ExaminationViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Examination.objects.all()
     serializer_class = ExaminationSerializer
     permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
@@ -423,14 +566,16 @@ class ExaminationViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def results(self, request, pk=None):
         examination = self.get_object()
-        results = Result.objects.filter(examination=examination)
+        results = optimize_queryset(Result.objects, ResultSerializer).filter(examination=examination)
         serializer = ResultSerializer(results, many=True)
         return Response(serializer.data)
 
-class ResultViewSet(viewsets.ModelViewSet):
+class ResultViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Result.objects.all()
     serializer_class = ResultSerializer
     permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-examination__date', '-id')
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -459,24 +604,19 @@ class ResultViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class NoticeViewSet(viewsets.ModelViewSet):
+class NoticeViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Notice.objects.filter(is_active=True)
     serializer_class = NoticeSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
     
     def get_queryset(self):
         queryset = super().get_queryset()
         user = self.request.user
         
-        # Filter by target audience
-        if user.user_type == 'teacher':
-            queryset = queryset.filter(
-                Q(target_audience='teacher') | Q(target_audience='all')
-            )
-        elif user.user_type == 'student':
-            queryset = queryset.filter(
-                Q(target_audience='student') | Q(target_audience='all')
-            )
+        # Filter by target audience: role, department and class
+        queryset = queryset.filter(visible_notices_q(user, self.request.profile))
             
         # Filter by priority if provided
         priority = self.request.query_params.get('priority')
@@ -484,13 +624,35 @@ class NoticeViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(priority=priority.lower())
             
         return queryset.order_by('-created_at')
-    
+
+    def list(self, request, *args, **kwargs):
+        # Notices are polled; answer unchanged lists with 304
+        queryset = self.filter_queryset(self.get_queryset())
+        etag = queryset_etag(request, queryset, ['updated_at'])
+        return conditional_response(
+            request, etag, lambda: super(NoticeViewSet, self).list(request, *args, **kwargs)
+        )
+    
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        """The newest notices for the user and how many are unread, from the cached feeds."""
+        return Response(user_feed(request.user, request.profile))
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def read(self, request):
+        """Mark notices read up to ``id``, or up to the newest in the feed."""
+        serializer = NoticeReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        notice_id = serializer.validated_data.get('id')
+        notice = generics.get_object_or_404(self.get_queryset(), pk=notice_id) if notice_id is not None else None
+        return Response({'last_read_id': mark_read(request.user, request.profile, notice)})
+
     def perform_destroy(self, instance):
         # Soft delete
         instance.is_active = False
         instance.save()
 
-class AssignmentViewSet(viewsets.ModelViewSet):
+class AssignmentViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Assignment.objects.all()
     serializer_class = AssignmentSerializer
     permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
@@ -499,16 +661,15 @@ class AssignmentViewSet(viewsets.ModelViewSet):
         queryset = super().get_queryset()
         user = self.request.user
         
+        profile = self.request.profile
         # Students can only see their own class assignments
         if user.user_type == 'student':
-            student = Student.objects.filter(user=user).first()
-            if student:
-                queryset = queryset.filter(class_assigned=student.class_enrolled)
+            if profile:
+                queryset = queryset.filter(class_assigned=profile.class_enrolled_id)
         # Teachers can only see their own assignments
         elif user.user_type == 'teacher':
-            teacher = Teacher.objects.filter(user=user).first()
-            if teacher:
-                queryset = queryset.filter(teacher=teacher)
+            if profile:
+                queryset = queryset.filter(teacher=profile.id)
                 
         # Filter by class and subject if provided
         class_id = self.request.query_params.get('class_id')
@@ -529,29 +690,30 @@ class AssignmentViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def submissions(self, request, pk=None):
         assignment = self.get_object()
-        submissions = AssignmentSubmission.objects.filter(assignment=assignment)
+        submissions = optimize_queryset(AssignmentSubmission.objects, AssignmentSubmissionSerializer).filter(assignment=assignment)
         serializer = AssignmentSubmissionSerializer(submissions, many=True)
         return Response(serializer.data)
 
-class AssignmentSubmissionViewSet(viewsets.ModelViewSet):
+class AssignmentSubmissionViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = AssignmentSubmission.objects.all()
     serializer_class = AssignmentSubmissionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-submitted_at', '-id')
     
     def get_queryset(self):
         queryset = super().get_queryset()
         user = self.request.user
         
+        profile = self.request.profile
         # Students can only see their own submissions
         if user.user_type == 'student':
-            student = Student.objects.filter(user=user).first()
-            if student:
-                queryset = queryset.filter(student=student)
+            if profile:
+                queryset = queryset.filter(student=profile.id)
         # Teachers can see all submissions for their assignments
         elif user.user_type == 'teacher':
-            teacher = Teacher.objects.filter(user=user).first()
-            if teacher:
-                queryset = queryset.filter(assignment__teacher=teacher)
+            if profile:
+                queryset = queryset.filter(assignment__teacher=profile.id)
                 
         # Filter by assignment if provided
         assignment_id = self.request.query_params.get('assignment_id')
@@ -562,7 +724,9 @@ class AssignmentSubmissionViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         # Set the student to the current user's student profile
-        student = Student.objects.get(user=self.request.user)
+        student = self.request.profile
+        if self.request.user.user_type != 'student' or not student:
+            raise PermissionDenied('Student profile not found')
         assignment = serializer.validated_data['assignment']
         
         # Check for late submission
@@ -596,34 +760,23 @@ def mark_attendance(request):
     if request.user.user_type != 'teacher':
         return Response({'error': 'Only teachers can mark attendance'}, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        teacher = Teacher.objects.get(user=request.user)
-        attendance_data = request.data.get('attendance', [])
-        
-        for item in attendance_data:
-            student_id = item.get('student_id')
-            subject_id = item.get('subject_id')
-            is_present = item.get('is_present', False)
-            date = item.get('date', timezone.now().date())
-            
-            student = Student.objects.get(id=student_id)
-            subject = Subject.objects.get(id=subject_id)
-            
-            attendance, created = Attendance.objects.get_or_create(
-                student=student,
-                subject=subject,
-                teacher=teacher,
-                date=date,
-                defaults={'is_present': is_present}
-            )
-            
-            if not created:
-                attendance.is_present = is_present
-                attendance.save()
-        
-        return Response({'message': 'Attendance marked successfully'})
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    teacher = request.profile
+    if not teacher:
+        return Response({'error': 'Teacher profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    attendance_data = request.data.get('attendance', [])
+    if not isinstance(attendance_data, list):
+        return Response({'error': 'attendance must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+
+    saved, errors = upsert_attendance(teacher, attendance_data)
+
+    if errors and not saved:
+        return Response({'error': 'No attendance was marked', 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'message': 'Attendance marked successfully',
+        'saved': saved,
+        'errors': errors,
+    })
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -631,13 +784,13 @@ def student_attendance(request):
     if request.user.user_type != 'student':
         return Response({'error': 'Only students can view their attendance'}, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        student = Student.objects.get(user=request.user)
-        attendance = Attendance.objects.filter(student=student).order_by('-date')
-        serializer = AttendanceSerializer(attendance, many=True)
-        return Response(serializer.data)
-    except Student.DoesNotExist:
+    if not request.profile:
         return Response({'error': 'Student profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    attendance = Attendance.objects.filter(student=request.profile.id)
+    etag = queryset_etag(request, attendance, ['updated_at'], ['subject'])
+    return conditional_response(request, etag, lambda: Response(
+        AttendanceSerializer(optimize_queryset(attendance, AttendanceSerializer).order_by('-date'), many=True).data
+    ))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -645,13 +798,13 @@ def student_results(request):
     if request.user.user_type != 'student':
         return Response({'error': 'Only students can view their results'}, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        student = Student.objects.get(user=request.user)
-        results = Result.objects.filter(student=student).order_by('-created_at')
-        serializer = ResultSerializer(results, many=True)
-        return Response(serializer.data)
-    except Student.DoesNotExist:
+    if not request.profile:
         return Response({'error': 'Student profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    results = Result.objects.filter(student=request.profile.id)
+    etag = queryset_etag(request, results, ['updated_at'], ['subject'])
+    return conditional_response(request, etag, lambda: Response(
+        ResultSerializer(optimize_queryset(results, ResultSerializer).order_by('-created_at'), many=True).data
+    ))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -659,10 +812,205 @@ def teacher_classes(request):
     if request.user.user_type != 'teacher':
         return Response({'error': 'Only teachers can view their classes'}, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        teacher = Teacher.objects.get(user=request.user)
-        classes = Class.objects.filter(class_teacher=request.user)
-        serializer = ClassSerializer(classes, many=True)
-        return Response(serializer.data)
-    except Teacher.DoesNotExist:
+    if not request.profile:
         return Response({'error': 'Teacher profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    classes = optimize_queryset(Class.objects, ClassSerializer).filter(class_teacher=request.user)
+    serializer = ClassSerializer(classes, many=True)
+    return Response(serializer.data)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def reference_cache_stats(request):
+    return Response(reference_cache.stats())
+
+# Request profiling figures of this process; DELETE starts a new window
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def perf_report(request):
+    if request.method == 'DELETE':
+        profiler.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    sort = request.query_params.get('sort', 'total_ms')
+    if sort not in SORT_FIELDS:
+        return Response({'error': f"sort must be one of: {', '.join(SORT_FIELDS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    top = request.query_params.get('top', '')
+    return Response(profiler.report(sort=sort, top=int(top) if top.isdigit() else None))
+
+# Exam, subject and student statistics of a class, cached until its results change
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsTeacherOrAdmin])
+def class_analytics(request, class_id):
+    data = build_class_analytics(class_id)
+    if data is None:
+        return Response({'error': 'Class not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(data)
+
+# Exports stream CSV by default; NDJSON via Accept or ?format=ndjson
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsTeacherOrAdmin])
+@renderer_classes([JSONRenderer, CSVRenderer, NDJSONRenderer])
+def export_attendance(request):
+    return export_response(request, 'attendance', Attendance.objects.all(), ATTENDANCE_COLUMNS, ATTENDANCE_FILTERS)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsTeacherOrAdmin])
+@renderer_classes([JSONRenderer, CSVRenderer, NDJSONRenderer])
+def export_results(request):
+    return export_response(request, 'results', Result.objects.all(), RESULT_COLUMNS, RESULT_FILTERS)
+
+def _run_import(request, importer):
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload a .csv or .xlsx file as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+    dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+
+    try:
+        report = importer(read_rows(upload.file, upload.name), dry_run=dry_run)
+    except ImportFileError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if report['errors'] and not report['saved']:
+        return Response(report, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report)
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@parser_classes([MultiPartParser])
+def import_students(request):
+    return _run_import(request, import_student_rows)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsTeacherOrAdmin])
+@parser_classes([MultiPartParser])
+def import_results(request):
+    return _run_import(request, import_result_rows)
+
+# Student features of the legacy `backend` app, served from these models at
+# the paths its clients call: student/marks/, student/performance/ and
+# student/assignments/. Each answers with a fixed number of queries.
+def performance_recommendation(average, trend):
+    if average >= 80:
+        if trend == 'improving':
+            return "Excellent work! Keep up the momentum."
+        elif trend == 'declining':
+            return "Good performance but showing decline. Review study methods."
+        else:
+            return "Consistent excellent performance. Consider challenging yourself more."
+    elif average >= 60:
+        if trend == 'improving':
+            return "Good progress! Continue with current study approach."
+        elif trend == 'declining':
+            return "Performance declining. Consider seeking help from teachers."
+        else:
+            return "Average performance. Focus on weak subjects."
+    else:
+        return "Performance needs improvement. Consider additional study support."
+
+class LegacyStudentViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def _student(self, request):
+        if request.user.user_type != 'student':
+            return None, Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+        if not request.profile:
+            return None, Response({'error': 'Student profile not found'}, status=status.HTTP_404_NOT_FOUND)
+        return request.profile, None
+
+    @action(detail=False)
+    def marks(self, request):
+        student, error = self._student(request)
+        if error:
+            return error
+        rows = Result.objects.filter(student=student).order_by('examination__date', 'id').values_list(
+            'id', 'examination__subject__name', 'examination__name', 'examination__exam_type',
+            'marks_obtained', 'examination__total_marks', 'examination__date', 'remarks',
+        )
+        return Response([
+            {
+                'id': result_id,
+                'subject': subject,
+                'exam_name': exam_name,
+                'exam_type': exam_type,
+                'marks_obtained': marks,
+                'total_marks': total_marks,
+                'percentage': percentage(marks, total_marks),
+                'date': exam_date,
+                'remarks': remarks,
+            }
+            for result_id, subject, exam_name, exam_type, marks, total_marks, exam_date, remarks in rows
+        ])
+
+    @action(detail=False)
+    def performance(self, request):
+        student, error = self._student(request)
+        if error:
+            return error
+        percentages = [
+            percentage for _, percentage in result_percentages(Result.objects.filter(student=student))
+        ]
+        trend = linear_trend(percentages)
+        if trend is None:
+            return Response({'message': 'Insufficient data for prediction'})
+
+        trend_name = trend_direction(trend.slope)
+        return Response({
+            'current_average': trend.average,
+            'trend': trend_name,
+            'predictions': predict(trend),
+            'recommendation': performance_recommendation(trend.average, trend_name),
+        })
+
+    @action(detail=False)
+    def assignments(self, request):
+        student, error = self._student(request)
+        if error:
+            return error
+        assignments = (
+            Assignment.objects.filter(class_assigned_id=student.class_enrolled_id)
+            .select_related('subject')
+            .prefetch_related(Prefetch(
+                'assignmentsubmission_set',
+                queryset=AssignmentSubmission.objects.filter(student=student),
+                to_attr='own_submissions',
+            ))
+            .order_by('due_date', 'id')
+        )
+        data = []
+        for assignment in assignments:
+            submission = assignment.own_submissions[0] if assignment.own_submissions else None
+            data.append({
+                'id': assignment.id,
+                'title': assignment.title,
+                'description': assignment.description,
+                'subject': assignment.subject.name,
+                'assigned_date': assignment.created_at,
+                'due_date': assignment.due_date,
+                'total_marks': assignment.total_marks,
+                'is_submitted': submission is not None,
+                'submission_date': submission.submitted_at if submission else None,
+                'marks_obtained': submission.marks_obtained if submission else None,
+                'feedback': submission.feedback if submission else None,
+            })
+        return Response(data)
+
+# Server push replacing notice/dashboard polling, see realtime.py. A plain
+# async view: EventSource cannot send headers, so the JWT may come as ?token=
+@require_GET
+async def notification_stream(request):
+    if not isinstance(request, ASGIRequest):
+        # A WSGI server would hold a worker for as long as the client stays connected
+        return JsonResponse({'detail': 'Server push needs the site served over ASGI; poll the notice list instead.'},
+                            status=501)
+    user = await sync_to_async(request_user)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    channels = await sync_to_async(channels_for)(user)
+    last_event_id = parse_event_id(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id'))
+    subscription = broker.subscribe(channels, last_event_id)
+    response = StreamingHttpResponse(
+        sse_stream(subscription, realtime_options()['HEARTBEAT']), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,130 @@
+"""
+Student dashboard latency with many students at once: WSGI against ASGI.
+
+    python scripts/benchmark_async.py [--students 500] [--threads 16] [--rounds 3] [--query-latency 2]
+
+Generates --students students (10 classes) and sends each one dashboard
+request at the same moment, with the dashboard cache cleared so every
+request builds its stats:
+
+- WSGI: the synchronous handler on --threads threads, as a threaded WSGI
+  server (gunicorn --threads) would run DashboardViewSet.
+- ASGI, DRF view: the ASGI handler running DashboardViewSet, which Django
+  hands to its one thread for sync views.
+- ASGI, async view: the ASGI handler running async_views.dashboard, whose
+  independent queries run concurrently on ASYNC_QUERY_WORKERS threads.
+
+Requests go through Django's test Client / AsyncClient (the same handler
+classes as the servers, without sockets). Reports wall time for all
+requests, throughput and latency percentiles measured from the moment all
+requests arrive, so time queued for a thread counts.
+
+The throwaway SQLite database answers in microseconds and never waits on
+I/O; --query-latency adds a sleep to each query (milliseconds, releasing
+the GIL like a network round trip) to model a database server.
+"""
+from benchmark_utils import benchmark_database, print_table
+from generate_data import generate
+
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+
+from college_portal.authentication import ClaimsRefreshToken
+from college_portal.models import Student
+
+CLASSES = 10
+
+
+def summary(name, wall, latencies, statuses):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    errors = sum(status != 200 for status in statuses)
+    return [name, f'{wall:.2f}', f'{len(latencies) / wall:.0f}', f'{statistics.median(latencies) * 1000:.0f}',
+            f'{p95 * 1000:.0f}', errors]
+
+
+def add_query_latency(seconds):
+    def execute(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def wrap(sender, connection, **kwargs):
+        connection.execute_wrappers.append(execute)
+
+    connection_created.connect(wrap, weak=False)
+    for connection in connections.all(initialized_only=True):
+        wrap(None, connection)
+
+
+def wsgi_round(tokens, threads):
+    start = time.perf_counter()
+
+    def request(token):
+        response = Client().get('/api/v1/dashboard/', HTTP_AUTHORIZATION=token)
+        return time.perf_counter() - start, response.status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(request, tokens))
+    return time.perf_counter() - start, results
+
+
+async def asgi_round(tokens, path):
+    client = AsyncClient()
+    start = time.perf_counter()
+
+    async def request(token):
+        response = await client.get(path, headers={'Authorization': token})
+        return time.perf_counter() - start, response.status_code
+
+    results = await asyncio.gather(*(request(token) for token in tokens))
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--query-latency', type=float, default=0, help='Milliseconds added to every query.')
+    args = parser.parse_args()
+
+    with benchmark_database():
+        generate(verbosity=0, departments=2, classes_per_department=CLASSES // 2,
+                 students_per_class=-(-args.students // CLASSES), teachers_per_department=4,
+                 subjects_per_class=4, years=1, days_per_year=30)
+        users = [student.user for student in Student.objects.select_related('user').order_by('id')[:args.students]]
+        tokens = [f'Bearer {ClaimsRefreshToken.for_user(user).access_token}' for user in users]
+        if args.query_latency:
+            add_query_latency(args.query_latency / 1000)
+
+        modes = [
+            (f'WSGI, DRF view, {args.threads} threads', lambda: wsgi_round(tokens, args.threads)),
+            ('ASGI, DRF view', lambda: asyncio.run(asgi_round(tokens, '/api/v1/dashboard/'))),
+            ('ASGI, async view', lambda: asyncio.run(asgi_round(tokens, '/api/v1/async/dashboard/'))),
+        ]
+        rows = []
+        for name, run in modes:
+            best = None
+            for _ in range(args.rounds):
+                cache.clear()
+                wall, results = run()
+                if best is None or wall < best[0]:
+                    best = (wall, results)
+            wall, results = best
+            rows.append(summary(name, wall, [latency for latency, _ in results], [status for _, status in results]))
+
+    print(f'{len(tokens)} concurrent student dashboards, cold cache, {args.query_latency:g} ms per query, '
+          f'best of {args.rounds}')
+    print_table(['server', 'seconds', 'req/s', 'p50 ms', 'p95 ms', 'errors'], rows)
+
+
+if __name__ == '__main__':
+    main()
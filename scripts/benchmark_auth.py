@@ -0,0 +1,54 @@
+"""
+Queries and time JWT authentication adds to each request.
+
+    python scripts/benchmark_auth.py [--preset small] [--requests 500]
+
+Sends --requests dashboard requests (cached after the first, so the view
+itself makes no queries) for an admin, a teacher and a student, once with
+a token carrying only the user id, authenticated by loading the user, and
+once with a login token carrying the claims (authentication.py).
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+from generate_data import PRESETS, generate
+
+import argparse
+
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from college_portal.authentication import ClaimsRefreshToken
+from college_portal.models import Student, Teacher, User
+
+TOKENS = [('user id only', RefreshToken), ('claims', ClaimsRefreshToken)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        generate(verbosity=0, **PRESETS[args.preset])
+        users = {
+            'admin': User.objects.get(username='admin'),
+            'teacher': Teacher.objects.select_related('user').order_by('id').first().user,
+            'student': Student.objects.select_related('user').order_by('id').first().user,
+        }
+        client = Client()
+        rows = []
+        for role, user in users.items():
+            for name, token_class in TOKENS:
+                header = f'Bearer {token_class.for_user(user).access_token}'
+                assert client.get('/api/v1/dashboard/', HTTP_AUTHORIZATION=header).status_code == 200
+                with measure() as timing:
+                    for _ in range(args.requests):
+                        client.get('/api/v1/dashboard/', HTTP_AUTHORIZATION=header)
+                rows.append([role, name, f"{timing['queries'] / args.requests:g}",
+                             f"{timing['seconds'] / args.requests * 1000:.2f}"])
+    print(f'{args.requests} cached dashboard requests per row')
+    print_table(['role', 'token', 'queries/request', 'ms/request'], rows)
+
+
+if __name__ == '__main__':
+    main()
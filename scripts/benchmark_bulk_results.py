@@ -0,0 +1,85 @@
+"""
+Time POST results/bulk_create/ and attendance/bulk_create/ for a large upload.
+
+    python scripts/benchmark_bulk_results.py [rows]
+
+Defaults to an end-of-term upload of 5,000 results (50 exams x 100 students).
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+
+import sys
+from datetime import date, timedelta
+
+from rest_framework.test import APIClient
+
+from college_portal.models import *
+
+STUDENTS = 100
+
+
+def create_fixtures(exam_count):
+    department = Department.objects.create(name='Computer Science', code='CS')
+    class_obj = Class.objects.create(name='CS-101', section='A', department=department, academic_year='2024-25')
+    subjects = Subject.objects.bulk_create([
+        Subject(name=f'Subject {i}', code=f'CS{i:03d}', credits=3, department=department, semester=1)
+        for i in range(exam_count)
+    ])
+    admin_user = User.objects.create(username='admin', user_type='admin', is_staff=True)
+    teacher = Teacher.objects.create(
+        user=User.objects.create(username='teacher', user_type='teacher'), employee_id='T001',
+        department=department, qualification='M.Tech', joining_date=date(2020, 1, 15)
+    )
+    examinations = Examination.objects.bulk_create([
+        Examination(
+            name=f'Final {subject.code}', exam_type='final', subject=subject, class_assigned=class_obj,
+            date=date(2025, 4, 1), start_time='10:00', end_time='12:00', total_marks=100, passing_marks=40
+        )
+        for subject in subjects
+    ])
+    users = User.objects.bulk_create([User(username=f'student{i}', user_type='student') for i in range(STUDENTS)])
+    students = Student.objects.bulk_create([
+        Student(
+            user=user, student_id=f'S{i:05d}', class_enrolled=class_obj, roll_number=str(i),
+            admission_date=date(2024, 7, 1), guardian_name='Guardian', guardian_phone='1234567890'
+        )
+        for i, user in enumerate(users)
+    ])
+    return admin_user, teacher, subjects, examinations, students
+
+
+def run(rows):
+    exam_count = max(1, rows // STUDENTS)
+    results = []
+    with benchmark_database():
+        admin_user, teacher, subjects, examinations, students = create_fixtures(exam_count)
+        client = APIClient()
+        client.force_authenticate(admin_user)
+
+        payload = [
+            {'student': student.id, 'examination': exam.id, 'marks_obtained': (student.id * 7 + exam.id) % 101}
+            for exam in examinations for student in students
+        ]
+        with measure() as timing:
+            response = client.post('/api/v1/results/bulk_create/', payload, format='json')
+        assert response.status_code == 201, response.content[:500]
+        results.append(['results', len(payload), timing['queries'], f"{timing['seconds'] * 1000:.0f}"])
+
+        start = date(2024, 9, 2)
+        payload = [
+            {
+                'student': student.id, 'subject': subject.id, 'teacher': teacher.id,
+                'date': str(start + timedelta(days=day)), 'is_present': (student.id + day) % 5 != 0,
+            }
+            for subject in subjects[:max(1, exam_count // 10)]
+            for day in range(10) for student in students
+        ]
+        with measure() as timing:
+            response = client.post('/api/v1/attendance/bulk_create/', payload, format='json')
+        assert response.status_code == 201, response.content[:500]
+        results.append(['attendance', len(payload), timing['queries'], f"{timing['seconds'] * 1000:.0f}"])
+
+    print_table(['endpoint', 'rows', 'queries', 'ms'], results)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,65 @@
+"""
+Polling load test for the conditional GET endpoints.
+
+    python scripts/benchmark_conditional_get.py [polls]
+
+A student polls each endpoint ``polls`` times, once replaying the last
+ETag in If-None-Match and once without, against a history of ROWS rows.
+Unchanged data should come back as a bodyless 304 for a fraction of the
+CPU time, queries and bytes of a full response.
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+from check_query_counts import populate
+
+import sys
+import time
+
+from rest_framework.test import APIClient
+
+ROWS = 100
+POLLS = 50
+ENDPOINTS = [
+    '/api/v1/student/attendance/',
+    '/api/v1/student/results/',
+    '/api/v1/notices/',
+    '/api/v1/dashboard/',
+]
+
+
+def poll(client, url, polls, conditional):
+    etag = None
+    statuses = set()
+    sent = 0
+    cpu = time.process_time()
+    with measure() as timing:
+        for _ in range(polls):
+            headers = {'HTTP_IF_NONE_MATCH': etag} if conditional and etag else {}
+            response = client.get(url, **headers)
+            etag = response.get('ETag', etag)
+            statuses.add(response.status_code)
+            sent += len(response.content)
+    timing['cpu'] = time.process_time() - cpu
+    timing['bytes'] = sent
+    timing['statuses'] = '/'.join(str(status) for status in sorted(statuses))
+    return timing
+
+
+def run(polls):
+    rows = []
+    with benchmark_database():
+        data = populate(ROWS)
+        client = APIClient()
+        client.force_authenticate(data['users']['student'])
+        for url in ENDPOINTS:
+            for conditional in (False, True):
+                timing = poll(client, url, polls, conditional)
+                rows.append([
+                    url, 'If-None-Match' if conditional else 'plain', timing['statuses'],
+                    f"{timing['seconds'] / polls * 1000:.2f}", f"{timing['cpu'] / polls * 1000:.2f}",
+                    f"{timing['queries'] / polls:.1f}", timing['bytes'] // polls,
+                ])
+    print_table(['endpoint', 'request', 'status', 'ms/req', 'cpu ms/req', 'queries/req', 'bytes/req'], rows)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else POLLS)
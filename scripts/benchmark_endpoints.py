@@ -0,0 +1,331 @@
+"""
+Latency, query and memory baseline for every API endpoint.
+
+    python scripts/benchmark_endpoints.py [--preset small] [--repeat 20] [--output baseline.json]
+    python scripts/benchmark_endpoints.py --compare before.json after.json
+
+Generates a seeded data set (see generate_data.py) in a throwaway test
+database, drives each endpoint in college_portal/urls.py through the test
+client and records p50/p95 latency, queries per request and peak traced
+memory. The JSON output is meant to be diffed between commits with
+--compare. Writes that change the data (create/update/delete, imports)
+are not driven, so every run sees the same rows.
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+from generate_data import PRESETS, generate
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+
+import django
+from django.core.cache import cache
+from django.core.paginator import UnorderedObjectListWarning
+from django.urls import resolve
+from rest_framework.test import APIClient
+
+from college_portal import urls
+from college_portal.models import *
+from college_portal.reference_cache import reference_cache
+
+warnings.filterwarnings('ignore', category=UnorderedObjectListWarning)
+
+# (role, method, url, body); {names} are filled from sample_ids()
+ENDPOINTS = [
+    (None, 'post', '/api/v1/auth/login/', {'username': 'admin', 'password': 'password'}),
+    ('admin', 'get', '/api/v1/auth/me/', None),
+    ('admin', 'post', '/api/v1/auth/refresh/', 'refresh'),
+    ('admin', 'get', '/api/v1/users/', None),
+    ('admin', 'get', '/api/v1/users/profile/', None),
+    ('admin', 'get', '/api/v1/users/{student_user}/', None),
+    ('admin', 'get', '/api/v1/departments/', None),
+    ('admin', 'get', '/api/v1/departments/{department}/', None),
+    ('admin', 'get', '/api/v1/departments/{department}/classes/', None),
+    ('admin', 'get', '/api/v1/classes/', None),
+    ('admin', 'get', '/api/v1/classes/{class}/', None),
+    ('admin', 'get', '/api/v1/classes/{class}/students/', None),
+    ('admin', 'get', '/api/v1/classes/{class}/schedule/', None),
+    ('admin', 'get', '/api/v1/classes/{class}/schedule/now/', None),
+    ('admin', 'get', '/api/v1/subjects/', None),
+    ('admin', 'get', '/api/v1/subjects/{subject}/', None),
+    ('admin', 'get', '/api/v1/subjects/{subject}/teachers/', None),
+    ('admin', 'get', '/api/v1/teachers/', None),
+    ('admin', 'get', '/api/v1/teachers/{teacher}/', None),
+    ('admin', 'get', '/api/v1/teachers/{teacher}/classes/', None),
+    ('admin', 'get', '/api/v1/teachers/{teacher}/schedule/', None),
+    ('admin', 'get', '/api/v1/teachers/{teacher}/schedule/now/', None),
+    ('admin', 'get', '/api/v1/students/', None),
+    ('admin', 'get', '/api/v1/students/{student}/', None),
+    ('admin', 'get', '/api/v1/students/{student}/attendance/', None),
+    ('admin', 'get', '/api/v1/students/{student}/results/', None),
+    ('admin', 'get', '/api/v1/schedules/', None),
+    ('admin', 'get', '/api/v1/schedules/{schedule}/', None),
+    ('admin', 'get', '/api/v1/attendance/', None),
+    ('admin', 'get', '/api/v1/attendance/?cursor=', None),
+    ('admin', 'get', '/api/v1/attendance/{attendance}/', None),
+    ('admin', 'get', '/api/v1/examinations/', None),
+    ('admin', 'get', '/api/v1/examinations/{examination}/', None),
+    ('admin', 'get', '/api/v1/examinations/{examination}/results/', None),
+    ('admin', 'get', '/api/v1/results/', None),
+    ('admin', 'get', '/api/v1/results/?cursor=', None),
+    ('admin', 'get', '/api/v1/results/{result}/', None),
+    ('admin', 'get', '/api/v1/notices/', None),
+    ('admin', 'get', '/api/v1/notices/{notice}/', None),
+    ('admin', 'get', '/api/v1/assignments/', None),
+    ('admin', 'get', '/api/v1/assignments/{assignment}/', None),
+    ('admin', 'get', '/api/v1/assignments/{assignment}/submissions/', None),
+    ('admin', 'get', '/api/v1/submissions/', None),
+    ('admin', 'get', '/api/v1/submissions/{submission}/', None),
+    ('admin', 'get', '/api/v1/dashboard/', None),
+    ('admin', 'get', '/api/v1/export/attendance/?class={class}', None),
+    ('admin', 'get', '/api/v1/export/results/?class={class}', None),
+    ('admin', 'get', '/api/v1/cache/stats/', None),
+    ('admin', 'get', '/api/v1/_perf/', None),
+    ('teacher', 'get', '/api/v1/dashboard/', None),
+    ('teacher', 'get', '/api/v1/teacher/classes/', None),
+    ('teacher', 'get', '/api/v1/analytics/class/{class}/', None),
+    ('teacher', 'post', '/api/v1/attendance/mark/', 'roster'),
+    ('student', 'get', '/api/v1/dashboard/', None),
+    ('student', 'get', '/api/v1/student/attendance/', None),
+    ('student', 'get', '/api/v1/student/results/', None),
+    ('student', 'get', '/api/v1/student/marks/', None),
+    ('student', 'get', '/api/v1/student/performance/', None),
+    ('student', 'get', '/api/v1/student/assignments/', None),
+    ('student', 'get', '/api/v1/notices/feed/', None),
+]
+
+
+def sample_ids():
+    """Ids of one row of each kind, from the first student's class."""
+    student = Student.objects.order_by('id').first()
+    class_obj = student.class_enrolled
+    schedule = Schedule.objects.filter(class_assigned=class_obj).order_by('id').first()
+    assignment = Assignment.objects.filter(class_assigned=class_obj).order_by('id').first()
+    return {
+        'student_user': student.user_id,
+        'student': student.id,
+        'class': class_obj.id,
+        'department': class_obj.department_id,
+        'subject': schedule.subject_id,
+        'teacher': schedule.teacher_id,
+        'schedule': schedule.id,
+        'attendance': Attendance.objects.filter(student=student).order_by('id').values_list('id', flat=True).first(),
+        'examination': Examination.objects.filter(class_assigned=class_obj).order_by('id').values_list('id', flat=True).first(),
+        'result': Result.objects.filter(student=student).order_by('id').values_list('id', flat=True).first(),
+        'notice': Notice.objects.order_by('id').values_list('id', flat=True).first(),
+        'assignment': assignment.id,
+        'submission': AssignmentSubmission.objects.filter(assignment=assignment).order_by('id').values_list('id', flat=True).first(),
+    }
+
+
+class RefreshChain:
+    """
+    Bodies for the refresh endpoint. Rotation blacklists each refresh token
+    once used, so every call sends the token the previous call returned, as
+    a client would.
+    """
+
+    def __init__(self, refresh):
+        self.refresh = refresh
+
+    def body(self):
+        return {'refresh': self.refresh}
+
+    def update(self, response):
+        if response.status_code == 200:
+            self.refresh = response.data['refresh']
+
+
+def request_bodies(ids):
+    teacher = Teacher.objects.get(id=ids['teacher'])
+    students = Student.objects.filter(class_enrolled_id=ids['class']).values_list('id', flat=True)
+    last_day = Attendance.objects.filter(student_id=ids['student']).order_by('-date').values_list('date', flat=True).first()
+    client = APIClient()
+    refresh = client.post('/api/v1/auth/login/', {'username': 'admin', 'password': 'password'}, format='json').data['refresh']
+    return teacher.user, {
+        # Re-marking a day already on record keeps the data unchanged
+        'roster': {'attendance': [
+            {'student_id': student_id, 'subject_id': ids['subject'], 'date': str(last_day), 'is_present': True}
+            for student_id in students
+        ]},
+        'refresh': RefreshChain(refresh),
+    }
+
+
+def call(client, method, url, body):
+    payload = body.body() if isinstance(body, RefreshChain) else body
+    response = getattr(client, method)(url, payload, format='json') if method == 'post' else client.get(url)
+    if isinstance(body, RefreshChain):
+        body.update(response)
+    if not 200 <= response.status_code < 300:
+        # Timing an error path would report a meaningless number
+        detail = b'' if response.streaming else response.content[:200]
+        raise RuntimeError(f'{method.upper()} {url} answered {response.status_code}: {detail!r}')
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+        response.close()
+    return response
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def bench_endpoint(client, method, url, body, repeat, cold):
+    latencies = []
+    queries = []
+    status = None
+    call(client, method, url, body)  # warm up imports and lazy setup
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+            reference_cache.clear()
+        with measure() as timing:
+            response = call(client, method, url, body)
+        status = response.status_code
+        latencies.append(timing['seconds'] * 1000)
+        queries.append(timing['queries'])
+
+    tracemalloc.start()
+    call(client, method, url, body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'status': status,
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'queries': statistics.median(queries),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def uncovered_routes():
+    """Names of URL patterns no entry in ENDPOINTS resolves to."""
+    covered = {resolve(url.split('?')[0].format_map(_AnyId())).url_name for _, _, url, _ in ENDPOINTS}
+    names = {pattern.name for pattern in urls.router.urls if pattern.name} | {
+        pattern.name for pattern in urls.urlpatterns if getattr(pattern, 'name', None)
+    }
+    return sorted(names - covered - {'api-root'})
+
+
+class _AnyId(dict):
+    def __missing__(self, key):
+        return '1'
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(preset, seed, repeat, cold):
+    results = {}
+    with benchmark_database():
+        start = time.perf_counter()
+        counts = generate(seed=seed, verbosity=0, **PRESETS[preset])
+        print(f'Generated {preset} data set in {time.perf_counter() - start:.1f}s: '
+              + ', '.join(f'{value} {key}' for key, value in counts.items()), file=sys.stderr)
+
+        ids = sample_ids()
+        teacher_user, bodies = request_bodies(ids)
+        users = {
+            'admin': User.objects.get(username='admin'),
+            'teacher': teacher_user,
+            'student': Student.objects.get(id=ids['student']).user,
+        }
+        for role, method, url, body in ENDPOINTS:
+            client = APIClient()
+            if role:
+                client.force_authenticate(users[role])
+            target = url.format(**ids)
+            payload = bodies[body] if isinstance(body, str) else body
+            stats = bench_endpoint(client, method, target, payload, repeat, cold)
+            results[f'{method.upper()} {url} ({role or "anonymous"})'] = stats
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'preset': preset,
+            'seed': seed,
+            'repeat': repeat,
+            'cold_cache': cold,
+            'rows': counts,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'endpoints': results,
+    }
+
+
+def show(baseline):
+    rows = [
+        [name, stats['status'], stats['p50_ms'], stats['p95_ms'], stats['queries'], stats['peak_kib']]
+        for name, stats in baseline['endpoints'].items()
+    ]
+    print_table(['endpoint', 'status', 'p50 ms', 'p95 ms', 'queries', 'peak KiB'], rows)
+
+
+def compare(before_path, after_path):
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+
+    def change(old, new):
+        if old is None or new is None:
+            return '-'
+        if not old:
+            return f'{new - old:+g}'
+        return f'{(new - old) / old * 100:+.0f}%'
+
+    rows = []
+    for name, new in after['endpoints'].items():
+        old = before['endpoints'].get(name, {})
+        rows.append([
+            name,
+            old.get('p50_ms'), new['p50_ms'], change(old.get('p50_ms'), new['p50_ms']),
+            old.get('queries'), new['queries'],
+            change(old.get('peak_kib'), new['peak_kib']),
+        ])
+    print(f"{before['meta'].get('revision')} -> {after['meta'].get('revision')}")
+    print_table(['endpoint', 'p50 before', 'p50 after', 'p50', 'queries before', 'queries after', 'peak'], rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=20, help='Timed requests per endpoint.')
+    parser.add_argument('--cold', action='store_true', help='Clear caches before every request.')
+    parser.add_argument('--output', help='Write the baseline JSON here.')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Diff two baseline files.')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    missing = uncovered_routes()
+    if missing:
+        print(f"Not benchmarked: {', '.join(missing)}", file=sys.stderr)
+
+    baseline = run(args.preset, args.seed, args.repeat, args.cold)
+    show(baseline)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(baseline, output, indent=2, sort_keys=True)
+        print(f'Wrote {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
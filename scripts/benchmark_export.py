@@ -0,0 +1,67 @@
+"""
+Time to first byte, throughput and peak memory of the streaming exports.
+
+    python scripts/benchmark_export.py [rows]
+
+Peak memory (tracemalloc) should stay at roughly one EXPORT_CHUNK_SIZE
+chunk whatever the row count, and the first rows should arrive after a
+single chunk has been fetched.
+"""
+from benchmark_utils import benchmark_database, print_table
+from benchmark_pagination import populate
+
+import sys
+import time
+import tracemalloc
+
+from rest_framework.test import APIClient
+
+SIZES = [20000, 100000]
+
+
+def export(client, url):
+    start = time.perf_counter()
+    response = client.get(url)
+    assert response.status_code == 200, response.content[:300]
+    chunks = iter(response.streaming_content)
+    size = len(next(chunks))  # header row (CSV) or first chunk (NDJSON)
+    size += len(next(chunks, b''))
+    first = time.perf_counter() - start
+    for chunk in chunks:
+        size += len(chunk)
+    total = time.perf_counter() - start
+    response.close()
+    return first, total, size
+
+
+def peak_memory(client, url):
+    # Traced separately: tracemalloc slows the export several times over
+    tracemalloc.start()
+    response = client.get(url)
+    for _ in response.streaming_content:
+        pass
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run(sizes):
+    rows = []
+    for size in sizes:
+        with benchmark_database():
+            client = APIClient()
+            client.force_authenticate(populate(size))
+            for output in ('csv', 'ndjson'):
+                url = f'/api/v1/export/attendance/?format={output}'
+                first, total, sent = export(client, url)
+                peak = peak_memory(client, url)
+                rows.append([
+                    size, output, f'{first * 1000:.1f}', f'{total:.2f}',
+                    f'{size / total:,.0f}', f'{sent / 2 ** 20:.1f}', f'{peak / 2 ** 20:.1f}',
+                ])
+    print_table(['rows', 'format', 'first rows ms', 'total s', 'rows/s', 'MiB sent', 'peak MiB'], rows)
+
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,83 @@
+"""
+Throughput of the roster import against row-by-row creation.
+
+    python scripts/benchmark_import.py [students]
+
+Imports a generated CSV of students through import_student_rows() once
+without passwords (validation + bulk_create only) and once with a
+password per row (PBKDF2 in the process pool), and times the
+objects.create() + make_password() loop used by create_sample_data.py on
+a sample for comparison.
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+
+import io
+import sys
+from datetime import date
+
+from django.contrib.auth.hashers import make_password
+
+from college_portal.hashing import password_workers
+from college_portal.imports import import_student_rows, read_rows
+from college_portal.models import *
+
+STUDENTS = 10000
+HASHED_SAMPLE = 50
+BASELINE_SAMPLE = 50
+HEADER = 'username,first_name,last_name,password,student_id,class_id,roll_number,admission_date,guardian_name,guardian_phone\n'
+
+
+def make_class():
+    department = Department.objects.create(name='Computer Science', code='CS')
+    return Class.objects.create(name='CS-101', section='A', department=department, academic_year='2024-25')
+
+
+def roster(class_id, count, start=0, password=False):
+    lines = [
+        f"user{i},First,Last,{'secret' + str(i) if password else ''},S{i:06d},{class_id},{i},2024-07-01,Guardian,1234567890\n"
+        for i in range(start, start + count)
+    ]
+    return io.BytesIO((HEADER + ''.join(lines)).encode())
+
+
+def row_by_row(class_obj, count):
+    for i in range(count):
+        user = User.objects.create(
+            username=f'slow{i}', first_name='First', last_name='Last', user_type='student',
+            password=make_password(f'secret{i}'),
+        )
+        Student.objects.create(
+            user=user, student_id=f'SLOW{i:06d}', class_enrolled=class_obj, roll_number=f'slow{i}',
+            admission_date=date(2024, 7, 1), guardian_name='Guardian', guardian_phone='1234567890'
+        )
+
+
+def run(students):
+    rows = []
+    with benchmark_database():
+        class_obj = make_class()
+
+        with measure() as timing:
+            report = import_student_rows(read_rows(roster(class_obj.id, students), 'roster.csv'))
+        assert report['saved'] == students, report['errors'][:5]
+        rows.append(['import, no passwords', students, f"{timing['seconds']:.2f}",
+                     f"{students / timing['seconds']:,.0f}", timing['queries']])
+
+        with measure() as timing:
+            report = import_student_rows(read_rows(
+                roster(class_obj.id, HASHED_SAMPLE, start=students, password=True), 'roster.csv'
+            ))
+        assert report['saved'] == HASHED_SAMPLE, report['errors'][:5]
+        rows.append([f'import, passwords ({password_workers()} workers)', HASHED_SAMPLE, f"{timing['seconds']:.2f}",
+                     f"{HASHED_SAMPLE / timing['seconds']:,.0f}", timing['queries']])
+
+        with measure() as timing:
+            row_by_row(class_obj, BASELINE_SAMPLE)
+        rows.append(['objects.create + make_password', BASELINE_SAMPLE, f"{timing['seconds']:.2f}",
+                     f"{BASELINE_SAMPLE / timing['seconds']:,.0f}", timing['queries']])
+
+    print_table(['path', 'students', 'seconds', 'rows/s', 'queries'], rows)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else STUDENTS)
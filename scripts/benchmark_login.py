@@ -0,0 +1,104 @@
+"""
+Login throughput per CPU core, and what a login storm does to other requests.
+
+    python scripts/benchmark_login.py [--logins 64] [--threads 16]
+        [--iterations 1000000,600000,100000]
+
+For each PBKDF2 iteration count, --logins users with that password hash
+log in from --threads client threads at once while another thread keeps
+requesting the home page. Reports logins per second and per core, login
+latency, logins shed with 429 (raise --threads above HASH_WORKERS +
+MAX_QUEUE to see shedding), the home page latency meanwhile, and the
+time of a wrong password, first and retried (answered from the
+failed-attempt cache without hashing).
+"""
+from benchmark_utils import benchmark_database, print_table
+
+import argparse
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import Client, override_settings
+
+from college_portal.login import hash_pool
+from college_portal.models import User
+
+
+def login(username, password):
+    start = time.perf_counter()
+    response = Client().post('/api/v1/auth/login/', {'username': username, 'password': password},
+                             content_type='application/json')
+    return time.perf_counter() - start, response.status_code
+
+
+def storm(usernames, threads):
+    probes = []
+    done = threading.Event()
+
+    def probe():
+        client = Client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/')
+            probes.append(time.perf_counter() - start)
+            time.sleep(0.02)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda username: login(username, 'password'), usernames))
+    wall = time.perf_counter() - start
+    done.set()
+    prober.join()
+    return wall, results, probes
+
+
+def ms(seconds):
+    return f'{seconds * 1000:.0f}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--iterations', default='1000000,600000,100000')
+    args = parser.parse_args()
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+
+    rows = []
+    with benchmark_database():
+        for iterations in [int(value) for value in args.iterations.split(',')]:
+            with override_settings(PASSWORD_ITERATIONS=iterations):
+                cache.clear()
+                encoded = make_password('password')
+                usernames = [f'login{iterations}_{index}' for index in range(args.logins)]
+                User.objects.bulk_create(
+                    User(username=username, user_type='student', password=encoded) for username in usernames
+                )
+                wall, results, probes = storm(usernames, args.threads)
+                wrong, _ = login(usernames[0], 'wrong')
+                retry, _ = login(usernames[0], 'wrong')
+            latencies = sorted(latency for latency, status in results if status == 200)
+            ok = len(latencies)
+            rows.append([
+                f'{iterations:,}', f'{ok / wall:.1f}', f'{ok / wall / cores:.1f}',
+                ms(statistics.median(latencies)) if latencies else '-',
+                sum(status == 429 for _, status in results),
+                ms(statistics.median(probes)) if probes else '-',
+                ms(max(probes)) if probes else '-',
+                ms(wrong), f'{retry * 1000:.1f}',
+            ])
+
+    print(f'{args.logins} logins from {args.threads} threads, {hash_pool().workers} hashing threads, {cores} cores')
+    print_table(['iterations', 'logins/s', 'per core', 'p50 ms', '429s', 'home p50 ms', 'home max ms',
+                 'wrong pw ms', 'retried ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
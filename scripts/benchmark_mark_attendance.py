@@ -0,0 +1,72 @@
+"""
+Queries and latency of POST attendance/mark/ as the roster grows.
+
+    python scripts/benchmark_mark_attendance.py
+
+The query count per roster should stay flat whatever the class size; on
+SQLite the insert is only split once it exceeds the backend's bound
+parameter limit (999 per statement).
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+
+from datetime import date
+
+from rest_framework.test import APIClient
+
+from college_portal.models import *
+
+ROSTER_SIZES = [30, 60, 120, 240, 480]
+
+
+def create_fixtures(size):
+    department = Department.objects.create(name='Computer Science', code='CS')
+    class_obj = Class.objects.create(name='CS-101', section='A', department=department, academic_year='2024-25')
+    subject = Subject.objects.create(name='Python Programming', code='CS101', credits=4, department=department, semester=1)
+    teacher_user = User.objects.create(username='teacher', user_type='teacher')
+    teacher = Teacher.objects.create(
+        user=teacher_user, employee_id='T001', department=department,
+        qualification='M.Tech', joining_date=date(2020, 1, 15)
+    )
+    users = User.objects.bulk_create([
+        User(username=f'student{i}', user_type='student') for i in range(size)
+    ])
+    students = Student.objects.bulk_create([
+        Student(
+            user=user, student_id=f'S{i:05d}', class_enrolled=class_obj, roll_number=str(i),
+            admission_date=date(2024, 7, 1), guardian_name='Guardian', guardian_phone='1234567890'
+        )
+        for i, user in enumerate(users)
+    ])
+    return teacher_user, subject, students
+
+
+def run():
+    rows = []
+    for size in ROSTER_SIZES:
+        with benchmark_database():
+            teacher_user, subject, students = create_fixtures(size)
+            client = APIClient()
+            client.force_authenticate(teacher_user)
+            payload = {'attendance': [
+                {'student_id': student.id, 'subject_id': subject.id, 'is_present': i % 4 != 0, 'date': '2024-09-02'}
+                for i, student in enumerate(students)
+            ]}
+
+            with measure() as first:
+                response = client.post('/api/v1/attendance/mark/', payload, format='json')
+            assert response.status_code == 200, response.content
+            # Re-marking the same day exercises the update side of the upsert
+            with measure() as again:
+                client.post('/api/v1/attendance/mark/', payload, format='json')
+
+            rows.append([
+                size,
+                first['queries'], f"{first['seconds'] * 1000:.1f}",
+                again['queries'], f"{again['seconds'] * 1000:.1f}",
+            ])
+
+    print_table(['roster', 'queries', 'ms', 'remark queries', 'remark ms'], rows)
+
+
+if __name__ == '__main__':
+    run()
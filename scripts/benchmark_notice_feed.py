@@ -0,0 +1,98 @@
+"""
+Loading a student's notices from the table and from the cached feeds.
+
+    python scripts/benchmark_notice_feed.py [--preset small] [--notices 20000] [--loads 200]
+
+Generates the --preset college, adds --notices notices spread over roles,
+departments and classes, then times a student loading their notices
+--loads times: the notice list, which filters the table, and the feed
+(college_portal/notices.py), cold and warm. Also times posting a notice,
+which rebuilds the feeds it lands in once it commits.
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+
+import argparse
+import random
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from generate_data import PRESETS, generate
+from college_portal.models import Class, Notice, Student, User
+
+
+def populate(count, seed=42):
+    rng = random.Random(seed)
+    admin = User.objects.filter(user_type='admin').first()
+    classes = list(Class.objects.values_list('id', 'department_id'))
+    now = timezone.now()
+
+    def target():
+        audience, scope = rng.choice(['all', 'student', 'teacher', 'admin']), rng.random()
+        class_id, department_id = rng.choice(classes)
+        if audience == 'admin' or scope < 0.5:
+            return {'target_audience': audience}
+        if scope < 0.75:
+            return {'target_audience': audience, 'target_department_id': department_id}
+        return {'target_audience': audience, 'target_department_id': department_id, 'target_class_id': class_id}
+
+    Notice.objects.bulk_create(
+        (Notice(title=f'Notice {index}', content='Benchmark notice.', created_by=admin,
+                created_at=now - timedelta(minutes=index), updated_at=now - timedelta(minutes=index), **target())
+         for index in range(count)),
+        batch_size=5000,
+    )
+    return admin
+
+
+def load(client, url, loads, cold=False):
+    with measure() as timing:
+        for _ in range(loads):
+            if cold:
+                # Drops the cached profile too, as a restart would
+                cache.clear()
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+    return [f"{timing['seconds'] / loads * 1000:.2f}", f"{timing['queries'] / loads:g}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--notices', type=int, default=20000)
+    parser.add_argument('--loads', type=int, default=200)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        generate(**PRESETS[args.preset])
+        admin = populate(args.notices)
+        student = Student.objects.select_related('user').first().user
+        client = APIClient()
+        client.force_authenticate(student)
+
+        rows = [
+            ['notice list', *load(client, '/api/v1/notices/', args.loads)],
+            ['feed, cold cache', *load(client, '/api/v1/notices/feed/', max(1, args.loads // 10), cold=True)],
+            ['feed, cached', *load(client, '/api/v1/notices/feed/', args.loads)],
+        ]
+
+        admin_client = APIClient()
+        admin_client.force_authenticate(admin)
+        posts = max(1, args.loads // 10)
+        with measure() as timing:
+            for index in range(posts):
+                admin_client.post('/api/v1/notices/', {
+                    'title': f'Posted {index}', 'content': 'Posted.', 'target_audience': 'student',
+                    'created_by': admin.id,
+                }, format='json')
+        rows.append(['post a notice', f"{timing['seconds'] / posts * 1000:.2f}", f"{timing['queries'] / posts:g}"])
+        unread = client.get('/api/v1/notices/feed/').json()['unread']
+
+    print(f'{args.notices:,} notices, preset {args.preset}; the student has {unread} unread')
+    print_table(['operation', 'ms', 'queries'], rows)
+
+
+if __name__ == '__main__':
+    main()
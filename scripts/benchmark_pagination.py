@@ -0,0 +1,89 @@
+"""
+Deep-page latency of page-number vs keyset pagination on attendance/.
+
+    python scripts/benchmark_pagination.py [rows]
+
+Page-number pagination pays an OFFSET scan plus COUNT(*) that grow with
+the page; a ``?cursor=`` request seeks on the (date, id) index and should
+cost the same on every page.
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+
+import sys
+from datetime import date, timedelta
+
+from django.conf import settings
+from rest_framework.test import APIClient
+
+from college_portal.models import *
+from college_portal.pagination import make_cursor
+
+ROWS = 100000
+REPEAT = 5
+
+
+def populate(rows):
+    department = Department.objects.create(name='Computer Science', code='CS')
+    class_obj = Class.objects.create(name='CS-101', section='A', department=department, academic_year='2024-25')
+    subject = Subject.objects.create(name='Python Programming', code='CS101', credits=4, department=department, semester=1)
+    admin = User.objects.create(username='admin', user_type='admin', is_staff=True)
+    teacher = Teacher.objects.create(
+        user=User.objects.create(username='teacher', user_type='teacher'), employee_id='T001',
+        department=department, qualification='M.Tech', joining_date=date(2020, 1, 15)
+    )
+    users = User.objects.bulk_create([User(username=f'student{i}', user_type='student') for i in range(100)])
+    students = Student.objects.bulk_create([
+        Student(
+            user=user, student_id=f'S{i:05d}', class_enrolled=class_obj, roll_number=str(i),
+            admission_date=date(2024, 7, 1), guardian_name='Guardian', guardian_phone='1234567890'
+        )
+        for i, user in enumerate(users)
+    ])
+    start = date(2000, 1, 1)
+    Attendance.objects.bulk_create(
+        (
+            Attendance(student=students[i % 100], subject=subject, teacher=teacher,
+                       date=start + timedelta(days=i // 100), is_present=i % 4 != 0)
+            for i in range(rows)
+        ),
+        batch_size=2000,
+    )
+    return admin
+
+
+def timed_get(client, url):
+    best = None
+    for _ in range(REPEAT):
+        with measure() as timing:
+            response = client.get(url)
+        assert response.status_code == 200, response.content[:300]
+        best = timing if best is None or timing['seconds'] < best['seconds'] else best
+    return best
+
+
+def run(rows):
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    ordered = Attendance.objects.order_by('-date', '-id').values_list('date', 'id')
+    table = []
+    with benchmark_database():
+        client = APIClient()
+        client.force_authenticate(populate(rows))
+        last_page = rows // page_size
+        for page in sorted({1, 10, last_page // 10, last_page // 2, last_page}):
+            by_number = timed_get(client, f'/api/v1/attendance/?page={page}')
+            if page == 1:
+                cursor_url = '/api/v1/attendance/?cursor='
+            else:
+                position = ordered[(page - 1) * page_size - 1]
+                cursor_url = f'/api/v1/attendance/?cursor={make_cursor(position)}'
+            by_cursor = timed_get(client, cursor_url)
+            table.append([
+                page,
+                f"{by_number['seconds'] * 1000:.1f}", by_number['queries'],
+                f"{by_cursor['seconds'] * 1000:.1f}", by_cursor['queries'],
+            ])
+    print_table(['page', 'page ms', 'queries', 'cursor ms', 'queries'], table)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
@@ -0,0 +1,91 @@
+"""
+Cost of polling against server push for open browser tabs.
+
+    python scripts/benchmark_realtime.py [--preset small] [--clients 1000] [--poll-seconds 30]
+        [--idle-seconds 2]
+
+1. Polling: queries and time of one student's notice list and dashboard
+   request, scaled to --clients tabs polling every --poll-seconds.
+2. Push: --clients subscriptions to the in-process broker, the queries
+   they make while idle, the memory they hold, and the time from saving a
+   notice to every subscriber having it.
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+from generate_data import PRESETS, generate
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from rest_framework.test import APIClient
+
+from college_portal.models import Notice, Student, User
+from college_portal.realtime import broker, channels_for
+
+POLLED = ['/api/v1/notices/', '/api/v1/dashboard/']
+
+
+def polling(student_user, clients, poll_seconds):
+    client = APIClient()
+    client.force_authenticate(student_user)
+    rows = []
+    for url in POLLED:
+        client.get(url)
+        with measure() as timing:
+            client.get(url)
+        per_minute = clients * 60 / poll_seconds
+        rows.append([f'poll {url}', f"{timing['seconds'] * 1000:.1f}", timing['queries'],
+                     f'{per_minute:,.0f}', f"{per_minute * timing['queries']:,.0f}"])
+    return rows
+
+
+async def push(channels, admin, clients, idle_seconds):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    subscriptions = [broker.subscribe(channels) for _ in range(clients)]
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    await asyncio.sleep(idle_seconds)
+    start = time.perf_counter()
+    # Saved from a worker thread, as a request would be; published on commit
+    await sync_to_async(Notice.objects.create, thread_sensitive=False)(
+        title='Exam timetable', content='Posted', target_audience='student', created_by=admin,
+    )
+    await asyncio.gather(*(subscription.get(10) for subscription in subscriptions))
+    fan_out = time.perf_counter() - start
+    for subscription in subscriptions:
+        broker.unsubscribe(subscription)
+    return fan_out, memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--poll-seconds', type=float, default=30)
+    parser.add_argument('--idle-seconds', type=float, default=2)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        generate(verbosity=0, **PRESETS[args.preset])
+        student_user = Student.objects.select_related('user').order_by('id').first().user
+        admin = User.objects.get(username='admin')
+        rows = polling(student_user, args.clients, args.poll_seconds)
+        channels = channels_for(student_user)
+        # Counts the event loop thread's queries; the notice is saved on another
+        with measure() as idle:
+            fan_out, memory = asyncio.run(push(channels, admin, args.clients, args.idle_seconds))
+        rows += [
+            [f'{args.clients} subscribers idle {args.idle_seconds:.0f}s', '-', idle['queries'], 0, idle['queries']],
+            ['save notice -> every subscriber', f'{fan_out * 1000:.1f}', '-', '-', '-'],
+        ]
+    print(f'{args.clients} open tabs, polling every {args.poll_seconds:.0f}s')
+    print_table(['operation', 'ms', 'queries', 'requests/min', 'queries/min'], rows)
+    print(f'\nBroker memory: {memory / args.clients:,.0f} bytes per subscriber')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Timetable index lookups and the sweep-line conflict check.
+
+    python scripts/benchmark_timetable.py [--preset small] [--entries 20000]
+
+Compares a class's schedule served from the in-memory index with the
+database filter it replaced, times "now/next" lookups, and checks a
+synthetic semester timetable of --entries rows for double-booking.
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+from generate_data import PRESETS, generate
+
+import argparse
+import random
+import time
+import timeit
+from datetime import datetime
+
+from college_portal.models import Class, Schedule
+from college_portal.query_planning import optimize_queryset
+from college_portal.serializers import ScheduleSerializer
+from college_portal.timetable import Slot, find_conflicts, timetable_index
+
+
+def per_call(function, number=500):
+    return timeit.timeit(function, number=number) / number * 1e6
+
+
+def synthetic_timetable(entries, seed=7, clashes=0.01):
+    """
+    A conflict-free semester of ``entries`` hour-long slots (40 per class
+    over 6 days x 8 periods, teachers and rooms rotating so none is ever
+    double-booked), then ``clashes`` of them copied to a random period.
+    """
+    rng = random.Random(seed)
+    classes = max(1, entries // 40)
+    slots = []
+    for ref in range(entries):
+        class_id, period = ref % classes, ref // classes
+        start = (period // 8) * 1440 + (9 + period % 8) * 60
+        slots.append(Slot(start, start + 60, ref, class_id, (class_id + period) % classes,
+                          str((class_id + 2 * period) % classes)))
+    for ref in range(entries, entries + int(entries * clashes)):
+        slot = rng.choice(slots)
+        start = rng.randrange(6) * 1440 + (9 + rng.randrange(8)) * 60
+        slots.append(slot._replace(start=start, end=start + 60, ref=ref))
+    return slots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--entries', type=int, default=20000)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        generate(verbosity=0, **PRESETS[args.preset])
+        class_id = Class.objects.order_by('id').values_list('id', flat=True).first()
+        with measure() as build:
+            index = timetable_index()
+
+        def from_database():
+            schedules = optimize_queryset(Schedule.objects.all(), ScheduleSerializer).filter(class_assigned_id=class_id)
+            return ScheduleSerializer(schedules.order_by('start_time'), many=True).data
+
+        moment = datetime(2024, 1, 3, 10, 30)
+        rows = [
+            ['build index', f"{build['seconds'] * 1e6:.0f}", build['queries']],
+            ['class schedule from the database', f'{per_call(from_database):.1f}', '1+'],
+            ['class schedule from the index', f"{per_call(lambda: index.timetable('class', class_id)):.1f}", 0],
+            ['one weekday from the index',
+             f"{per_call(lambda: index.timetable('class', class_id, 'wednesday')):.1f}", 0],
+            ['now/next from the index', f"{per_call(lambda: index.now_and_next('class', class_id, moment)):.1f}", 0],
+        ]
+        schedules = Schedule.objects.count()
+    print(f'{args.preset} preset: {schedules} schedules')
+    print_table(['operation', 'us', 'queries'], rows)
+
+    slots = synthetic_timetable(args.entries)
+    start = time.perf_counter()
+    conflicts = find_conflicts(slots)
+    seconds = time.perf_counter() - start
+    print(f'\nConflict check of {args.entries} entries: {seconds * 1000:.1f} ms, {len(conflicts)} conflicting pairs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Timetable generator on synthetic instances of increasing size.
+
+    python scripts/benchmark_timetable_generator.py [--sizes 10,50,200,400] [--time-budget 10]
+        [--restarts 1] [--workers N] [--database]
+
+Each department has 10 classes taking the same 6 subjects of 3 to 5
+weekly hours (about 24 lessons a class in a 5 x 7 week), each subject a
+pool of teachers just large enough to cover its lessons with 20% slack,
+and there are rooms for 80% of the classes. The table shows the time to
+the first conflict-free timetable and the final scores. --database also
+times build_problem() and save_timetable() on the small preset.
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+from generate_data import PRESETS, generate
+
+import argparse
+import math
+import random
+
+from college_portal.models import Class, Schedule
+from college_portal.timetable_generator import (
+    DEFAULT_DAYS, DEFAULT_PERIODS, Group, Problem, WEIGHTS, build_problem, save_timetable, solve,
+)
+
+CLASSES_PER_DEPARTMENT = 10
+SUBJECTS_PER_DEPARTMENT = 6
+
+
+def synthetic_problem(classes, seed=3):
+    rng = random.Random(seed)
+    days, periods = len(DEFAULT_DAYS), len(DEFAULT_PERIODS)
+    groups, next_teacher = [], 0
+    for department in range(math.ceil(classes / CLASSES_PER_DEPARTMENT)):
+        class_ids = range(department * CLASSES_PER_DEPARTMENT,
+                          min(classes, (department + 1) * CLASSES_PER_DEPARTMENT))
+        for subject in range(SUBJECTS_PER_DEPARTMENT):
+            subject_id = department * SUBJECTS_PER_DEPARTMENT + subject
+            hours = rng.randint(3, 5)
+            pool = math.ceil(len(class_ids) * hours * 1.2 / (days * periods))
+            teachers = tuple(range(next_teacher, next_teacher + pool))
+            next_teacher += pool
+            groups.extend(Group(class_id, subject_id, hours, teachers) for class_id in class_ids)
+    rooms = [f'R{number}' for number in range(math.ceil(classes * 0.8))]
+    return Problem(groups, days, periods, rooms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10,50,200,400', help='Comma-separated class counts.')
+    parser.add_argument('--time-budget', type=float, default=10)
+    parser.add_argument('--restarts', type=int, default=1)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--database', action='store_true')
+    args = parser.parse_args()
+
+    rows = []
+    for classes in [int(size) for size in args.sizes.split(',')]:
+        problem = synthetic_problem(classes)
+        solution = solve(problem, args.time_budget, restarts=args.restarts, workers=args.workers)
+        scores = solution.scores
+        rows.append([
+            classes, len(problem.lessons), len(problem.teacher_index), len(problem.rooms),
+            '-' if solution.feasible_after is None else f'{solution.feasible_after:.2f}',
+            f'{solution.seconds:.2f}', f'{solution.iterations:,}', scores['hard'],
+            scores['same_day'], scores['gaps'], scores['cost'],
+        ])
+    print(f'Budget {args.time_budget}s x {args.restarts} restart(s); weights {WEIGHTS}')
+    print_table(['classes', 'lessons', 'teachers', 'rooms', 'feasible s', 'seconds', 'moves', 'hard',
+                 'same day', 'gaps', 'cost'], rows)
+
+    if not args.database:
+        return
+    with benchmark_database():
+        generate(verbosity=0, **PRESETS['small'])
+        rooms = [str(number) for number in range(100, 120)]
+        with measure() as build:
+            problem, unstaffed = build_problem(Class.objects.all(), 1, rooms=rooms)
+        solution = solve(problem, args.time_budget)
+        with measure() as save:
+            if solution.scores['hard'] == 0:
+                save_timetable(problem, solution)
+        print(f'\nsmall preset, semester 1: {len(problem.lessons)} lessons, {len(unstaffed)} unstaffed groups, '
+              f'{Schedule.objects.count()} schedules after saving')
+        print_table(['step', 'ms', 'queries'], [
+            ['build_problem', f"{build['seconds'] * 1000:.1f}", build['queries']],
+            ['save_timetable', f"{save['seconds'] * 1000:.1f}", save['queries']],
+        ])
+
+
+if __name__ == '__main__':
+    main()
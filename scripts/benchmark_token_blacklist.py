@@ -0,0 +1,114 @@
+"""
+Token refresh latency with millions of historic tokens in the blacklist tables.
+
+    python scripts/benchmark_token_blacklist.py [--tokens 1000000] [--blacklisted 0.9]
+        [--expired 0.95] [--refreshes 200]
+
+Fills OutstandingToken with --tokens rows (--blacklisted of them
+blacklisted, as rotation leaves them; --expired of them past their expiry),
+then times --refreshes token refreshes through simplejwt's own
+serializer, which checks the table, and through the refresh endpoint's
+serializer, which checks the Bloom filter (college_portal/blacklist.py).
+Also reports the blacklist check alone, loading the filter, and pruning
+the expired rows.
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+
+import argparse
+import time
+import uuid
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from college_portal.authentication import ClaimsRefreshToken, ClaimsTokenRefreshSerializer
+from college_portal.blacklist import prune_expired_tokens, revoked_tokens
+from college_portal.models import User
+
+BATCH = 20000
+
+
+def populate(user, tokens, blacklisted, expired):
+    now = timezone.now()
+    expired_rows = int(tokens * expired)
+    for start in range(0, tokens, BATCH):
+        rows = OutstandingToken.objects.bulk_create(
+            OutstandingToken(
+                user=user, jti=uuid.uuid4().hex, token='', created_at=now,
+                expires_at=now + (timedelta(days=-1) if index < expired_rows else timedelta(days=7)),
+            )
+            for index in range(start, min(tokens, start + BATCH))
+        )
+        # Rotation blacklists all but the latest token of each chain
+        BlacklistedToken.objects.bulk_create(
+            BlacklistedToken(token=row) for index, row in enumerate(rows) if (start + index) % 100 < blacklisted * 100
+        )
+
+
+def refresh_chain(serializer_class, refresh, count):
+    """Refresh ``count`` times, each with the refresh token the last one returned."""
+    with measure() as timing:
+        for _ in range(count):
+            serializer = serializer_class(data={'refresh': refresh})
+            serializer.is_valid(raise_exception=True)
+            refresh = serializer.validated_data['refresh']
+    return timing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=1_000_000)
+    parser.add_argument('--blacklisted', type=float, default=0.9)
+    parser.add_argument('--expired', type=float, default=0.95)
+    parser.add_argument('--refreshes', type=int, default=200)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        user = User.objects.create(username='refresher', user_type='admin')
+        start = time.perf_counter()
+        populate(user, args.tokens, args.blacklisted, args.expired)
+        print(f'{args.tokens:,} tokens written in {time.perf_counter() - start:.1f}s')
+
+        start = time.perf_counter()
+        revoked_tokens.reload()
+        load = time.perf_counter() - start
+        stats = revoked_tokens.stats()
+
+        rows = []
+        for name, serializer_class, token_class in [
+            ('simplejwt: table check', TokenRefreshSerializer, RefreshToken),
+            ('Bloom filter', ClaimsTokenRefreshSerializer, ClaimsRefreshToken),
+        ]:
+            timing = refresh_chain(serializer_class, str(token_class.for_user(user)), args.refreshes)
+            rows.append([f'refresh, {name}', f"{timing['seconds'] / args.refreshes * 1000:.2f}",
+                         f"{timing['queries'] / args.refreshes:g}"])
+
+        jti = OutstandingToken.objects.order_by('-id').values_list('jti', flat=True).first()
+        with measure() as timing:
+            for _ in range(args.refreshes):
+                BlacklistedToken.objects.filter(token__jti=jti).exists()
+        rows.append(['blacklist check, table', f"{timing['seconds'] / args.refreshes * 1000:.3f}",
+                     f"{timing['queries'] / args.refreshes:g}"])
+        with measure() as timing:
+            for _ in range(args.refreshes):
+                revoked_tokens.is_blacklisted(jti)
+        rows.append(['blacklist check, filter', f"{timing['seconds'] / args.refreshes * 1000:.3f}",
+                     f"{timing['queries'] / args.refreshes:g}"])
+
+        start = time.perf_counter()
+        outstanding, blacklisted = prune_expired_tokens()
+        prune = time.perf_counter() - start
+        left = OutstandingToken.objects.count()
+
+    print_table(['operation', 'ms', 'queries'], rows)
+    print(f"\nFilter: {stats['entries']:,} unexpired blacklisted tokens, {stats['bytes'] / 2 ** 20:.1f} MiB, "
+          f'loaded in {load:.2f}s')
+    print(f'Prune: {outstanding:,} outstanding and {blacklisted:,} blacklisted rows deleted in {prune:.1f}s, '
+          f'{left:,} outstanding left')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Cost of the performance trend feature: worker imports, one fit, one class.
+
+    python scripts/benchmark_trends.py [--preset small]
+
+1. Import time and peak RSS of a fresh interpreter that sets Django up and
+   loads the URLconf, with and without the pandas / scikit-learn / NumPy
+   imports backend/views.py used to make at module level (skipped when
+   those packages are not installed).
+2. One student's trend: college_portal.trends against numpy.polyfit and
+   LinearRegression, when available.
+3. Trends for every student of a class: class_trends() in one query
+   against one query and fit per student.
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+from generate_data import PRESETS, generate
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import timeit
+
+from college_portal.models import Class, Result, Student
+from college_portal.trends import class_trends, linear_trend, result_percentages
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SETUP = (
+    "import os, django; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_college_backend.settings'); "
+    "django.setup(); import college_portal.urls"
+)
+PROBE = (
+    "import resource, sys, time; start = time.perf_counter(); {code}; "
+    "print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+)
+IMPORTS = [
+    ('college_portal (trends.py)', SETUP),
+    ('+ numpy', SETUP + '; import numpy'),
+    ('+ pandas, sklearn, numpy (old backend/views.py)',
+     SETUP + '; import pandas, numpy; from sklearn.linear_model import LinearRegression'),
+]
+
+
+def import_cost(code, runs=3):
+    """Median seconds and peak RSS (MiB) of ``code`` in a fresh interpreter."""
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', PROBE.format(code=code)], cwd=ROOT,
+                                capture_output=True, text=True)
+        if result.returncode:
+            return None
+        seconds, rss_kib = result.stdout.split()
+        samples.append((float(seconds), int(rss_kib) / 1024))
+    return statistics.median(s for s, _ in samples), max(r for _, r in samples)
+
+
+def single_fit(values, number=2000):
+    timings = {'trends.linear_trend': lambda: linear_trend(values)}
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy is not None:
+        x = numpy.arange(len(values))
+        timings['numpy.polyfit'] = lambda: numpy.polyfit(x, values, 1)
+    try:
+        import pandas
+        from sklearn.linear_model import LinearRegression
+    except ImportError:
+        pass
+    else:
+        def sklearn_fit():
+            frame = pandas.DataFrame({'exam_number': range(len(values)), 'percentage': values})
+            return LinearRegression().fit(frame[['exam_number']], frame['percentage'])
+        timings['pandas + LinearRegression'] = sklearn_fit
+    return {name: timeit.timeit(fit, number=number) / number for name, fit in timings.items()}
+
+
+def per_student(class_id):
+    trends = {}
+    for student_id in Student.objects.filter(class_enrolled_id=class_id).values_list('id', flat=True):
+        trend = linear_trend(p for _, p in result_percentages(Result.objects.filter(student_id=student_id)))
+        if trend:
+            trends[student_id] = trend
+    return trends
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    args = parser.parse_args()
+
+    rows = []
+    for name, code in IMPORTS:
+        cost = import_cost(code)
+        rows.append([name, 'not installed', '-'] if cost is None else [name, f'{cost[0]:.2f}', f'{cost[1]:.0f}'])
+    print('Worker import')
+    print_table(['imports', 'seconds', 'peak RSS MiB'], rows)
+
+    print('\nOne student, 8 exams')
+    values = [62.0, 58.5, 71.0, 66.0, 74.5, 70.0, 79.0, 81.5]
+    print_table(['fit', 'us per fit'], [[name, f'{seconds * 1e6:.1f}'] for name, seconds in single_fit(values).items()])
+
+    with benchmark_database():
+        generate(verbosity=0, **PRESETS[args.preset])
+        class_id = Class.objects.order_by('id').values_list('id', flat=True).first()
+        rows = []
+        for name, build in (('class_trends (one pass)', class_trends), ('query + fit per student', per_student)):
+            with measure() as timing:
+                trends = build(class_id)
+            rows.append([name, len(trends), f"{timing['seconds'] * 1000:.1f}", timing['queries']])
+        assert class_trends(class_id) == per_student(class_id)
+    print(f'\nEvery student of one class ({args.preset} preset)')
+    print_table(['method', 'students', 'ms', 'queries'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import django
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set up Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_college_backend.settings')
+django.setup()
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from college_portal.reference_cache import reference_cache
+
+
+@contextmanager
+def benchmark_database():
+    """Run the block against a throwaway test database, never db.sqlite3."""
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    cache.clear()
+    reference_cache.clear()
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        cache.clear()
+        reference_cache.clear()
+        teardown_test_environment()
+
+
+@contextmanager
+def measure():
+    """Collect wall time (seconds) and query count for the block."""
+    result = {}
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        yield result
+        result['seconds'] = time.perf_counter() - start
+    result['queries'] = len(queries)
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    for row in [headers] + rows:
+        print('  '.join(str(value).rjust(width) for value, width in zip(row, widths)))
@@ -0,0 +1,165 @@
+"""
+Check that list endpoints run a constant number of queries as rows grow.
+
+    python scripts/check_query_counts.py
+
+Every GET list endpoint is requested against a small and a larger data set
+(both within one page); the script exits non-zero if any query count grows
+with the row count, which is the signature of an N+1.
+"""
+from benchmark_utils import benchmark_database, measure, print_table
+
+import sys
+import warnings
+from datetime import date, time, timedelta
+
+from django.core.paginator import UnorderedObjectListWarning
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from college_portal.models import *
+
+SMALL, LARGE = 3, 15
+
+warnings.filterwarnings('ignore', category=UnorderedObjectListWarning)
+
+ENDPOINTS = [
+    ('admin', '/api/v1/users/'),
+    ('admin', '/api/v1/departments/'),
+    ('admin', '/api/v1/departments/{department}/classes/'),
+    ('admin', '/api/v1/classes/'),
+    ('admin', '/api/v1/classes/{class}/students/'),
+    ('admin', '/api/v1/classes/{class}/schedule/'),
+    ('admin', '/api/v1/subjects/'),
+    ('admin', '/api/v1/subjects/{subject}/teachers/'),
+    ('admin', '/api/v1/teachers/'),
+    ('admin', '/api/v1/teachers/{teacher}/classes/'),
+    ('admin', '/api/v1/teachers/{teacher}/schedule/'),
+    ('admin', '/api/v1/students/'),
+    ('admin', '/api/v1/students/{student}/attendance/'),
+    ('admin', '/api/v1/students/{student}/results/'),
+    ('admin', '/api/v1/schedules/'),
+    ('admin', '/api/v1/attendance/'),
+    ('admin', '/api/v1/examinations/'),
+    ('admin', '/api/v1/examinations/{examination}/results/'),
+    ('admin', '/api/v1/results/'),
+    ('admin', '/api/v1/notices/'),
+    ('admin', '/api/v1/assignments/'),
+    ('admin', '/api/v1/assignments/{assignment}/submissions/'),
+    ('admin', '/api/v1/submissions/'),
+    ('admin', '/api/v1/dashboard/'),
+    ('teacher', '/api/v1/dashboard/'),
+    ('teacher', '/api/v1/teacher/classes/'),
+    ('student', '/api/v1/dashboard/'),
+    ('student', '/api/v1/student/attendance/'),
+    ('student', '/api/v1/student/results/'),
+]
+
+
+def populate(n):
+    """Create ``n`` rows of every model, all linked to one department/class."""
+    admin = User.objects.create(username='admin', user_type='admin', is_staff=True)
+    department = Department.objects.create(name='Computer Science', code='CS', head_of_department=admin)
+    teachers = []
+    for i in range(n):
+        user = User.objects.create(username=f'teacher{i}', first_name='T', last_name=str(i), user_type='teacher')
+        teachers.append(Teacher.objects.create(
+            user=user, employee_id=f'T{i:03d}', department=department,
+            qualification='M.Tech', joining_date=date(2020, 1, 15)
+        ))
+    teacher_user = teachers[0].user
+    classes = [
+        Class.objects.create(name=f'CS-{i}', section='A', department=department,
+                             class_teacher=teacher_user, academic_year='2024-25')
+        for i in range(n)
+    ]
+    class_obj = classes[0]
+    subjects = [
+        Subject.objects.create(name=f'Subject {i}', code=f'CS{i:03d}', credits=3, department=department, semester=1)
+        for i in range(n)
+    ]
+    for teacher in teachers:
+        teacher.subjects.set(subjects)
+    students = []
+    for i in range(n):
+        user = User.objects.create(username=f'student{i}', first_name='S', last_name=str(i), user_type='student')
+        students.append(Student.objects.create(
+            user=user, student_id=f'S{i:03d}', class_enrolled=class_obj, roll_number=str(i),
+            admission_date=date(2024, 7, 1), guardian_name='Guardian', guardian_phone='1234567890'
+        ))
+    student = students[0]
+    today = timezone.now().date()
+    weekday = today.strftime('%A').lower()
+    for i in range(n):
+        Schedule.objects.create(
+            class_assigned=class_obj, subject=subjects[i], teacher=teachers[0], weekday=weekday,
+            start_time=time(8 + i % 10, (i // 10) * 5), end_time=time(9 + i % 10, (i // 10) * 5), room_number=str(100 + i)
+        )
+    Attendance.objects.bulk_create([
+        Attendance(student=student, subject=subjects[0], teacher=teachers[0],
+                   date=today - timedelta(days=i), is_present=i % 3 != 0)
+        for i in range(n)
+    ])
+    examinations = [
+        Examination.objects.create(
+            name=f'Exam {i}', exam_type='quiz', subject=subjects[i], class_assigned=class_obj,
+            date=today - timedelta(days=i), start_time='10:00', end_time='11:00', total_marks=100, passing_marks=40
+        )
+        for i in range(n)
+    ]
+    for i, examination in enumerate(examinations):
+        Result.objects.create(student=student, examination=examination, marks_obtained=50 + i)
+    for s in students[1:]:
+        Result.objects.create(student=s, examination=examinations[0], marks_obtained=60)
+    for i in range(n):
+        Notice.objects.create(title=f'Notice {i}', content='...', target_audience='student', created_by=admin)
+    assignments = [
+        Assignment.objects.create(
+            title=f'Assignment {i}', description='...', subject=subjects[0], class_assigned=class_obj,
+            teacher=teachers[0], due_date=timezone.now() + timedelta(days=7), total_marks=50
+        )
+        for i in range(n)
+    ]
+    submitted = timezone.now()
+    AssignmentSubmission.objects.bulk_create([
+        AssignmentSubmission(assignment=assignments[0], student=s, submission_file='submissions/a.pdf', submitted_at=submitted)
+        for s in students
+    ])
+    return {
+        'users': {'admin': admin, 'teacher': teacher_user, 'student': student.user},
+        'ids': {
+            'department': department.id, 'class': class_obj.id, 'subject': subjects[0].id,
+            'teacher': teachers[0].id, 'student': student.id, 'examination': examinations[0].id,
+            'assignment': assignments[0].id,
+        },
+    }
+
+
+def count_queries(n):
+    counts = {}
+    with benchmark_database():
+        data = populate(n)
+        for role, url in ENDPOINTS:
+            client = APIClient()
+            client.force_authenticate(data['users'][role])
+            with measure() as timing:
+                response = client.get(url.format(**data['ids']))
+            assert response.status_code == 200, (url, response.status_code, response.content[:300])
+            counts[(role, url)] = timing['queries']
+    return counts
+
+
+def run():
+    small, large = count_queries(SMALL), count_queries(LARGE)
+    rows = []
+    failures = 0
+    for key in small:
+        ok = large[key] <= small[key]
+        failures += not ok
+        rows.append([key[0], key[1], small[key], large[key], 'ok' if ok else 'GROWS'])
+    print_table(['as', 'endpoint', f'{SMALL} rows', f'{LARGE} rows', ''], rows)
+    return failures
+
+
+if __name__ == '__main__':
+    sys.exit(1 if run() else 0)
@@ -0,0 +1,356 @@
+"""
+Seeded synthetic data for a large institution.
+
+    python scripts/generate_data.py [--preset small] [--seed 42] [--flush]
+
+Builds departments, yearly class cohorts with their students, teachers,
+subjects, weekly schedules and `years` of attendance, exam results and
+assignment submissions, all with bulk_create. The same preset and seed
+always produce the same rows. Every generated user's password is
+"password".
+
+This writes to the configured database (db.sqlite3 by default); the
+benchmark suite calls generate() inside a throwaway test database instead.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_college_backend.settings')
+
+import django
+
+django.setup()
+
+import argparse
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as clock, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from college_portal.attendance import rebuild_attendance_summary
+from college_portal.models import *
+
+PRESETS = {
+    'tiny': dict(departments=1, classes_per_department=2, students_per_class=10, teachers_per_department=3,
+                 subjects_per_class=3, years=1, days_per_year=20),
+    'small': dict(departments=2, classes_per_department=3, students_per_class=30, teachers_per_department=4,
+                  subjects_per_class=4, years=1, days_per_year=60),
+    'medium': dict(departments=5, classes_per_department=4, students_per_class=50, teachers_per_department=6,
+                   subjects_per_class=5, years=2, days_per_year=120),
+    'large': dict(departments=10, classes_per_department=6, students_per_class=60, teachers_per_department=10,
+                  subjects_per_class=6, years=3, days_per_year=180),
+}
+
+BATCH_SIZE = 5000
+FIRST_YEAR = 2022
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
+FIRST_NAMES = ['Aarav', 'Diya', 'Ishaan', 'Ananya', 'Kabir', 'Meera', 'Rohan', 'Saanvi', 'Vivaan', 'Zara',
+               'Arjun', 'Kiara', 'Dev', 'Nisha', 'Aditya', 'Pooja', 'Rahul', 'Sneha', 'Vikram', 'Tara']
+LAST_NAMES = ['Sharma', 'Patel', 'Reddy', 'Iyer', 'Gupta', 'Khan', 'Das', 'Nair', 'Singh', 'Mehta']
+DEPARTMENTS = [('CS', 'Computer Science'), ('EE', 'Electrical Engineering'), ('ME', 'Mechanical Engineering'),
+               ('CE', 'Civil Engineering'), ('MA', 'Mathematics'), ('PH', 'Physics'), ('CH', 'Chemistry'),
+               ('BT', 'Biotechnology'), ('EC', 'Economics'), ('EN', 'English')]
+
+
+def bulk_insert(model, objects, batch_size=BATCH_SIZE):
+    """bulk_create() from an iterable without materialising it; returns the row count."""
+    objects = iter(objects)
+    count = 0
+    while batch := list(islice(objects, batch_size)):
+        model.objects.bulk_create(batch)
+        count += len(batch)
+    return count
+
+
+def bulk_insert_returning(model, objects):
+    """bulk_create() in batches, keeping the created objects (with their ids)."""
+    created = []
+    for start in range(0, len(objects), BATCH_SIZE):
+        created.extend(model.objects.bulk_create(objects[start:start + BATCH_SIZE]))
+    return created
+
+
+@contextmanager
+def historical_timestamps(*fields):
+    """Let bulk_create() keep explicit values in auto_now/auto_now_add fields."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _fields(model, *names):
+    return [model._meta.get_field(name) for name in names]
+
+
+def _aware(day, hour=9):
+    return timezone.make_aware(datetime.combine(day, clock(hour)))
+
+
+def school_days(year, count):
+    """``count`` weekdays (Mon-Sat) from 1 August of ``year``."""
+    days = []
+    day = date(year, 8, 1)
+    while len(days) < count:
+        if day.weekday() < 6:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def generate(seed=42, departments=2, classes_per_department=3, students_per_class=30, teachers_per_department=4,
+             subjects_per_class=4, years=1, days_per_year=60, verbosity=1):
+    rng = random.Random(seed)
+    password = make_password('password')
+
+    def log(message):
+        if verbosity:
+            print(message, flush=True)
+
+    admin = User.objects.create(
+        username='admin', email='admin@college.edu', first_name='Admin', last_name='User',
+        user_type='admin', password=password, is_staff=True, is_superuser=True,
+    )
+
+    # Departments, teachers and subjects
+    if departments <= len(DEPARTMENTS):
+        names = DEPARTMENTS[:departments]
+    else:
+        names = [(f'D{i:03d}', f'Department {i}') for i in range(departments)]
+    department_objs = Department.objects.bulk_create([
+        Department(name=name, code=code, description=f'{name} Department') for code, name in names
+    ])
+    teacher_users = User.objects.bulk_create([
+        User(username=f'teacher_{department.code.lower()}_{i}', email=f'{department.code.lower()}{i}@college.edu',
+             first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+             user_type='teacher', password=password)
+        for department in department_objs for i in range(teachers_per_department)
+    ])
+    teachers = Teacher.objects.bulk_create([
+        Teacher(user=user, employee_id=f'T{index:05d}', department=department_objs[index // teachers_per_department],
+                qualification=rng.choice(['M.Tech', 'M.Sc', 'Ph.D']), experience_years=rng.randint(1, 25),
+                joining_date=date(2010 + rng.randint(0, 12), rng.randint(1, 12), 1))
+        for index, user in enumerate(teacher_users)
+    ])
+    for index, department in enumerate(department_objs):
+        department.head_of_department = teacher_users[index * teachers_per_department]
+    Department.objects.bulk_update(department_objs, ['head_of_department'])
+
+    subjects_by_department = {}
+    subjects = []
+    for department in department_objs:
+        subjects_by_department[department.id] = [
+            Subject(name=f'{department.name} {i + 1:02d}', code=f'{department.code}{100 + i}',
+                    credits=rng.randint(2, 5), department=department, semester=i % 8 + 1)
+            for i in range(subjects_per_class * 2)
+        ]
+        subjects.extend(subjects_by_department[department.id])
+    Subject.objects.bulk_create(subjects)
+
+    teachers_by_department = {}
+    links = []
+    for teacher in teachers:
+        teachers_by_department.setdefault(teacher.department_id, []).append(teacher)
+    for department_id, department_subjects in subjects_by_department.items():
+        for subject in department_subjects:
+            for teacher in rng.sample(teachers_by_department[department_id], min(2, teachers_per_department)):
+                links.append(Teacher.subjects.through(teacher_id=teacher.id, subject_id=subject.id))
+    Teacher.subjects.through.objects.bulk_create(links, ignore_conflicts=True)
+    subject_teachers = {}
+    for link in links:
+        subject_teachers.setdefault(link.subject_id, []).append(link.teacher_id)
+    log(f'{departments} departments, {len(teachers)} teachers, {len(subjects)} subjects')
+
+    # Yearly cohorts: classes, students and what happened to them
+    student_number = 0
+    totals = dict.fromkeys(['classes', 'students', 'schedules', 'attendance', 'results', 'submissions'], 0)
+    for year_index in range(years):
+        year = FIRST_YEAR + year_index
+        academic_year = f'{year}-{(year + 1) % 100:02d}'
+        days = school_days(year, days_per_year)
+
+        classes = Class.objects.bulk_create([
+            Class(name=f'{department.code}-{100 * (year_index + 1) + i + 1}', section='A', department=department,
+                  academic_year=academic_year, total_students=students_per_class,
+                  class_teacher=rng.choice(teachers_by_department[department.id]).user)
+            for department in department_objs for i in range(classes_per_department)
+        ])
+        # Class subjects and who teaches them
+        class_subjects = {
+            class_obj.id: [
+                (subject, rng.choice(subject_teachers[subject.id]))
+                for subject in rng.sample(subjects_by_department[class_obj.department_id], subjects_per_class)
+            ]
+            for class_obj in classes
+        }
+
+        student_users = []
+        for class_obj in classes:
+            for roll in range(students_per_class):
+                student_users.append(User(
+                    username=f'student{student_number + len(student_users):06d}', user_type='student',
+                    first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES), password=password,
+                ))
+        student_users = bulk_insert_returning(User, student_users)
+        students = Student.objects.bulk_create([
+            Student(user=user, student_id=f'S{student_number + index:06d}',
+                    class_enrolled=classes[index // students_per_class], roll_number=str(index % students_per_class + 1),
+                    admission_date=date(year, 7, 15), guardian_name=f'{rng.choice(FIRST_NAMES)} {user.last_name}',
+                    guardian_phone=f'9{rng.randint(100000000, 999999999)}')
+            for index, user in enumerate(student_users)
+        ], batch_size=BATCH_SIZE)
+        student_number += len(students)
+        students_by_class = {}
+        for student in students:
+            students_by_class.setdefault(student.class_enrolled_id, []).append(student)
+        # Each student's attendance habit and exam ability
+        presence = {student.id: rng.uniform(0.6, 0.98) for student in students}
+        ability = {student.id: rng.uniform(0.35, 0.95) for student in students}
+
+        schedules = []
+        for class_obj in classes:
+            slots = [(weekday, hour) for weekday in WEEKDAYS for hour in range(9, 16)]
+            rng.shuffle(slots)
+            for subject, teacher_id in class_subjects[class_obj.id]:
+                for weekday, hour in (slots.pop() for _ in range(3)):
+                    schedules.append(Schedule(
+                        class_assigned=class_obj, subject=subject, teacher_id=teacher_id, weekday=weekday,
+                        start_time=clock(hour), end_time=clock(hour + 1), room_number=str(rng.randint(100, 450)),
+                    ))
+        Schedule.objects.bulk_create(schedules)
+
+        def attendance_rows():
+            for class_obj in classes:
+                for day in days:
+                    stamp = _aware(day, 17)
+                    for subject, teacher_id in class_subjects[class_obj.id]:
+                        for student in students_by_class[class_obj.id]:
+                            yield Attendance(
+                                student_id=student.id, subject_id=subject.id, teacher_id=teacher_id, date=day,
+                                is_present=rng.random() < presence[student.id], created_at=stamp, updated_at=stamp,
+                            )
+
+        with historical_timestamps(*_fields(Attendance, 'created_at', 'updated_at')):
+            attendance_count = bulk_insert(Attendance, attendance_rows())
+
+        exams = []
+        for class_obj in classes:
+            for subject, _ in class_subjects[class_obj.id]:
+                for exam_type, day in (('midterm', days[len(days) // 2]), ('final', days[-1])):
+                    exams.append(Examination(
+                        name=f'{exam_type.title()} {subject.name}', exam_type=exam_type, subject=subject,
+                        class_assigned=class_obj, date=day, start_time=clock(10), end_time=clock(13),
+                        total_marks=100, passing_marks=40,
+                    ))
+        Examination.objects.bulk_create(exams)
+
+        def result_rows():
+            for exam in exams:
+                stamp = _aware(exam.date + timedelta(days=7))
+                for student in students_by_class[exam.class_assigned_id]:
+                    marks = max(0, min(exam.total_marks, round(rng.gauss(ability[student.id] * exam.total_marks, 10))))
+                    yield Result(
+                        student_id=student.id, examination_id=exam.id, marks_obtained=marks,
+                        grade=Result.calculate_grade(marks, exam.total_marks), created_at=stamp, updated_at=stamp,
+                    )
+
+        with historical_timestamps(*_fields(Result, 'created_at', 'updated_at')):
+            result_count = bulk_insert(Result, result_rows())
+
+        assignments = []
+        for class_obj in classes:
+            for subject, teacher_id in class_subjects[class_obj.id]:
+                for number in range(3):
+                    assignments.append(Assignment(
+                        title=f'{subject.name} assignment {number + 1}', description='Generated assignment.',
+                        subject=subject, class_assigned=class_obj, teacher_id=teacher_id,
+                        due_date=_aware(days[(number + 1) * len(days) // 4], 23), total_marks=20,
+                    ))
+        Assignment.objects.bulk_create(assignments)
+
+        def submission_rows():
+            for assignment in assignments:
+                for student in students_by_class[assignment.class_assigned_id]:
+                    if rng.random() > 0.85:
+                        continue
+                    submitted = assignment.due_date + timedelta(hours=rng.randint(-120, 24))
+                    graded = rng.random() < 0.7
+                    yield AssignmentSubmission(
+                        assignment_id=assignment.id, student_id=student.id,
+                        submission_file=f'submissions/{assignment.id}-{student.id}.pdf', submitted_at=submitted,
+                        is_late=submitted > assignment.due_date,
+                        marks_obtained=round(ability[student.id] * assignment.total_marks) if graded else None,
+                    )
+
+        with historical_timestamps(*_fields(AssignmentSubmission, 'submitted_at')):
+            submission_count = bulk_insert(AssignmentSubmission, submission_rows())
+
+        def notice_target():
+            # Mostly the whole college, some for one department or class
+            audience, scope = rng.choice(['all', 'student', 'teacher', 'admin']), rng.random()
+            class_obj = rng.choice(classes)
+            if audience == 'admin' or scope < 0.5:
+                return {'target_audience': audience}
+            if scope < 0.75:
+                return {'target_audience': audience, 'target_department_id': class_obj.department_id}
+            return {'target_audience': audience, 'target_department_id': class_obj.department_id,
+                    'target_class_id': class_obj.id}
+
+        with historical_timestamps(*_fields(Notice, 'created_at', 'updated_at')):
+            Notice.objects.bulk_create([
+                Notice(title=f'{academic_year} notice {i + 1}', content='Generated notice.',
+                       priority=rng.choice(['low', 'medium', 'high', 'urgent']), created_by=admin,
+                       created_at=_aware(days[i * len(days) // 20]), updated_at=_aware(days[i * len(days) // 20]),
+                       **notice_target())
+                for i in range(20)
+            ])
+
+        for key, value in [('classes', len(classes)), ('students', len(students)), ('schedules', len(schedules)),
+                           ('attendance', attendance_count), ('results', result_count),
+                           ('submissions', submission_count)]:
+            totals[key] += value
+        log(f'{academic_year}: {len(classes)} classes, {len(students)} students, {attendance_count} attendance, '
+            f'{result_count} results, {submission_count} submissions')
+
+    rebuild_attendance_summary()
+    return {'departments': departments, 'teachers': len(teachers), 'subjects': len(subjects), **totals}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--flush', action='store_true', help='Delete all existing data first.')
+    for option in PRESETS['small']:
+        parser.add_argument(f"--{option.replace('_', '-')}", type=int, help='Override the preset.')
+    args = parser.parse_args()
+
+    options = dict(PRESETS[args.preset])
+    options.update({key: getattr(args, key) for key in options if getattr(args, key) is not None})
+
+    if args.flush:
+        call_command('flush', interactive=False, verbosity=0)
+    elif User.objects.exists():
+        sys.exit('The database already has data; pass --flush to replace it.')
+
+    start = time.perf_counter()
+    with transaction.atomic():
+        counts = generate(seed=args.seed, **options)
+    print(f"Generated in {time.perf_counter() - start:.1f}s: "
+          + ', '.join(f'{value} {key}' for key, value in counts.items()))
+    print('Log in as admin, teacher_<dept>_<n> or student<nnnnnn> with password "password".')
+
+
+if __name__ == '__main__':
+    main()
@@ -23,17 +23,20 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'college_portal',
 ]
 
 MIDDLEWARE = [
+    'college_portal.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'college_portal.profiles.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -105,7 +108,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'college_portal.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -120,6 +123,7 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'college_portal.authentication.ClaimsTokenRefreshSerializer',
 }
 
 # CORS settings
@@ -132,3 +136,131 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Only for development
+
+# Result grading: (minimum percentage, grade), see college_portal/grading.py
+GRADE_BOUNDARIES = [
+    (90, 'A+'),
+    (80, 'A'),
+    (70, 'B+'),
+    (60, 'B'),
+    (50, 'C'),
+    (0, 'F'),
+]
+
+# Cache: per-process memory by default. Point this at Redis/Memcached when
+# running several workers so cache invalidation is shared between them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'smart-college',
+    }
+}
+
+# Seconds a dashboard stays cached when nothing it shows has changed
+DASHBOARD_CACHE_TTL = 60
+
+# Reference data cache (departments, classes, subjects, teachers, schedules):
+# per-process LRU in front of the default cache, see college_portal/reference_cache.py
+REFERENCE_CACHE = {
+    'MAX_ENTRIES': 2048,
+    'TIMEOUT': 60 * 60,
+    'VERSION_CHECK_INTERVAL': 5,
+}
+
+# Rows fetched and encoded per chunk by the streaming exports
+EXPORT_CHUNK_SIZE = 2000
+
+# Roster/marks imports: rows validated and inserted per chunk, and worker
+# processes used to hash passwords (None = one per CPU)
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_PASSWORD_WORKERS = None
+
+# Class analytics (college_portal/analytics.py): students averaging below
+# AT_RISK_AVERAGE percent or trending below AT_RISK_SLOPE points per exam
+# are flagged at risk. Cached until the class's results change.
+CLASS_ANALYTICS = {
+    'AT_RISK_AVERAGE': 50,
+    'AT_RISK_SLOPE': -5,
+    'CACHE_TTL': 60 * 60 * 24,
+}
+
+# Request profiling, see college_portal/profiling.py: share of requests
+# measured, and seconds between logged summaries of the slowest endpoints
+PROFILING = {
+    'SAMPLE_RATE': 1.0 if DEBUG else 0.01,
+    'REPORT_INTERVAL': 300,
+    'REPORT_TOP': 10,
+}
+
+# Server push (college_portal/realtime.py): seconds between keep-alives on
+# idle SSE streams, events a slow client may fall behind before it is
+# dropped, and recent events replayed to reconnecting clients
+REALTIME = {
+    'HEARTBEAT': 15,
+    'QUEUE_SIZE': 100,
+    'REPLAY': 256,
+}
+
+# Threads (each with its own database connection) running the independent
+# queries of the async views in college_portal/async_views.py
+ASYNC_QUERY_WORKERS = 8
+
+# Password hashing: PBKDF2 iterations for new and rehashed passwords
+# (None = Django's default). Lower counts make logins cheaper and weaker;
+# stored hashes move to the configured count as users log in.
+PASSWORD_HASHERS = [
+    'college_portal.hashing.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_ITERATIONS = None
+
+# Login (college_portal/login.py): threads verifying passwords (None = half
+# the CPUs), logins waiting for one before 429s, Retry-After of a shed
+# login, and how long and how many failed attempts are remembered
+LOGIN = {
+    'HASH_WORKERS': None,
+    'MAX_QUEUE': 64,
+    'RETRY_AFTER': 2,
+    'FAILURE_TTL': 15 * 60,
+    'MAX_FAILURES': 10,
+}
+
+# Refresh token blacklist (college_portal/blacklist.py): Bloom filter size
+# and false positive rate, seconds between picking up tokens blacklisted by
+# other processes, and seconds between deletions of expired tokens
+TOKEN_BLACKLIST = {
+    'CAPACITY': 1_000_000,
+    'ERROR_RATE': 0.01,
+    'SYNC_INTERVAL': 5,
+    'PRUNE_INTERVAL': 60 * 60,
+    'PRUNE_BATCH': 5000,
+}
+
+# Access token revocation (college_portal/authentication.py): seconds a
+# process trusts a user's cached active flag and token revision
+TOKEN_REVOCATION = {
+    'CHECK_INTERVAL': 60,
+}
+
+# Cached notice feeds (college_portal/notices.py): notices kept per audience
+# feed and returned per user, and seconds a feed stays cached (with a
+# per-process cache, how long other workers may serve a stale feed)
+NOTICE_FEEDS = {
+    'SIZE': 50,
+    'TIMEOUT': DASHBOARD_CACHE_TTL,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'college_portal': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}